@@ -1,14 +1,81 @@
+import os
+from typing import Iterator, Optional
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, START, END
+from agents.support.history import history
 from agents.support.state import State
+from src.core.checkpoint import local_app
+from src.core.timeouts import with_timeout
 from agents.support.nodes.extractor.node import extract_info
 from agents.support.nodes.conversation.node import conversation
+from agents.support.nodes.retrieval.node import retrieve_context
+
+# Límite por rama en segundos (0 = sin límite). La extracción que llega tarde se
+# aplica en el turno siguiente; el contexto que llega tarde ya no sirve y se descarta
+# (el turno sigue sin contexto, no con el del turno anterior).
+SUPPORT_EXTRACT_TIMEOUT = float(os.getenv("SUPPORT_EXTRACT_TIMEOUT", "2"))
+SUPPORT_RETRIEVE_TIMEOUT = float(os.getenv("SUPPORT_RETRIEVE_TIMEOUT", "3"))
+
+def join(state: State) -> dict:
+    """Nodo: Une las ramas; el nombre extraído se usa para personalizar los turnos siguientes."""
+    contact_info = state.get("contact_info")
+    name = getattr(contact_info, "name", None)
+    if name and name != state.get("customer_name"):
+        return {"customer_name": name}
+    return {}
+
+async def warm_up():
+    """Carga embeddings e índice antes del primer turno (la API la llama al arrancar):
+    en frío, cargar el modelo de embeddings supera SUPPORT_RETRIEVE_TIMEOUT."""
+    from src.agents import rag
+
+    await rag.warm_up()
+
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """
+    history -> retrieve -> converse -> join
+            -> extract ------------->
+    Solo converse necesita el contexto, así que extract sale directamente de history:
+    corre en paralelo con la recuperación y la respuesta, y join espera a ambas ramas.
+    """
+    builder = StateGraph(State)
+    builder.add_node("history", history.node)
+    builder.add_node("retrieve", with_timeout(
+        retrieve_context, SUPPORT_RETRIEVE_TIMEOUT, carry_over=False, on_timeout={"context": ""}
+    ))
+    builder.add_node("extract", with_timeout(extract_info, SUPPORT_EXTRACT_TIMEOUT))
+    builder.add_node("converse", conversation)
+    builder.add_node("join", join)
+
+    builder.add_edge(START, "history")
+    builder.add_edge("history", "retrieve")
+    builder.add_edge("history", "extract")
+    builder.add_edge("retrieve", "converse")
+    builder.add_edge(["converse", "extract"], "join")
+    builder.add_edge("join", END)
+    return builder.compile(checkpointer=checkpointer)
 
-builder = StateGraph(State)
-builder.add_node("extract", extract_info)
-builder.add_node("converse", conversation)
+# Sin checkpointer: langgraph dev guarda los threads
+app = build_graph()
 
-builder.add_edge(START, "extract")
-builder.add_edge("extract", "converse")
-builder.add_edge("converse", END)
+# Helpers para CLI/tests (historial por thread_id con el checkpointer de src.core.checkpoint)
+def ask(text: str, thread_id: str = "support-demo") -> str:
+    result = local_app(build_graph).invoke(
+        {"messages": [HumanMessage(content=text)]},
+        config={"configurable": {"thread_id": thread_id}},
+    )
+    last = result["messages"][-1]
+    return getattr(last, "content", str(last))
 
-app = builder.compile()
\ No newline at end of file
+def ask_stream(text: str, thread_id: str = "support-demo") -> Iterator[str]:
+    """Como ask(), pero genera los tokens de la respuesta a medida que llegan."""
+    for chunk, metadata in local_app(build_graph).stream(
+        {"messages": [HumanMessage(content=text)]},
+        config={"configurable": {"thread_id": thread_id}},
+        stream_mode="messages",
+    ):
+        # Solo el nodo converse: los tokens del extractor no son para el usuario
+        if metadata.get("langgraph_node") == "converse" and isinstance(chunk, AIMessageChunk) and chunk.content:
+            yield chunk.content
\ No newline at end of file
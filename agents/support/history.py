@@ -0,0 +1,4 @@
+from src.core.history import RollingHistory
+
+# Ventana compartida por el grafo de soporte y sus nodos (resumen por thread_id)
+history = RollingHistory()
@@ -1,29 +1,64 @@
+import logging
+import os
+
 from agents.support.state import State
-from langchain.chat_models import init_chat_model
+from src.core.tool_agent import FINAL_ANSWER_PROMPT, limit_tool_calls, run_tool_calls, MAX_TOOL_CALLS
+from src.core.prompts import render, stable_prompt
+from src.core.tiering import get_tiered_model
 from agents.support.nodes.conversation.tools import tools
-from agents.support.nodes.conversation.prompt import prompt_template
-from langchain_core.messages import AIMessage
+from agents.support.nodes.conversation.prompt import SYSTEM_PROMPT, turn_template
+from agents.support.history import history
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+_llms = None
+
+def get_llms():
+    """(modelo, modelo con tools); se crean en el primer turno, no al importar."""
+    global _llms
+    if _llms is None:
+        base_llm = get_tiered_model("qwen2.5:7b-instruct", temperature=0.3)
+        _llms = (base_llm, base_llm.bind_tools(tools))
+    return _llms
 
-llm = init_chat_model("ollama:qwen2.5:7b-instruct", temperature=0.3)
-llm = llm.bind_tools(tools)
+logger = logging.getLogger(__name__)
 
-def conversation(state: State):
-    """Nodo: Responde usando contexto y herramientas."""
+# Rondas de tools dentro de un turno; las llamadas de una misma ronda corren en paralelo
+SUPPORT_MAX_TOOL_ROUNDS = int(os.getenv("SUPPORT_MAX_TOOL_ROUNDS", "2"))
+
+def build_messages(state: State) -> list:
+    """Prompt del turno: sistema fijo, resumen y ventana de historial, y el nombre del
+    cliente y el contexto junto al último mensaje (prefijo estable entre turnos)."""
+    volatile = render(turn_template, name=state.get("customer_name") or "Usuario", context=state.get("context", ""))
+    return stable_prompt(SYSTEM_PROMPT, history.prompt_messages(state), volatile)
+
+def conversation(state: State, config: RunnableConfig):
+    """Nodo: Responde usando contexto y herramientas.
+    Recibe `config` para que los tokens se emitan con stream_mode="messages"."""
     new_state: State = {}
-    history = state["messages"]
-    last_message = history[-1]
-    customer_name = state.get("customer_name", "Usuario")
-    context = state.get("context", "")
-    
-    # Formatear el prompt con el nombre del cliente
-    prompt = prompt_template.format(name=customer_name, context=context)
+    messages = state["messages"]
+    last_message = messages[-1]
+    customer_name = state.get("customer_name") or "Usuario"
     
-    print('*' * 100)
-    print(last_message.content)
+    logger.debug("Turno de soporte", extra={"customer": customer_name, "message": str(last_message.content)[:200]})
     
-    # Invocar el LLM con el prompt del sistema y el mensaje del usuario
-    ai_message = llm.invoke([("system", prompt), ("user", last_message.content)])
-    ai_message = AIMessage(content=ai_message.content)
+    # Invocar el LLM con el prompt del sistema y la ventana de historial (resumen + últimos turnos)
+    base_llm, llm = get_llms()
+    messages = build_messages(state)
+    ai_message = llm.invoke(messages, config)
+    # Si el modelo pide tools, se ejecutan (a la vez) y se le devuelven los resultados
+    rounds, calls = 0, 0
+    while ai_message.tool_calls:
+        ai_message = limit_tool_calls(ai_message, MAX_TOOL_CALLS - calls)
+        calls += len(ai_message.tool_calls)
+        rounds += 1
+        messages += [ai_message] + run_tool_calls(ai_message.tool_calls, tools)
+        if rounds >= SUPPORT_MAX_TOOL_ROUNDS or calls >= MAX_TOOL_CALLS:
+            ai_message = base_llm.invoke(messages + [SystemMessage(content=FINAL_ANSWER_PROMPT)], config)
+        else:
+            ai_message = llm.invoke(messages, config)
+    # Se conserva el id para que el mensaje final coincida con los chunks ya emitidos
+    ai_message = AIMessage(content=ai_message.content, id=ai_message.id)
     
     new_state["messages"] = [ai_message]
     return new_state
\ No newline at end of file
@@ -1,15 +1,15 @@
-from langchain_core.prompts import PromptTemplate
-
-# System prompt específico para el nodo conversation
-template = """\
-Eres un asistente útil y conciso para atender a {name}.
+# System prompt específico para el nodo conversation: fijo en todos los turnos,
+# así Ollama reutiliza su cache KV (ver src/core/prompts.py)
+SYSTEM_PROMPT = """\
+Eres un asistente útil y conciso de atención al cliente.
+Si hay contexto disponible, úsalo para responder preguntas de manera precisa.
+Responde de manera clara y profesional. Si no tienes información suficiente, indícalo amablemente.
+"""
 
+# Datos que cambian en cada turno: van junto al último mensaje del usuario
+turn_template = """\
+Cliente: {{ name }}
 {% if context %}
-Contexto disponible: {context}
-Usa este contexto para responder preguntas de manera precisa.
+Contexto disponible: {{ context }}
 {% endif %}
-
-Responde de manera clara y profesional. Si no tienes información suficiente, indícalo amablemente.
 """
-
-prompt_template = PromptTemplate.from_template(template, template_format="jinja2")
\ No newline at end of file
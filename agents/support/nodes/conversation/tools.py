@@ -1,9 +1,25 @@
 # Herramientas específicas para el nodo conversation (open source)
-from langchain_core.tools import tool
-from duckduckgo_search import DDGS
+import os
+import threading
 
-@tool
-def web_search(query: str) -> str:
+from src.core.tool_runtime import make_tool, runtime
+
+SEARCH_TTL = float(os.getenv("TOOL_SEARCH_TTL", "3600"))  # Segundos que se reutiliza una búsqueda idéntica
+
+_ddgs = None
+_ddgs_lock = threading.Lock()
+
+def _get_ddgs():
+    """Un solo cliente DuckDuckGo por proceso (conserva sus conexiones)."""
+    global _ddgs
+    if _ddgs is None:
+        with _ddgs_lock:
+            if _ddgs is None:
+                from duckduckgo_search import DDGS
+                _ddgs = DDGS()
+    return _ddgs
+
+async def web_search(query: str) -> str:
     """Busca información en la web usando DuckDuckGo.
     
     Args:
@@ -13,8 +29,11 @@ def web_search(query: str) -> str:
         Resultados de búsqueda relevantes
     """
     try:
-        ddgs = DDGS()
-        results = ddgs.text(query, max_results=3)
+        normalized = " ".join(query.lower().split())
+        results = await runtime.call_blocking(
+            lambda: _get_ddgs().text(query, max_results=3),
+            cache_name="web_search", key=normalized, ttl=SEARCH_TTL,
+        )
         if not results:
             return "No se encontraron resultados."
         
@@ -29,4 +48,4 @@ def web_search(query: str) -> str:
     except Exception as e:
         return f"Error al buscar: {str(e)}"
 
-tools = [web_search]
\ No newline at end of file
+tools = [make_tool(web_search)]
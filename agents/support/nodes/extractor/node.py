@@ -1,17 +1,68 @@
-from langchain_ollama import ChatOllama
+import json
+import logging
+
+from src.core.tiering import get_tiered_model
+from src.core.contact_rules import extract_contact_fields, may_contain_contact_data
 from langchain_core.messages import SystemMessage, HumanMessage
-from agents.support.state import State  # Import absoluto
+from agents.support.state import ContactInfo, State  # Import absoluto
 from agents.support.nodes.extractor.prompt import SYSTEM_PROMPT
 
-llm = ChatOllama(model="qwen2.5:7b-instruct", temperature=0)
+logger = logging.getLogger(__name__)
+
+_structured_llm = None
+
+def get_structured_llm():
+    """LLM con salida estructurada ContactInfo; se crea la primera vez que hace falta (no al importar)."""
+    global _structured_llm
+    if _structured_llm is None:
+        _structured_llm = get_tiered_model("qwen2.5:7b-instruct", temperature=0).with_structured_output(ContactInfo)
+    return _structured_llm
+
+RULE_FIELDS = ("name", "email", "phone", "age")
+
+def _llm_extract(known: dict, text: str) -> ContactInfo:
+    """Extracción con el LLM: solo los mensajes nuevos del usuario y lo ya conocido."""
+    known_text = json.dumps({k: v for k, v in known.items() if v is not None}, ensure_ascii=False)
+    return get_structured_llm().invoke([
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=f"Datos ya conocidos: {known_text}\n\nMensajes nuevos del usuario:\n{text}"),
+    ])
 
 def extract_info(state: State) -> dict:
-    """Nodo: Extrae información estructurada del historial."""
+    """Nodo: Extrae información de contacto de los mensajes nuevos del usuario.
+
+    Procesa solo lo añadido desde la última extracción (`extracted_upto`). Las
+    reglas de src.core.contact_rules cubren email, teléfono, edad y nombre; el LLM
+    solo se consulta si falta el tono o si el texto nuevo tiene pistas de un dato
+    que las reglas no encontraron. El resultado se fusiona con `contact_info`.
+    """
     messages = list(state.get("messages", []))
-    if not messages:
-        return {}
-    
-    full_messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
-    response = llm.invoke(full_messages)
-    # Asume uso de with_structured_output como en clase anterior
-    return {"contact_info": response}  # Adaptar según implementación
\ No newline at end of file
+    upto = state.get("extracted_upto", 0)
+    if upto > len(messages):  # historial reescrito: se vuelve a procesar desde el principio
+        upto = 0
+    new_texts = [str(m.content) for m in messages[upto:] if isinstance(m, HumanMessage)]
+    update = {"extracted_upto": len(messages)}
+    if not new_texts:
+        return update
+
+    current = state.get("contact_info")
+    if isinstance(current, dict):
+        current = ContactInfo(**current)
+    fields = (current or ContactInfo()).model_dump()
+    text = "\n".join(new_texts)
+    # Lo que el usuario acaba de decir explícitamente reemplaza a lo anterior (p. ej. un email corregido);
+    # un número suelto no pisa un teléfono ya guardado
+    fields.update(extract_contact_fields(text, fields))
+
+    missing = [f for f in RULE_FIELDS if fields.get(f) is None]
+    if fields.get("tone") is None or may_contain_contact_data(text, missing):
+        try:
+            found = _llm_extract(fields, text)
+            for key, value in found.model_dump().items():
+                if value is not None and (key == "tone" or fields.get(key) is None):
+                    fields[key] = value
+        except Exception:
+            logger.exception("Error en la extracción con LLM (se conservan los datos de las reglas)")
+
+    update["contact_info"] = ContactInfo(**fields)
+    return update
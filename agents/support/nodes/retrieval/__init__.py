@@ -0,0 +1 @@
+# Retrieval node package
\ No newline at end of file
@@ -0,0 +1,30 @@
+import logging
+import time
+
+from langchain_core.messages import HumanMessage
+from agents.support.state import State
+from src.core.metrics import record_retrieval
+
+logger = logging.getLogger(__name__)
+
+def retrieve_context(state: State) -> dict:
+    """Nodo: Recupera del índice del agente RAG el contexto para la última pregunta.
+    Si no hay índice (o falla la búsqueda), el contexto queda vacío."""
+    from src.agents import rag  # Import diferido: carga embeddings/índice solo si se usa el nodo
+    from src.retrieval.context import assemble_context
+
+    last_human = next((m for m in reversed(state.get("messages", [])) if isinstance(m, HumanMessage)), None)
+    question = str(last_human.content) if last_human else ""
+    if not question:
+        return {"question": "", "context": ""}
+    t0 = time.perf_counter()
+    try:
+        retriever = rag.get_retriever()
+        docs = retriever.invoke(question) if retriever is not None else []
+    except Exception:
+        record_retrieval("support", time.perf_counter() - t0, 0, error=True)
+        logger.exception("Error en recuperación")
+        return {"question": question, "context": ""}
+    record_retrieval("support", time.perf_counter() - t0, len(docs))
+    context, _ = assemble_context(docs)
+    return {"question": question, "context": context}
@@ -6,15 +6,18 @@ from pydantic import BaseModel, Field
 
 class ContactInfo(BaseModel):
     """Esquema para extraer información estructurada de conversaciones."""
-    name: Optional[str] = Field(description="Nombre de la persona, si se menciona.")
-    email: Optional[str] = Field(description="Email, si se proporciona.")
-    phone: Optional[str] = Field(description="Teléfono, si se da.")
-    tone: Optional[str] = Field(description="Tono: positivo, negativo o neutral, si inferible.")
-    age: Optional[int] = Field(description="Edad, si se menciona como número.")
+    name: Optional[str] = Field(default=None, description="Nombre de la persona, si se menciona.")
+    email: Optional[str] = Field(default=None, description="Email, si se proporciona.")
+    phone: Optional[str] = Field(default=None, description="Teléfono, si se da.")
+    tone: Optional[str] = Field(default=None, description="Tono: positivo, negativo o neutral, si inferible.")
+    age: Optional[int] = Field(default=None, description="Edad, si se menciona como número.")
 
 class State(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]  # Historial acumulado
     question: str  # Pregunta del usuario
     context: str  # Contexto de RAG
     contact_info: Optional[ContactInfo]  # Datos extraídos
-    customer_name: Optional[str]  # Nombre del cliente
\ No newline at end of file
+    extracted_upto: int  # Mensajes ya procesados por el extractor
+    customer_name: Optional[str]  # Nombre del cliente
+    summary: str  # Resumen de los turnos fuera de la ventana de historial
+    summary_upto: int  # Mensajes incluidos en el resumen
\ No newline at end of file
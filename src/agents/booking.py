@@ -1,96 +1,92 @@
-from langchain_ollama import ChatOllama
-from langchain.agents import create_react_agent
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langgraph.graph import START, END, StateGraph
-from typing import Sequence, TypedDict
+from src.core.checkpoint import local_app
+from src.core.tiering import get_tiered_model
+from src.core.tool_agent import build_tool_agent
+from src.booking.store import BOOKING_MAX_DAYS_AHEAD, BookingError, get_store
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from typing import Optional, Sequence, TypedDict
 from typing_extensions import Annotated
 from langgraph.graph.message import add_messages
 from langchain_core.tools import tool
 from datetime import datetime
 
-# Define tools for booking
+# Define tools for booking (backed by the shared schedule in src/booking/store.py)
+def _parse_datetime(fecha: str, tiempo: str) -> datetime:
+    return datetime.strptime(f"{fecha.strip()} {tiempo.strip()}", "%Y-%m-%d %H:%M")
+
 @tool
 def booking_appointment(fecha: str, tiempo: str, doctor: str, paciente: str) -> str:
-    """Book an appointment for a patient with a doctor at a specific date and time."""
-    # Mock logic for booking
+    """Book an appointment for a patient with a doctor at a specific date (YYYY-MM-DD) and time (HH:MM)."""
+    try:
+        booking = get_store().book(doctor, paciente, _parse_datetime(fecha, tiempo))
+    except ValueError:
+        return "Formato inválido: usa fecha YYYY-MM-DD y hora HH:MM."
+    except BookingError as e:
+        return f"No se pudo reservar: {e}"
     return (
-        f"Cita confirmada: paciente {paciente}, doctor {doctor}, "
-        f"fecha {fecha}, hora {tiempo}."
+        f"Cita confirmada ({booking.id}): paciente {booking.patient}, doctor {booking.doctor}, "
+        f"fecha {booking.start:%Y-%m-%d}, hora {booking.start:%H:%M}."
     )
 
 @tool
 def get_appointment_availability(fecha: str, tiempo: str, doctor: str) -> str:
-    """Get available time slots for a doctor on a specific date."""
-    # Mock logic for availability
+    """Get available time slots for a doctor on a specific date (YYYY-MM-DD); tiempo (HH:MM) is the preferred time, may be empty."""
+    try:
+        day = datetime.strptime(fecha.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return "Formato inválido: usa fecha YYYY-MM-DD."
+    store = get_store()
+    if tiempo and tiempo.strip():
+        try:
+            wanted = _parse_datetime(fecha, tiempo)
+            store.validate(wanted)
+            if store.is_free(doctor, wanted):
+                return f"{doctor} está disponible el {fecha} a las {wanted:%H:%M}."
+        except (ValueError, BookingError):
+            pass  # fall back to listing the free slots of the day
+    free = store.free_slots(doctor, day, limit=8)
+    if not free:
+        return f"{doctor} no tiene huecos disponibles el {fecha}."
     return (
-        f"Disponibilidad para {doctor} en {fecha} {tiempo}: 14:00, 15:00, 16:00. "
+        f"Disponibilidad para {doctor} en {fecha}: {', '.join(f'{s:%H:%M}' for s in free)}. "
         "Indica tu hora preferida."
     )
 
 # Tools list
 tools = [booking_appointment, get_appointment_availability]
 
-# Get today's date
-today = datetime.now().strftime("%Y-%m-%d")
-
 # State
 class State(TypedDict, total=False):
     messages: Annotated[Sequence, add_messages]
 
-# Model
-model = ChatOllama(model="llama3.1:70b")
-
-# Standard ReAct prompt
-system_prompt = """
-Answer the following questions as best you can. You have access to the following tools:
-
-{tools}
-
-Use the following format:
-
-Question: the input question you must answer
-Thought: you should always think about what to do
-Action: the action to take, should be one of [{tool_names}]
-Action Input: the input to the action
-Observation: the result of the action
-... (this Thought/Action/Action Input/Observation can repeat N times)
-Thought: I now know the final answer
-Final Answer: the final answer to the original input question
+# Model (created on the first turn, not at import time): greetings and availability
+# lookups go to the 7B model, hard turns and rejected answers to the 70B one
+def get_model():
+    return get_tiered_model("llama3.1:70b", small="qwen2.5:7b-instruct")
 
-Today: {today}
-Additional rules: Do not book appointments more than 30 days in advance.
-
-Begin!
-
-Question: {input}
-Thought: {agent_scratchpad}
-"""
-
-prompt = PromptTemplate.from_template(system_prompt)
-agent = create_react_agent(model, tools, prompt)
-
-# Node
-def booking_node(state: State) -> dict:
-    messages = state.get("messages", [])
-    response = agent.invoke({"input": messages[-1].content if messages else "", "today": today})
-    return {"messages": [AIMessage(content=response.get("output", "No response."))]}
+def system_prompt(state: State) -> str:
+    # Today is computed per turn, not at import time (long-running servers cross midnight)
+    today = datetime.now().strftime("%Y-%m-%d")
+    return (
+        "You are a medical appointment assistant. Check availability before booking and "
+        "confirm the patient's name, doctor, date and time.\n"
+        f"Today: {today}\n"
+        f"Additional rules: Do not book appointments more than {BOOKING_MAX_DAYS_AHEAD} days in advance."
+    )
 
-# Graph
-builder = StateGraph(State)
-builder.add_node("booking", booking_node)
-builder.add_edge(START, "booking")
-builder.add_edge("booking", END)
+# Graph: native tool calling; several tool calls from one model turn run concurrently
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    return build_tool_agent(State, get_model, tools, system_prompt, node_name="booking", checkpointer=checkpointer)
 
-app = builder.compile()
+app = build_graph()
 
-# Helper for CLI/tests
+# Helper for CLI/tests (history per thread_id via src.core.checkpoint)
 def ask(text: str, thread_id: str = "booking-demo") -> str:
-    result = app.invoke(
+    result = local_app(build_graph).invoke(
         {"messages": [HumanMessage(content=text)]},
         config={"configurable": {"thread_id": thread_id}},
     )
     last = result["messages"][-1]
     return getattr(last, "content", str(last))
 
-__all__ = ["app", "ask", "State"]
\ No newline at end of file
+__all__ = ["app", "build_graph", "ask", "State"]
\ No newline at end of file
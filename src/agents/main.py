@@ -1,17 +1,20 @@
 # src/agents/main.py
 import os
-from typing import TypedDict, List
+from typing import Annotated, Sequence, TypedDict, Optional
 from langchain_core.messages import AnyMessage
 from langchain_core.tools import tool
-from langgraph.graph import StateGraph, START, END
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_ollama import ChatOllama
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.message import add_messages
+from src.core.tiering import get_tiered_model
+from src.core.tool_agent import build_tool_agent
 
 # =========================
 # 1️⃣ Estado del grafo
 # =========================
+# add_messages: los nodos devuelven solo los mensajes nuevos y el canal los añade,
+# así cada paso no copia (ni vuelve a serializar) todo el historial
 class State(TypedDict):
-    messages: List[AnyMessage]
+    messages: Annotated[Sequence[AnyMessage], add_messages]
 
 
 # =========================
@@ -33,43 +36,23 @@ tools = [add, multiply]
 # =========================
 # 3️⃣ Modelo Ollama (Qwen)
 # =========================
-llm = ChatOllama(
-    model=os.getenv("MODEL", "qwen2.5:7b-instruct"),
-    base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-    temperature=0.2,
-)
-
-# Importantísimo: permitirle usar tools
-llm = llm.bind_tools(tools)
-
-
-# =========================
-# 4️⃣ Nodo del agente
-# =========================
-def agent(state: State):
-    response = llm.invoke(state["messages"])
-    return {"messages": state["messages"] + [response]}
+def get_llm():
+    # Se llama en el primer turno (no al importar): el cliente sale del registro del proceso
+    # Turnos sencillos al modelo pequeño (src/core/tiering.py), el resto a MODEL
+    return get_tiered_model(
+        model=os.getenv("MODEL", "qwen2.5:7b-instruct"),
+        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+        temperature=0.2,
+    )
 
 
 # =========================
-# 5️⃣ Construcción del grafo
+# 4️⃣ Construcción del grafo
 # =========================
-builder = StateGraph(State)
-
-builder.add_node("agent", agent)
-builder.add_node("tools", ToolNode(tools))
-
-builder.add_edge(START, "agent")
-
-# Condición: si el modelo pide usar una tool, ir al nodo "tools"
-builder.add_conditional_edges(
-    "agent",
-    tools_condition,
-    {"tools": "tools", "__end__": END},
-)
-
-# Cuando acaba una tool, vuelve al agente
-builder.add_edge("tools", "agent")
+# Nodo "agent" <-> nodo "tools" (src/core/tool_agent.py): las tools de un mismo turno
+# del modelo corren en paralelo y MAX_TOOL_ITERATIONS / MAX_TOOL_CALLS limitan cada turno
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    return build_tool_agent(State, get_llm, tools, node_name="agent", checkpointer=checkpointer)
 
-# Compilamos el grafo
-app = builder.compile()
+# Compilamos el grafo (langgraph dev aporta su propio checkpointer)
+app = build_graph()
@@ -17,27 +17,36 @@ Características clave:
 
 import os
 import asyncio
-from typing import List, Optional, Dict, Any, Sequence, TypedDict
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Callable, List, Optional, Dict, Any, Sequence, TypedDict
 from typing_extensions import Annotated
 
 # Imports para prompts y parsing
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document
-from langchain_core.runnables import RunnableLambda
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-
-# Imports para vector stores y embeddings (open source)
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-
-# ChatOllama: interfaz open source para modelos locales
-try:
-    from langchain_ollama import ChatOllama  # paquete nuevo
-except Exception:
-    from langchain_community.chat_models import ChatOllama  # fallback
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage, AIMessage
+
+# Vector stores, embeddings y recuperación (FAISS, numpy, HuggingFace/torch) se importan
+# dentro de las funciones que los usan: importar el módulo (langgraph.json, la API) no los
+# carga, y un worker que no sirve RAG no paga ni el tiempo ni la memoria.
+if TYPE_CHECKING:
+    from src.retrieval.index import IndexWatcher
+    from src.retrieval.semantic_cache import SemanticCache
+
+# ChatOllama: interfaz open source para modelos locales (compartida vía registro, con
+# un modelo pequeño delante para las preguntas sencillas: src/core/tiering.py)
+from src.core.checkpoint import local_app
+from src.core.tiering import get_tiered_model, grounded
+from src.core.metrics import record_cache, record_retrieval
+from src.core.prompts import stable_prompt
 
 # Imports para grafos y estado en LangGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import START, END, StateGraph
 from langgraph.graph.message import add_messages
 
@@ -58,8 +67,11 @@ class ContactInfo(BaseModel):
 class State(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]  # Historial de mensajes acumulado (requerido para add_messages)
     question: str  # Pregunta del usuario
+    documents: List[Document]  # Chunks recuperados, antes de deduplicar y empaquetar
     context: str  # Contexto recuperado de documentos
+    context_tokens_saved: int  # Tokens ahorrados por el ensamblado del contexto en este turno
     contact_info: Optional[ContactInfo]  # Información extraída estructurada
+    cache_hit: bool  # True si la respuesta salió de la cache semántica
 
 # -------------------------
 # Configuración del agente RAG
@@ -68,79 +80,224 @@ class State(TypedDict):
 FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "data/faiss_index")  # Directorio del índice FAISS
 FAISS_INDEX_NAME = os.getenv("FAISS_INDEX_NAME", "index")  # Nombre del índice
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "intfloat/multilingual-e5-small")  # Modelo de embeddings open source
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") == "1"  # Abrir el índice con mmap (compartido entre workers)
+FAISS_HOT_RELOAD_INTERVAL = float(os.getenv("FAISS_HOT_RELOAD_INTERVAL", "5"))  # Segundos; 0 desactiva la recarga
+
+# Recuperación: "hybrid" (FAISS + BM25 con RRF) o "dense" (solo FAISS)
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "hybrid")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))  # Documentos que llegan al prompt
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", "20"))  # Candidatos por búsqueda antes de fusionar
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
 
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")  # URL de Ollama
 MODEL = os.getenv("MODEL", "qwen2.5:7b-instruct")  # Modelo LLM local
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.1"))  # Creatividad del LLM (bajo para precisión)
 
+# Cache semántica de respuestas (paráfrasis de preguntas ya respondidas)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # Similitud coseno mínima
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))  # Segundos de vida de una respuesta
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+logger = logging.getLogger(__name__)
+
+# Slots de generación en paralelo de Ollama (OLLAMA_NUM_PARALLEL del servidor)
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
 # -------------------------
 # Funciones utilitarias para RAG
 # -------------------------
-def _format_docs(docs: List[Document]) -> str:
-    """Formatea documentos recuperados en un string para el prompt."""
-    return "\n\n".join(d.page_content for d in docs) if docs else ""
+# Instrucciones fijas: van primero para que Ollama reutilice su KV entre preguntas
+# (el contexto, que cambia en cada una, va después; ver src/core/prompts.py)
+SYSTEM_PROMPT = (
+    "Eres un asistente RAG open source. Usa únicamente el contexto proporcionado para responder. "
+    "Si la respuesta no está en el contexto, dilo explícitamente y no inventes información."
+)
+
+def _build_messages(question: str, context: str) -> List[BaseMessage]:
+    """Mensajes para el LLM: instrucciones fijas y, al final, el contexto (si hay) y la pregunta."""
+    return stable_prompt(
+        SYSTEM_PROMPT,
+        [HumanMessage(content=f"Pregunta: {question}")],
+        f"Contexto:\n{context}" if context else "",
+    )
 
 def _load_embeddings_sync():
     """Carga embeddings de forma síncrona con configuración para evitar errores de CUDA.
-    Usa CPU para compatibilidad y evita problemas con GPUs."""
+    Usa CPU para compatibilidad y evita problemas con GPUs.
+    Se envuelven con la cache persistente: consultas repetidas y chunks sin cambios
+    no vuelven a pasar por el modelo (la ingesta usa esta misma función)."""
+    from src.retrieval.embeddings import CachedEmbeddings
+
+    if _embeddings_factory is not None:
+        embeddings = _embeddings_factory()
+        return CachedEmbeddings(embeddings, model=getattr(embeddings, "model_name", EMBEDDING_MODEL))
     os.environ["CUDA_VISIBLE_DEVICES"] = ""  # Forzar CPU
-    return HuggingFaceEmbeddings(
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(
         model_name=EMBEDDING_MODEL,
         model_kwargs={'device': 'cpu'},  # Forzar CPU
         encode_kwargs={'normalize_embeddings': True}  # Normalizar para mejor búsqueda
     )
+    return CachedEmbeddings(embeddings, model=EMBEDDING_MODEL)
+
+def set_embeddings_factory(factory: Optional[Callable[[], Embeddings]]) -> None:
+    """Sustituye el modelo de HuggingFace (p. ej. por los embeddings falsos de src/bench/fakes.py).
+    Hay que llamarla antes de la primera carga; None vuelve al modelo configurado."""
+    global _embeddings_factory
+    _embeddings_factory = factory
 
 async def _load_embeddings():
     """Carga embeddings de forma asíncrona para no bloquear el event loop."""
     return await asyncio.to_thread(_load_embeddings_sync)
 
-def _load_retriever_sync(embeddings):
-    """Carga el retriever de forma síncrona desde el índice FAISS guardado."""
-    idx_path = os.path.join(FAISS_INDEX_DIR)
+def _load_retriever_sync(embeddings, version: Optional[str] = None):
+    """Carga el retriever de forma síncrona desde el índice FAISS guardado.
+    Todos los archivos salen del directorio de una misma versión publicada (`version`
+    o la del puntero actual). Con FAISS_MMAP usa el índice mapeado en memoria y el
+    docstore compacto si la ingesta los publicó; si no, cae al `.pkl` de siempre."""
+    from langchain_community.vectorstores import FAISS
+    from src.retrieval.bm25 import BM25Index
+    from src.retrieval.hybrid import HybridRetriever
+    from src.retrieval.index import has_mmap_index, load_mmap_vectorstore, read_version, resolve_index_dir
+
+    global _loaded_version
+    version = version or read_version(FAISS_INDEX_DIR, FAISS_INDEX_NAME)  # el puntero se lee una sola vez
+    _loaded_version = version  # base del watcher: lo cargado, no lo que indique el puntero después
+    idx_path = resolve_index_dir(FAISS_INDEX_DIR, FAISS_INDEX_NAME, version)
     faiss_file = os.path.join(idx_path, f"{FAISS_INDEX_NAME}.faiss")
     pkl_file = os.path.join(idx_path, f"{FAISS_INDEX_NAME}.pkl")
 
-    if os.path.exists(faiss_file) and os.path.exists(pkl_file):
+    if FAISS_MMAP and has_mmap_index(idx_path, FAISS_INDEX_NAME):
+        vs = load_mmap_vectorstore(idx_path, FAISS_INDEX_NAME, embeddings)
+    elif os.path.exists(faiss_file) and os.path.exists(pkl_file):
         vs = FAISS.load_local(
             idx_path,
             embeddings,
             index_name=FAISS_INDEX_NAME,
             allow_dangerous_deserialization=True,  # Permitir deserialización para cargar índice
         )
-        return vs.as_retriever(search_kwargs={"k": 4})  # Top 4 documentos relevantes
-    return None  # Si no existe índice, retorna None
+    else:
+        return None  # Si no existe índice, retorna None (se construye con `python -m src.retrieval.ingest`)
+
+    # Con el BM25 publicado por la ingesta se usa la recuperación híbrida
+    bm25_file = os.path.join(idx_path, f"{FAISS_INDEX_NAME}.bm25.npz")
+    if RETRIEVER_MODE == "hybrid" and os.path.exists(bm25_file):
+        return HybridRetriever(
+            vectorstore=vs,
+            bm25=BM25Index.load(bm25_file),
+            k=RETRIEVER_K,
+            fetch_k=RETRIEVER_FETCH_K,
+            dense_weight=HYBRID_DENSE_WEIGHT,
+            lexical_weight=HYBRID_LEXICAL_WEIGHT,
+            rrf_k=HYBRID_RRF_K,
+        )
+    return vs.as_retriever(search_kwargs={"k": RETRIEVER_K})  # Top-k documentos relevantes
 
 async def _load_retriever_if_available():
-    """Carga el retriever solo si el índice existe, de forma asíncrona."""
-    embeddings = await _load_embeddings()
-    return await asyncio.to_thread(_load_retriever_sync, embeddings)
+    """Carga el retriever solo si el índice existe, de forma asíncrona.
+    Los embeddings quedan en `_embeddings_cache` para reutilizarlos."""
+    global _embeddings_cache
+    if _embeddings_cache is None:
+        _embeddings_cache = await _load_embeddings()
+    return await asyncio.to_thread(_load_retriever_sync, _embeddings_cache)
 
 def _get_llm():
-    """Obtiene el LLM local con Ollama - inicialización liviana y reutilizable."""
-    return ChatOllama(
-        model=MODEL,
-        base_url=OLLAMA_BASE_URL,
-        temperature=TEMPERATURE,
-    )
+    """Obtiene el LLM local con Ollama desde el registro del proceso.
+    Siempre devuelve el mismo cliente, con sus conexiones keep-alive; las preguntas
+    sencillas las responde el modelo pequeño (TIER_SMALL_MODEL). El prompt pide decir
+    cuándo la respuesta no está en el contexto, así que ese "no lo sé" no escala."""
+    return grounded(get_tiered_model(MODEL, base_url=OLLAMA_BASE_URL, temperature=TEMPERATURE))
 
-# Prompt para el LLM: guía el comportamiento con contexto
+# Prompt para el LLM (cadena de async_answer): mismo orden que _build_messages
 PROMPT = ChatPromptTemplate.from_messages(
     [
-        (
-            "system",
-            (
-                "Eres un asistente RAG open source. Usa únicamente el contexto proporcionado para responder. "
-                "Si la respuesta no está en el contexto, dilo explícitamente y no inventes información.\n\n"
-                "Contexto:\n{context}"
-            ),
-        ),
-        ("human", "{question}"),
+        ("system", SYSTEM_PROMPT),
+        ("human", "Contexto:\n{context}\n\nPregunta: {question}"),
     ]
 )
 
 # Caches globales para evitar recargas innecesarias (mejora rendimiento)
 _retriever_cache = None
 _embeddings_cache = None
+_embeddings_factory: Optional[Callable[[], Embeddings]] = None  # ver set_embeddings_factory()
+_resources_loaded = False  # True aunque no haya índice: evita reintentar la carga en cada turno
+_index_watcher: Optional["IndexWatcher"] = None
+_loaded_version: Optional[str] = None  # versión del índice que cargó _load_retriever_sync
+_resources_lock = asyncio.Lock()  # Serializa solo la primera carga, no las consultas
+_sync_resources_lock = threading.Lock()  # Lo mismo para get_retriever() desde código síncrono
+_semantic_cache: Optional["SemanticCache"] = None
+_semantic_cache_lock = threading.Lock()
+
+def _get_semantic_cache() -> "SemanticCache":
+    """Cache semántica del proceso (se crea en el primer uso: importa faiss)."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                from src.retrieval.semantic_cache import SemanticCache
+
+                _semantic_cache = SemanticCache(
+                    threshold=SEMANTIC_CACHE_THRESHOLD,
+                    ttl=SEMANTIC_CACHE_TTL,
+                    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                )
+    return _semantic_cache
+
+async def warm_up():
+    """Carga embeddings y retriever una sola vez por proceso.
+
+    Pensado para llamarse al arrancar el servidor; el nodo `load` también la usa,
+    así que la primera petición no falla si nadie la llamó antes. Con N
+    conversaciones simultáneas solo una hace la carga y el resto espera el lock
+    sin bloquear el event loop (la carga corre en un hilo)."""
+    global _retriever_cache, _resources_loaded
+    if _resources_loaded:
+        return _retriever_cache
+    async with _resources_lock:
+        if not _resources_loaded:
+            _retriever_cache = await _load_retriever_if_available()
+            _resources_loaded = True
+            _start_index_watcher()
+    return _retriever_cache
+
+def get_retriever():
+    """Versión síncrona de warm_up() para grafos síncronos (p. ej. el de soporte)."""
+    global _retriever_cache, _embeddings_cache, _resources_loaded
+    if _resources_loaded:
+        return _retriever_cache
+    with _sync_resources_lock:
+        if not _resources_loaded:
+            if _embeddings_cache is None:
+                _embeddings_cache = _load_embeddings_sync()
+            _retriever_cache = _load_retriever_sync(_embeddings_cache)
+            _resources_loaded = True
+            _start_index_watcher()
+    return _retriever_cache
+
+def _reload_retriever(version: str) -> None:
+    """Callback del watcher: carga la versión nueva y la intercambia de forma atómica.
+    Las consultas en curso terminan con el retriever anterior; los embeddings no se recargan."""
+    global _retriever_cache, _chain_cache
+    retriever = _load_retriever_sync(_embeddings_cache, version)
+    if retriever is not None:
+        _retriever_cache = retriever  # una asignación: el cambio es atómico para los lectores
+        _chain_cache = None  # la cadena captura el retriever al construirse
+        logger.info("Índice FAISS recargado (versión %s)", version, extra={"version": version})
+
+def _start_index_watcher() -> None:
+    """Arranca (una vez por proceso) el hilo que detecta publicaciones de la ingesta."""
+    global _index_watcher
+    if _index_watcher is None and FAISS_HOT_RELOAD_INTERVAL > 0:
+        from src.retrieval.index import IndexWatcher
+
+        _index_watcher = IndexWatcher(
+            FAISS_INDEX_DIR, FAISS_INDEX_NAME, _reload_retriever, FAISS_HOT_RELOAD_INTERVAL,
+            version=_loaded_version,
+        ).start()
 
 def _prepare_inputs(inputs: Any) -> Dict[str, str]:
     """Prepara los inputs asegurando que siempre sean strings válidos."""
@@ -152,17 +309,38 @@ def _prepare_inputs(inputs: Any) -> Dict[str, str]:
     else:
         return {"question": str(inputs)}
 
+async def _aretrieve_documents(question: str, retriever) -> List[Document]:
+    """Recupera los documentos de la pregunta de forma asíncrona con `retriever.ainvoke`."""
+    if not retriever or not question:
+        return []
+
+    t0 = time.perf_counter()
+    try:
+        docs = await retriever.ainvoke(question)  # Recupera top-k documentos
+    except Exception:
+        record_retrieval("rag", time.perf_counter() - t0, 0, error=True)
+        logger.exception("Error en recuperación")
+        return []
+    record_retrieval("rag", time.perf_counter() - t0, len(docs))
+    return docs
+
 def _retrieve_context(question: str, retriever) -> str:
     """Ejecuta la recuperación de documentos relevantes para la pregunta."""
     if not retriever or not question:
         return ""
     
+    t0 = time.perf_counter()
     try:
         docs = retriever.invoke(question)  # Recupera top-k documentos
-        return _format_docs(docs)
-    except Exception as e:
-        print(f"Error en recuperación: {e}")
+    except Exception:
+        record_retrieval("rag", time.perf_counter() - t0, 0, error=True)
+        logger.exception("Error en recuperación")
         return ""
+    record_retrieval("rag", time.perf_counter() - t0, len(docs))
+    from src.retrieval.context import assemble_context
+
+    context, _ = assemble_context(docs)
+    return context
 
 def _build_chain_sync(retriever):
     """Construye la cadena RAG de forma síncrona usando RunnableLambda."""
@@ -212,12 +390,7 @@ def _build_chain_sync(retriever):
 
 async def _build_chain():
     """Construye la cadena de forma asíncrona, cargando retriever si es necesario."""
-    global _retriever_cache
-    
-    if _retriever_cache is None:
-        _retriever_cache = await _load_retriever_if_available()
-    
-    retriever = _retriever_cache
+    retriever = await warm_up()
     return await asyncio.to_thread(_build_chain_sync, retriever)
 
 # Cache para la cadena construida
@@ -229,52 +402,78 @@ _chain_cache = None
 # -----------------------------------------------------------------------------
 def prepare_question(state: State) -> dict:
     """Nodo inicial: prepara la pregunta desde mensajes o input directo.
-    Extrae la pregunta del último HumanMessage si no está proporcionada."""
+
+    Con mensajes, la pregunta es siempre la del último HumanMessage: con checkpointer,
+    `question` guarda la del turno anterior. También vacía lo que se calculó para
+    ese turno (documentos, contexto, hit de cache)."""
     question = state.get("question", "")
-    if not question and state.get("messages"):
-        for msg in reversed(state["messages"]):
-            if isinstance(msg, HumanMessage):
-                question = msg.content
-                break
-    return {"question": question}
-
-def load_retriever(state: State) -> dict:
-    """Nodo: carga el retriever si no está en cache global.
-    Inicializa embeddings y vector store de forma asíncrona o síncrona según el contexto."""
-    global _retriever_cache
-    if _retriever_cache is None:
-        import asyncio
-        try:
-            _retriever_cache = asyncio.run(_load_retriever_if_available())
-        except RuntimeError:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                embeddings = _load_embeddings_sync()
-                _retriever_cache = _load_retriever_sync(embeddings)
-            else:
-                _retriever_cache = asyncio.run(_load_retriever_if_available())
+    for msg in reversed(state.get("messages") or []):
+        if isinstance(msg, HumanMessage):
+            question = msg.content
+            break
+    return {"question": question, "documents": [], "context": "", "context_tokens_saved": 0, "cache_hit": False}
+
+async def load_retriever(state: State) -> dict:
+    """Nodo: asegura que el retriever esté cargado (una sola vez por proceso).
+    Tras la primera carga es un simple chequeo de bandera; no bloquea el event loop."""
+    await warm_up()
     return {}  # No modifica estado, solo inicializa recursos
 
-def retrieve_context(state: State) -> dict:
-    """Nodo: recupera contexto relevante de documentos basado en la pregunta."""
+async def retrieve_context(state: State) -> dict:
+    """Nodo: recupera los documentos relevantes para la pregunta."""
     question = state.get("question", "")
     retriever = _retriever_cache
-    context = _retrieve_context(question, retriever)
-    return {"context": context}
+    documents = await _aretrieve_documents(question, retriever)
+    return {"documents": documents}
+
+async def assemble_context_node(state: State) -> dict:
+    """Nodo: deduplica, (opcionalmente) reordena y empaqueta los chunks en el
+    presupuesto CONTEXT_TOKEN_BUDGET antes de generar. Registra los tokens ahorrados."""
+    from src.retrieval.context import CONTEXT_RERANK, CONTEXT_TOKEN_BUDGET, assemble_context
+
+    documents = state.get("documents") or []
+    if not documents:
+        return {"context": "", "context_tokens_saved": 0}
+    query_vector = None
+    if CONTEXT_RERANK and _embeddings_cache is not None:
+        query_vector = await _embeddings_cache.aembed_query(state.get("question", ""))
+    context, stats = await asyncio.to_thread(
+        assemble_context, documents, CONTEXT_TOKEN_BUDGET, query_vector, _embeddings_cache
+    )
+    return {"context": context, "context_tokens_saved": stats["tokens_saved"]}
 
-def generate_response(state: State) -> dict:
-    """Nodo: genera la respuesta usando el LLM con contexto recuperado."""
+async def check_semantic_cache(state: State) -> dict:
+    """Nodo: busca una respuesta ya generada para una pregunta equivalente.
+    El embedding de la pregunta sale de la cache de embeddings (el retriever ya lo calculó)."""
+    question = state.get("question", "")
+    if not SEMANTIC_CACHE_ENABLED or _embeddings_cache is None or not question:
+        return {"cache_hit": False}
+    from src.retrieval.semantic_cache import context_fingerprint
+
+    vector = await _embeddings_cache.aembed_query(question)
+    answer = _get_semantic_cache().lookup(vector, context_fingerprint(state.get("context", "")))
+    record_cache("semantic", hits=int(answer is not None), misses=int(answer is None))
+    if answer is None:
+        return {"cache_hit": False}
+    return {"cache_hit": True, "messages": [AIMessage(content=answer)]}
+
+def route_after_cache(state: State) -> str:
+    """Con hit se salta el LLM y se va directo a formatear."""
+    return "format" if state.get("cache_hit") else "generate"
+
+async def generate_response(state: State, config: RunnableConfig) -> dict:
+    """Nodo: genera la respuesta usando el LLM con contexto recuperado.
+    Con stream_mode="messages" los tokens salen del grafo a medida que se generan."""
     question = state.get("question", "")
     context = state.get("context", "")
-    
-    if context:
-        full_prompt = f"Contexto:\n{context}\n\nPregunta: {question}"
-    else:
-        full_prompt = f"Pregunta: {question}"
-    
-    messages = [HumanMessage(content=full_prompt)]
+    messages = _build_messages(question, context)
     llm = _get_llm()
-    ai_response = llm.invoke(messages)
+    ai_response = await llm.ainvoke(messages, config)
+    if SEMANTIC_CACHE_ENABLED and _embeddings_cache is not None and question:
+        from src.retrieval.semantic_cache import context_fingerprint
+
+        vector = await _embeddings_cache.aembed_query(question)
+        _get_semantic_cache().store(vector, question, str(ai_response.content).strip(), context_fingerprint(context))
     return {"messages": [ai_response]}
 
 def format_response(state: State) -> dict:
@@ -293,25 +492,37 @@ def format_response(state: State) -> dict:
 
 # -----------------------------------------------------------------------------
 # Construir el grafo RAG (chaining avanzado con múltiples nodos especializados)
-# Flujo: preparar pregunta -> cargar recursos -> recuperar contexto -> generar respuesta -> formatear salida
+# Flujo: preparar pregunta -> cargar recursos -> recuperar documentos -> ensamblar contexto -> cache semántica
+#        -> (miss) generar respuesta -> formatear salida   |   (hit) formatear salida
 # -----------------------------------------------------------------------------
-builder = StateGraph(State)
-builder.add_node("prepare", prepare_question)  # Prepara la pregunta
-builder.add_node("load", load_retriever)  # Carga retriever si necesario
-builder.add_node("retrieve", retrieve_context)  # Recupera contexto de docs
-builder.add_node("generate", generate_response)  # Genera respuesta con LLM
-builder.add_node("format", format_response)  # Formatea la respuesta final
-
-# Definir flujo secuencial con edges
-builder.add_edge(START, "prepare")
-builder.add_edge("prepare", "load")
-builder.add_edge("load", "retrieve")
-builder.add_edge("retrieve", "generate")
-builder.add_edge("generate", "format")
-builder.add_edge("format", END)
-
-# Compilar el grafo en una aplicación ejecutable
-app = builder.compile()
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Compila el grafo RAG; `checkpointer` persiste el historial por thread_id."""
+    builder = StateGraph(State)
+    builder.add_node("prepare", prepare_question)  # Prepara la pregunta
+    builder.add_node("load", load_retriever)  # Carga retriever si necesario
+    builder.add_node("retrieve", retrieve_context)  # Recupera contexto de docs
+    builder.add_node("assemble", assemble_context_node)  # Deduplica y ajusta el contexto al presupuesto de tokens
+    builder.add_node("cache", check_semantic_cache)  # Reutiliza respuestas de preguntas equivalentes
+    builder.add_node("generate", generate_response)  # Genera respuesta con LLM
+    builder.add_node("format", format_response)  # Formatea la respuesta final
+
+    # Definir flujo secuencial con edges
+    builder.add_edge(START, "prepare")
+    builder.add_edge("prepare", "load")
+    builder.add_edge("load", "retrieve")
+    builder.add_edge("retrieve", "assemble")
+    builder.add_edge("assemble", "cache")
+    builder.add_conditional_edges("cache", route_after_cache, {
+        "generate": "generate",
+        "format": "format",
+    })
+    builder.add_edge("generate", "format")
+    builder.add_edge("format", END)
+    return builder.compile(checkpointer=checkpointer)
+
+# Compilar el grafo en una aplicación ejecutable (sin checkpointer: langgraph dev usa el suyo)
+# Los nodos load/retrieve/generate son async: usar app.ainvoke/app.astream
+app = build_graph()
 
 # -------------------------
 # Funciones de entrada y utilidades (usadas por langgraph.json y pruebas)
@@ -331,24 +542,124 @@ async def async_answer(question: str) -> str:
         if not isinstance(question, str):
             question = str(question)
         
-        result = await asyncio.to_thread(chain.invoke, {"question": question})
+        result = await chain.ainvoke({"question": question})
         return result
         
     except Exception as e:
         error_msg = f"Error procesando la pregunta: {str(e)}"
-        print(error_msg)
+        logger.exception("Error procesando la pregunta")
         return f"Lo siento, ocurrió un error al procesar tu pregunta. {error_msg}"
 
+def _batch_search(vectorstore, vectors: List[List[float]], k: int) -> List[List[Document]]:
+    """Una sola búsqueda FAISS vectorizada para toda la matriz de consultas."""
+    import faiss
+    import numpy as np
+
+    x = np.asarray(vectors, dtype=np.float32)
+    if getattr(vectorstore, "_normalize_L2", False):
+        faiss.normalize_L2(x)
+    _, positions = vectorstore.index.search(x, k)
+    return [
+        [vectorstore.docstore.search(vectorstore.index_to_docstore_id[p]) for p in row if p != -1]
+        for row in positions
+    ]
+
+async def abatch_answer(
+    questions: Sequence[str],
+    max_concurrency: int = OLLAMA_NUM_PARALLEL,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Responde muchas preguntas (evaluaciones nocturnas, pre-generación de FAQs).
+
+    Todas las consultas se embeben en una sola llamada por lotes y se buscan con
+    una única búsqueda FAISS sobre la matriz de vectores; luego la generación se
+    reparte con un semáforo de `max_concurrency` (los slots paralelos de Ollama).
+    Los resultados se entregan en orden de finalización como dicts
+    {"index", "question", "answer", "cache_hit"} (o "error" si falló esa pregunta).
+    """
+    from src.retrieval.context import assemble_context
+    from src.retrieval.hybrid import HybridRetriever
+    from src.retrieval.semantic_cache import context_fingerprint
+
+    retriever = await warm_up()
+    semantic_cache = _get_semantic_cache()
+    questions = [str(q) for q in questions]
+    vectors: List[Optional[List[float]]] = [None] * len(questions)
+    contexts = [""] * len(questions)
+    if _embeddings_cache is not None and questions:
+        vectors = await asyncio.to_thread(_embeddings_cache.embed_documents, questions)
+        if isinstance(retriever, HybridRetriever):
+            docs = await asyncio.to_thread(retriever.batch_search, questions, vectors)
+            contexts = [assemble_context(d)[0] for d in docs]
+        elif retriever is not None:
+            k = retriever.search_kwargs.get("k", RETRIEVER_K)
+            docs = await asyncio.to_thread(_batch_search, retriever.vectorstore, vectors, k)
+            contexts = [assemble_context(d)[0] for d in docs]
+
+    llm = _get_llm()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _answer(i: int) -> Dict[str, Any]:
+        question, context, vector = questions[i], contexts[i], vectors[i]
+        result: Dict[str, Any] = {"index": i, "question": question, "cache_hit": False}
+        fingerprint = context_fingerprint(context)
+        if SEMANTIC_CACHE_ENABLED and vector is not None:
+            cached = semantic_cache.lookup(vector, fingerprint)
+            record_cache("semantic", hits=int(cached is not None), misses=int(cached is None))
+            if cached is not None:
+                return {**result, "answer": cached, "cache_hit": True}
+        async with semaphore:
+            try:
+                response = await llm.ainvoke(_build_messages(question, context))
+            except Exception as e:
+                return {**result, "error": str(e)}
+        answer = str(response.content).strip()
+        if SEMANTIC_CACHE_ENABLED and vector is not None:
+            semantic_cache.store(vector, question, answer, fingerprint)
+        return {**result, "answer": answer}
+
+    tasks = [asyncio.create_task(_answer(i)) for i in range(len(questions))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()  # si el consumidor corta la iteración, no se siguen generando respuestas
+
+async def ask_stream(question: str, thread_id: str = "rag-demo") -> AsyncIterator[str]:
+    """
+    Generador asíncrono: entrega la respuesta RAG por fragmentos a medida que
+    Ollama genera tokens (el grafo es async, por eso se consume con `async for`).
+    """
+    async for chunk, metadata in local_app(build_graph).astream(
+        {"messages": [HumanMessage(content=question)]},
+        config={"configurable": {"thread_id": thread_id}},
+        stream_mode="messages",
+    ):
+        node = metadata.get("langgraph_node")
+        if node == "generate" and isinstance(chunk, AIMessageChunk) and chunk.content:
+            yield chunk.content
+        elif node == "cache" and isinstance(chunk, AIMessage):
+            yield chunk.content  # hit de la cache semántica: llega completa
+
 async def clear_cache():
     """Limpia las caches globales para recargar recursos si es necesario."""
-    global _retriever_cache, _chain_cache, _embeddings_cache
+    global _retriever_cache, _chain_cache, _embeddings_cache, _resources_loaded
     _retriever_cache = None
     _chain_cache = None
     _embeddings_cache = None
+    _resources_loaded = False
+    _get_semantic_cache().clear()
+
+def semantic_cache_stats() -> Dict[str, float]:
+    """Contadores de la cache semántica (hits, misses, hit_ratio, evictions, entries)."""
+    return _get_semantic_cache().stats()
 
 async def check_index_exists() -> bool:
-    """Verifica si el índice FAISS existe en disco."""
-    idx_path = os.path.join(FAISS_INDEX_DIR)
+    """Verifica si el índice FAISS existe en disco (en la versión publicada)."""
+    from src.retrieval.index import resolve_index_dir
+
+    idx_path = resolve_index_dir(FAISS_INDEX_DIR, FAISS_INDEX_NAME)
     faiss_file = os.path.join(idx_path, f"{FAISS_INDEX_NAME}.faiss")
     pkl_file = os.path.join(idx_path, f"{FAISS_INDEX_NAME}.pkl")
     return os.path.exists(faiss_file) and os.path.exists(pkl_file)
\ No newline at end of file
@@ -1,105 +1,87 @@
-from langchain_ollama import ChatOllama
-from langchain.agents import create_react_agent
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langgraph.graph import START, END, StateGraph
-from typing import Sequence, TypedDict
+import os
+from src.core.checkpoint import local_app
+from src.core.tiering import get_tiered_model
+from src.core.tool_agent import build_tool_agent
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from typing import Optional, Sequence, TypedDict
 from typing_extensions import Annotated
 from langgraph.graph.message import add_messages
-from langchain_core.tools import tool
-import requests
+from src.core.tool_runtime import make_tool, runtime
 
-# Define tools
-@tool
-def getProducts() -> str:
+# Service URLs (configurable to test against a local stub server)
+PRODUCTS_API_URL = os.getenv("PRODUCTS_API_URL", "https://api.escuelajs.co/api/v1/products")
+GEOCODING_API_URL = os.getenv("GEOCODING_API_URL", "https://geocoding-api.open-meteo.com/v1/search")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.open-meteo.com/v1/forecast")
+
+# Per-tool cache TTLs in seconds
+PRODUCTS_TTL = float(os.getenv("TOOL_PRODUCTS_TTL", "300"))  # then revalidated with ETag
+GEOCODING_TTL = float(os.getenv("TOOL_GEOCODING_TTL", str(7 * 86400)))  # coordinates barely change
+WEATHER_TTL = float(os.getenv("TOOL_WEATHER_TTL", "600"))
+PRODUCTS_LIMIT = 5
+
+# Define tools (async on the shared runtime; make_tool also exposes a sync version)
+async def getProducts() -> str:
     """Get a list of available products."""
-    # Mock or real API call to get products
     try:
-        response = requests.get("https://fakeapi.platzi.com/en/rest/products")
-        products = response.json()
-        return f"Productos disponibles: {[p['title'] for p in products[:5]]}"  # Limit for brevity
-    except:
+        products = await runtime.get_json(
+            PRODUCTS_API_URL,
+            params={"offset": 0, "limit": PRODUCTS_LIMIT},  # only what the answer shows
+            cache_name="products", ttl=PRODUCTS_TTL, revalidate=True,
+        )
+        return f"Productos disponibles: {[p['title'] for p in products[:PRODUCTS_LIMIT]]}"
+    except Exception:
         return "Error al obtener productos."
 
-@tool
-def getWeather(city: str) -> str:
+async def getWeather(city: str) -> str:
     """Get the current weather for a given city."""
-    # Get lat/long from geocoding API
     try:
-        geo_response = requests.get(f"https://geocoding-api.open-meteo.com/v1/search?name={city}")
-        geo_data = geo_response.json()
-        if geo_data.get("results"):
-            lat = geo_data["results"][0]["latitude"]
-            lon = geo_data["results"][0]["longitude"]
-            # Get weather
-            weather_response = requests.get(f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current_weather=true")
-            weather_data = weather_response.json()
-            current = weather_data.get("current_weather", {})
-            return f"El clima en {city}: Temperatura {current.get('temperature', 'N/A')}°C, Viento {current.get('windspeed', 'N/A')} km/h."
-        else:
+        geo_data = await runtime.get_json(
+            GEOCODING_API_URL, params={"name": city, "count": 1}, cache_name="geocoding", ttl=GEOCODING_TTL,
+        )
+        if not geo_data.get("results"):
             return f"No se encontró ubicación para {city}."
-    except:
+        lat = round(geo_data["results"][0]["latitude"], 2)  # ~1 km: nearby requests share the cache entry
+        lon = round(geo_data["results"][0]["longitude"], 2)
+        weather_data = await runtime.get_json(
+            WEATHER_API_URL,
+            params={"latitude": lat, "longitude": lon, "current_weather": "true"},
+            cache_name="weather", ttl=WEATHER_TTL,
+        )
+        current = weather_data.get("current_weather", {})
+        return f"El clima en {city}: Temperatura {current.get('temperature', 'N/A')}°C, Viento {current.get('windspeed', 'N/A')} km/h."
+    except Exception:
         return "Error al obtener el clima."
 
 # Tools list
-tools = [getProducts, getWeather]
+tools = [make_tool(getProducts), make_tool(getWeather)]
 
 # State
 class State(TypedDict, total=False):
     messages: Annotated[Sequence, add_messages]
 
-# Model
-model = ChatOllama(model="qwen2.5:7b")
-
-# Standard ReAct prompt
-system_prompt = """
-Answer the following questions as best you can. You have access to the following tools:
-
-{tools}
-
-Use the following format:
-
-Question: the input question you must answer
-Thought: you should always think about what to do
-Action: the action to take, should be one of [{tool_names}]
-Action Input: the input to the action
-Observation: the result of the action
-... (this Thought/Action/Action Input/Observation can repeat N times)
-Thought: I now know the final answer
-Final Answer: the final answer to the original input question
-
-You are a sales assistant capable of finding products and providing weather information for a city.
-
-Begin!
-
-Question: {input}
-Thought: {agent_scratchpad}
-"""
-
-prompt = PromptTemplate.from_template(system_prompt)
-agent = create_react_agent(model, tools, prompt)
+# Model (created on the first turn, not at import time)
+def get_model():
+    return get_tiered_model("qwen2.5:7b")
 
-# Node
-def react_node(state: State) -> dict:
-    messages = state.get("messages", [])
-    response = agent.invoke({"input": messages[-1].content if messages else ""})
-    return {"messages": [AIMessage(content=response.get("output", "No response."))]}
+system_prompt = (
+    "You are a sales assistant capable of finding products and providing weather information for a city. "
+    "Use the tools when you need data and answer in the user's language."
+)
 
-# Graph
-builder = StateGraph(State)
-builder.add_node("react", react_node)
-builder.add_edge(START, "react")
-builder.add_edge("react", END)
+# Graph: native tool calling; several tool calls from one model turn run concurrently
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    return build_tool_agent(State, get_model, tools, system_prompt, node_name="react", checkpointer=checkpointer)
 
-app = builder.compile()
+app = build_graph()
 
-# Helper for CLI/tests
+# Helper for CLI/tests (history per thread_id via src.core.checkpoint)
 def ask(text: str, thread_id: str = "react-demo") -> str:
-    result = app.invoke(
+    result = local_app(build_graph).invoke(
         {"messages": [HumanMessage(content=text)]},
         config={"configurable": {"thread_id": thread_id}},
     )
     last = result["messages"][-1]
     return getattr(last, "content", str(last))
 
-__all__ = ["app", "ask", "State"]
\ No newline at end of file
+__all__ = ["app", "build_graph", "ask", "State"]
\ No newline at end of file
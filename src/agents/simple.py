@@ -1,7 +1,8 @@
 # src/agents/simple.py
 """
 Agente simple 100% open-source con LangGraph + LangChain (Ollama).
-Funciona con `uv run langgraph dev` y también permite probar con la función ask().
+Funciona con `uv run langgraph dev` y también permite probar con las funciones
+ask() (respuesta completa) y ask_stream() (tokens a medida que se generan).
 
 Requisitos en .env:
   MODEL=qwen2.5:7b-instruct
@@ -12,18 +13,24 @@ Requisitos en .env:
 from __future__ import annotations
 
 import os
-from typing import Optional, Sequence, TypedDict
+from typing import Iterator, Optional, Sequence, TypedDict
 from typing_extensions import Annotated  # <— IMPORTANTE
 
 from dotenv import load_dotenv
 
-from langchain_ollama import ChatOllama
+from src.core.checkpoint import local_app
+from src.core.contact_rules import extract_name
+from src.core.history import RollingHistory
+from src.core.tiering import get_tiered_model
 from langchain_core.messages import (
     AIMessage,
+    AIMessageChunk,
     BaseMessage,
     HumanMessage,
     SystemMessage,
 )
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import START, END, StateGraph
 from langgraph.graph.message import add_messages
 
@@ -43,11 +50,19 @@ class State(TypedDict, total=False):
     messages: Annotated[Sequence[BaseMessage], add_messages]
     customer_name: Optional[str]
     turn_count: int
+    summary: str  # Resumen de los turnos que ya salieron de la ventana (src.core.history)
+    summary_upto: int  # Mensajes incluidos en el resumen
 
 # -----------------------------------------------------------------------------
 # LLM local (solo OSS)
 # -----------------------------------------------------------------------------
-llm = ChatOllama(model=MODEL, base_url=BASE_URL, temperature=TEMPERATURE)
+def _get_llm():
+    """Cliente del registro del proceso; se crea en el primer turno, no al importar.
+    Los turnos sencillos los atiende el modelo pequeño (src/core/tiering.py)."""
+    return get_tiered_model(MODEL, base_url=BASE_URL, temperature=TEMPERATURE)
+
+# Últimos turnos literales + resumen en segundo plano de los anteriores
+history = RollingHistory()
 
 SYSTEM_BASE = (
     "Eres un asistente útil y conciso. "
@@ -60,18 +75,15 @@ SYSTEM_BASE = (
 # -----------------------------------------------------------------------------
 def ensure_name(state: State) -> dict:
     """
-    Extrae de forma simple un nombre si el último HumanMessage contiene 'me llamo X'.
-    (Ejemplo mínimo; no es NER real.)
+    Extrae un nombre si el último HumanMessage contiene 'me llamo X', 'mi nombre es X'...
+    (Reglas de src.core.contact_rules; no es NER real.)
     """
-    history = state.get("messages", [])
-    last_human = next((m for m in reversed(history) if isinstance(m, HumanMessage)), None)
+    messages = state.get("messages", [])
+    last_human = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
     if last_human:
-        text = str(last_human.content).lower()
-        if "me llamo" in text:
-            # Toma la primera palabra después de 'me llamo'
-            name = text.split("me llamo", 1)[1].strip(" .,:;!?\n\t").split()[0].title()
-            if name:
-                return {"customer_name": name}
+        name = extract_name(str(last_human.content))
+        if name:
+            return {"customer_name": name}
     return {}
 
 def router(state: State) -> str:
@@ -82,40 +94,48 @@ def ask_name(state: State) -> dict:
     """Agrega un mensaje de la IA pidiendo el nombre (no pisa historial)."""
     return {"messages": [AIMessage(content="¿Cómo te llamas?")]}
 
-def reason(state: State) -> dict:
+def reason(state: State, config: RunnableConfig) -> dict:
     """
-    Llama al LLM con SystemMessage + historial. Devuelve solo lo nuevo.
+    Llama al LLM con SystemMessage + ventana de historial (resumen + últimos
+    turnos, ver `history`). Devuelve solo lo nuevo.
     Si el historial viene vacío, inyecta un prompt mínimo para evitar errores.
+    Se propaga `config` para que, con stream_mode="messages", los tokens salgan
+    del grafo a medida que Ollama los genera.
     """
     name = state.get("customer_name")
     system_text = SYSTEM_BASE + (f" El usuario se llama {name}." if name else "")
-    history = list(state.get("messages", []))
-    if not history:
-        history = [HumanMessage(content="Hola, ¿me puedes saludar?")]
+    recent = history.prompt_messages(state)
+    if not recent:
+        recent = [HumanMessage(content="Hola, ¿me puedes saludar?")]
 
-    msgs = [SystemMessage(content=system_text)] + history
-    ai_reply = llm.invoke(msgs)  # -> AIMessage
+    msgs = [SystemMessage(content=system_text)] + recent
+    ai_reply = _get_llm().invoke(msgs, config)  # -> AIMessage
     turn = state.get("turn_count", 0) + 1
     return {"messages": [ai_reply], "turn_count": turn}
 
 # -----------------------------------------------------------------------------
 # Grafo
 # -----------------------------------------------------------------------------
-builder = StateGraph(State)
-builder.add_node("ensure_name", ensure_name)
-builder.add_node("ask_name", ask_name)
-builder.add_node("reason", reason)
-
-builder.add_edge(START, "ensure_name")
-builder.add_conditional_edges("ensure_name", router, {
-    "ask_name": "ask_name",
-    "reason": "reason",
-})
-builder.add_edge("ask_name", END)
-builder.add_edge("reason", END)
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """Compila el grafo; `checkpointer` guarda el historial de cada thread_id."""
+    builder = StateGraph(State)
+    builder.add_node("history", history.node)
+    builder.add_node("ensure_name", ensure_name)
+    builder.add_node("ask_name", ask_name)
+    builder.add_node("reason", reason)
+
+    builder.add_edge(START, "history")
+    builder.add_edge("history", "ensure_name")
+    builder.add_conditional_edges("ensure_name", router, {
+        "ask_name": "ask_name",
+        "reason": "reason",
+    })
+    builder.add_edge("ask_name", END)
+    builder.add_edge("reason", END)
+    return builder.compile(checkpointer=checkpointer)
 
 # Importante: NO usar checkpointer aquí (langgraph dev maneja persistencia)
-app = builder.compile()
+app = build_graph()
 
 # -----------------------------------------------------------------------------
 # Helper para CLI/tests
@@ -123,13 +143,30 @@ app = builder.compile()
 def ask(text: str, thread_id: str = "local-demo") -> str:
     """
     Envía un turno de conversación y devuelve el último texto de la IA.
-    Con langgraph dev, la persistencia por thread la maneja el servidor.
+    Con langgraph dev, la persistencia por thread la maneja el servidor; aquí se
+    usa el checkpointer de src.core.checkpoint (CHECKPOINTER en .env).
     """
-    result = app.invoke(
+    result = local_app(build_graph).invoke(
         {"messages": [HumanMessage(content=text)]},
         config={"configurable": {"thread_id": thread_id}},
     )
     last = result["messages"][-1]
     return getattr(last, "content", str(last))
 
-__all__ = ["app", "ask", "State"]
+def ask_stream(text: str, thread_id: str = "local-demo") -> Iterator[str]:
+    """
+    Igual que ask(), pero genera el texto de la IA por fragmentos a medida que llega.
+    Usa stream_mode="messages": el primer token aparece sin esperar la respuesta completa.
+    """
+    for chunk, metadata in local_app(build_graph).stream(
+        {"messages": [HumanMessage(content=text)]},
+        config={"configurable": {"thread_id": thread_id}},
+        stream_mode="messages",
+    ):
+        node = metadata.get("langgraph_node")
+        if node == "reason" and isinstance(chunk, AIMessageChunk) and chunk.content:
+            yield chunk.content
+        elif node == "ask_name" and isinstance(chunk, AIMessage):
+            yield chunk.content  # mensaje fijo, llega completo
+
+__all__ = ["app", "build_graph", "ask", "ask_stream", "State"]
@@ -0,0 +1,103 @@
+# src/api/graphs.py
+"""
+Registro de grafos para la API: los mismos que declara langgraph.json.
+
+Cada worker importa (y por tanto compila) cada grafo una sola vez y precarga sus
+recursos pesados (embeddings, índices) al arrancar, no en cada petición. Cada
+grafo tiene su propio límite de concurrencia para aplicar backpressure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import inspect
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional
+
+from src.core.checkpoint import local_app
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LANGGRAPH_CONFIG = os.getenv("LANGGRAPH_CONFIG", os.path.join(ROOT_DIR, "langgraph.json"))
+API_GRAPHS = os.getenv("API_GRAPHS", "")  # Lista separada por comas; vacío = todos los de langgraph.json
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", "8"))  # Por grafo; API_MAX_CONCURRENCY_<GRAFO> lo sobrescribe
+
+# Nodos cuyos tokens son la respuesta al usuario (el resto, p. ej. el extractor, no se emite)
+REPLY_NODES: Dict[str, FrozenSet[str]] = {
+    "agent": frozenset({"agent"}),
+    "simple": frozenset({"reason", "ask_name"}),
+    "rag": frozenset({"generate", "cache"}),
+    "booking": frozenset({"booking"}),
+    "react": frozenset({"react"}),
+    "support": frozenset({"converse"}),
+}
+
+@dataclass
+class GraphEntry:
+    name: str
+    graph: Any
+    module: Any
+    limit: int
+    reply_nodes: Optional[FrozenSet[str]] = None  # None = todos los nodos
+    in_flight: int = 0
+    semaphore: asyncio.Semaphore = field(init=False)
+
+    def __post_init__(self):
+        self.semaphore = asyncio.Semaphore(self.limit)
+
+    async def acquire(self, timeout: float) -> None:
+        """Espera un slot; lanza asyncio.TimeoutError si no se libera ninguno a tiempo."""
+        await asyncio.wait_for(self.semaphore.acquire(), timeout=timeout)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+
+def _module_name(path: str) -> str:
+    """'./src/agents/rag.py' -> 'src.agents.rag' (así funcionan los imports absolutos del repo)."""
+    path = os.path.normpath(path)
+    return os.path.splitext(path)[0].replace(os.sep, ".")
+
+def load_graph_specs(config_path: str = LANGGRAPH_CONFIG) -> Dict[str, str]:
+    """Lee {nombre: 'ruta.py:variable'} desde langgraph.json, filtrado por API_GRAPHS."""
+    with open(config_path, encoding="utf-8") as f:
+        specs = json.load(f)["graphs"]
+    selected = {g.strip() for g in API_GRAPHS.split(",") if g.strip()}
+    return {name: spec for name, spec in specs.items() if not selected or name in selected}
+
+class GraphRegistry:
+    """Grafos compilados del proceso, con su semáforo de concurrencia."""
+
+    def __init__(self):
+        self.entries: Dict[str, GraphEntry] = {}
+
+    def load(self, specs: Optional[Dict[str, str]] = None) -> None:
+        for name, spec in (specs or load_graph_specs()).items():
+            path, attr = spec.rsplit(":", 1)
+            module = importlib.import_module(_module_name(path))
+            limit = int(os.getenv(f"API_MAX_CONCURRENCY_{name.upper()}", str(API_MAX_CONCURRENCY)))
+            # Con build_graph se compila con el checkpointer del proceso: la API conserva los threads
+            builder = getattr(module, "build_graph", None)
+            self.entries[name] = GraphEntry(
+                name=name,
+                graph=local_app(builder) if builder is not None else getattr(module, attr),
+                module=module,
+                limit=limit,
+                reply_nodes=REPLY_NODES.get(name),
+            )
+
+    async def warm_up(self) -> None:
+        """Llama al `warm_up()` de cada módulo que lo tenga (p. ej. rag carga embeddings e índice)."""
+        for entry in self.entries.values():
+            hook = getattr(entry.module, "warm_up", None)
+            if hook is None:
+                continue
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+
+    def get(self, name: str) -> Optional[GraphEntry]:
+        return self.entries.get(name)
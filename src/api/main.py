@@ -0,0 +1,138 @@
+# src/api/main.py
+"""
+API HTTP asíncrona para los agentes (FastAPI).
+
+Endpoints:
+  GET  /                      estado del servidor
+  GET  /graphs                grafos disponibles y su límite de concurrencia
+  POST /chat/{graph}          respuesta en streaming (Server-Sent Events) con `astream`
+  POST /chat/{graph}/invoke   respuesta completa en JSON
+  GET  /metrics               métricas en formato Prometheus (src/core/metrics.py)
+
+Desarrollo:  uv run fastapi dev src/api/main.py
+Producción:  uv run python -m src.api.server --workers 4
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from pydantic import BaseModel
+
+load_dotenv()  # antes de importar los grafos: leen su configuración al importarse
+
+from src.api.graphs import GraphEntry, GraphRegistry
+from src.core import metrics, router
+from src.core.logs import configure_logging
+
+configure_logging()
+
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "10"))  # Segundos esperando un slot antes de responder 503
+
+registry = GraphRegistry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precarga por proceso: cada worker compila los grafos y carga embeddings/índices una vez
+    registry.load()
+    await registry.warm_up()
+    yield
+
+app = FastAPI(title="my-course-agent", lifespan=lifespan)
+
+class Message(BaseModel):
+    message: str
+    thread_id: Optional[str] = None
+
+def _get_entry(graph: str) -> GraphEntry:
+    entry = registry.get(graph)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Grafo desconocido: {graph}")
+    return entry
+
+async def _acquire(entry: GraphEntry) -> None:
+    """Backpressure: espera un slot del grafo o responde 503 para que el cliente reintente."""
+    try:
+        await entry.acquire(API_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail=f"El grafo {entry.name} está saturado, intenta de nuevo",
+            headers={"Retry-After": str(int(API_QUEUE_TIMEOUT))},
+        )
+
+def _inputs(entry: GraphEntry, item: Message) -> tuple:
+    thread_id = item.thread_id or str(uuid.uuid4())
+    return (
+        {"messages": [HumanMessage(content=item.message)]},
+        # graph_id: etiqueta de las métricas por nodo (igual que en langgraph dev)
+        {"configurable": {"thread_id": thread_id}, "metadata": {"graph_id": entry.name}},
+        thread_id,
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/")
+async def health():
+    return {"status": "ok", "graphs": list(registry.entries)}
+
+@app.get("/graphs")
+async def graphs():
+    return {
+        name: {"max_concurrency": entry.limit, "in_flight": entry.in_flight}
+        for name, entry in registry.entries.items()
+    }
+
+@app.get("/backends")
+async def backends():
+    return {"backends": router.backends_status()}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/chat/{graph}")
+async def chat_stream(graph: str, item: Message):
+    entry = _get_entry(graph)
+    await _acquire(entry)
+    inputs, config, thread_id = _inputs(entry, item)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            yield _sse("start", {"thread_id": thread_id})
+            async for chunk, metadata in entry.graph.astream(inputs, config=config, stream_mode="messages"):
+                node = metadata.get("langgraph_node")
+                if entry.reply_nodes is not None and node not in entry.reply_nodes:
+                    continue
+                # Tokens del LLM, o mensajes completos de nodos que no generan (hit de cache, preguntas fijas)
+                if isinstance(chunk, (AIMessageChunk, AIMessage)) and chunk.content:
+                    yield _sse("token", {"text": chunk.content, "node": node})
+            yield _sse("end", {"thread_id": thread_id})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            entry.release()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/chat/{graph}/invoke")
+async def chat_invoke(graph: str, item: Message):
+    entry = _get_entry(graph)
+    await _acquire(entry)
+    inputs, config, thread_id = _inputs(entry, item)
+    try:
+        result = await entry.graph.ainvoke(inputs, config=config)
+    finally:
+        entry.release()
+    last = result["messages"][-1]
+    return {"thread_id": thread_id, "text": getattr(last, "content", str(last))}
@@ -0,0 +1,34 @@
+# src/api/server.py
+"""
+Arranque de la API con varios procesos worker (uvicorn).
+
+Cada worker ejecuta el lifespan de `src.api.main`: importa los grafos de
+langgraph.json y llama a sus `warm_up()`, así embeddings e índices se cargan una
+vez por proceso y no por petición.
+
+Uso:
+    uv run python -m src.api.server --workers 4 --port 8000
+"""
+
+import argparse
+import os
+
+import uvicorn
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor HTTP de los agentes")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "2")))
+    args = parser.parse_args()
+
+    uvicorn.run(
+        "src.api.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_keep_alive=30,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# src/bench/booking.py
+"""
+Benchmark de la agenda de reservas (src/booking/store.py).
+
+Mide, con miles de doctores y agendas ya ocupadas:
+  - latencia de consulta de huecos libres (free_slots) y de is_free
+  - reservas concurrentes: muchos hilos compitiendo por los mismos huecos; se
+    comprueba que cada hueco se asigna exactamente una vez
+
+Uso:
+  uv run python -m src.bench.booking --doctors 5000 --threads 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from src.booking.store import BookingError, BookingStore, SlotTaken
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_us": pick(0.50) * 1e6, "p95_us": pick(0.95) * 1e6, "p99_us": pick(0.99) * 1e6}
+
+def _slots(store: BookingStore, days: int, now: datetime) -> List[datetime]:
+    out = []
+    for d in range(1, days + 1):
+        out.extend(store.free_slots("-", (now + timedelta(days=d)).date(), now=now))
+    return out
+
+def run(doctors: int, prefill: float, queries: int, threads: int, contended: int, db: str, seed: int) -> Dict[str, object]:
+    rng = random.Random(seed)
+    store = BookingStore(db)
+    now = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    slots = _slots(store, store.max_days_ahead - 1, now)
+    names = [f"doctor-{i}" for i in range(doctors)]
+
+    # Agendas ya ocupadas en una fracción `prefill` de sus huecos
+    t0 = time.perf_counter()
+    prefilled = 0
+    for name in names:
+        for start in rng.sample(slots, int(len(slots) * prefill)):
+            try:
+                store.book(name, "relleno", start, now=now)
+                prefilled += 1
+            except BookingError:
+                pass
+    prefill_s = time.perf_counter() - t0
+
+    # Consultas de disponibilidad
+    lookups, checks = [], []
+    for _ in range(queries):
+        name, start = rng.choice(names), rng.choice(slots)
+        t = time.perf_counter()
+        store.free_slots(name, start.date(), now=now)
+        lookups.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        store.is_free(name, start)
+        checks.append(time.perf_counter() - t)
+
+    # Reservas concurrentes: `contended` huecos libres, cada uno pedido por todos los hilos
+    targets = []
+    while len(targets) < contended:
+        name, start = rng.choice(names), rng.choice(slots)
+        if store.is_free(name, start) and (name, start) not in targets:
+            targets.append((name, start))
+    wins: Counter = Counter()
+    conflicts = 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(worker_id: int) -> None:
+        nonlocal conflicts
+        order = targets[:]
+        random.Random(seed + worker_id).shuffle(order)
+        barrier.wait()
+        for name, start in order:
+            try:
+                store.book(name, f"paciente-{worker_id}", start, now=now)
+                with lock:
+                    wins[(name, start)] += 1
+            except SlotTaken:
+                with lock:
+                    conflicts += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(worker, range(threads)))
+    concurrent_s = time.perf_counter() - t0
+    attempts = threads * contended
+    store.close()
+
+    return {
+        "doctors": doctors,
+        "slots_per_doctor": len(slots),
+        "prefilled_bookings": prefilled,
+        "prefill_bookings_per_s": prefilled / prefill_s if prefill_s else 0.0,
+        "free_slots": _percentiles(lookups),
+        "is_free": _percentiles(checks),
+        "concurrent_attempts": attempts,
+        "concurrent_attempts_per_s": attempts / concurrent_s if concurrent_s else 0.0,
+        "conflicts": conflicts,
+        "double_bookings": sum(1 for n in wins.values() if n > 1),
+        "unbooked_targets": contended - len(wins),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la agenda de reservas")
+    parser.add_argument("--doctors", type=int, default=5000)
+    parser.add_argument("--prefill", type=float, default=0.3, help="fracción de huecos ya ocupados")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--contended", type=int, default=500, help="huecos que piden todos los hilos a la vez")
+    parser.add_argument("--db", default=":memory:")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    result = run(args.doctors, args.prefill, args.queries, args.threads, args.contended, args.db, args.seed)
+    for key, value in result.items():
+        if isinstance(value, dict):
+            value = ", ".join(f"{k}={v:.1f}" for k, v in value.items())
+        elif isinstance(value, float):
+            value = f"{value:,.0f}"
+        print(f"{key:28s} {value}")
+    if result["double_bookings"] or result["unbooked_targets"]:
+        raise SystemExit("Error: algún hueco se asignó dos veces o quedó sin asignar")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+# src/bench/fakes.py
+"""
+Modelo de chat y embeddings falsos, deterministas, para medir los grafos sin Ollama
+ni HuggingFace.
+
+FakeChatModel simula la latencia hasta el primer token y una velocidad de
+generación (tokens/s), en sync, async y streaming. Si tiene tools enlazadas pide
+las que aparecen en su guion (`tool_args`) en la primera ronda de cada turno del
+usuario; con `tool_choice` (with_structured_output) llama siempre a la tool pedida
+con argumentos rellenados a partir del esquema. La respuesta depende solo de la
+entrada, así dos ejecuciones con la misma carga hacen exactamente el mismo trabajo.
+
+Con `prompt_tokens_per_second` también cuesta evaluar el prompt y, con `kv_slots`,
+se simula la cache KV de Ollama (con OLLAMA_MULTIUSER_CACHE): cada slot recuerda su
+último prompt y solo se evalúa lo que va tras el prefijo común más largo. El prompt se aplana como en
+las plantillas de chat de Ollama (todos los mensajes de sistema al principio).
+
+FakeEmbeddings produce vectores de bolsa de palabras con hashing (normalizados),
+así que textos parecidos dan vectores parecidos y la cache semántica y la
+recuperación se comportan como con un modelo real.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+_WORDS = (
+    "claro", "según", "la", "información", "disponible", "te", "recomiendo", "revisar", "el", "horario",
+    "de", "atención", "y", "los", "datos", "que", "indicas", "para", "confirmar", "cita", "producto",
+    "clima", "resultado", "consulta", "respuesta",
+)
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+def _flatten(messages: List[BaseMessage]) -> str:
+    """Prompt plano como lo arma Ollama: los mensajes de sistema juntos arriba y luego el resto en orden."""
+    system = "\n\n".join(str(m.content) for m in messages if m.type == "system")
+    rest = "".join(
+        f"<|{m.type}|>{m.content}{json.dumps(getattr(m, 'tool_calls', None) or '')}"
+        for m in messages if m.type != "system"
+    )
+    return f"<|system|>{system}{rest}<|ai|>"
+
+def _fill_args(parameters: Dict[str, Any], script: Dict[str, Any]) -> Dict[str, Any]:
+    """Argumentos válidos para un esquema JSON: los del guion y, para los obligatorios, un valor del tipo."""
+    properties = parameters.get("properties", {})
+    args = {k: v for k, v in script.items() if k in properties}
+    defaults = {"string": "demo", "integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}
+    for name in parameters.get("required", []):
+        if name not in args:
+            args[name] = defaults.get(properties.get(name, {}).get("type"), None)
+    return args
+
+class FakeChatModel(BaseChatModel):
+    """Chat model determinista con latencia y velocidad de tokens configurables."""
+
+    model: str = "fake"
+    latency: float = 0.05  # segundos hasta el primer token
+    tokens_per_second: float = 200.0  # 0 = instantáneo
+    response_tokens: int = 48
+    tool_args: Dict[str, Dict[str, Any]] = {}  # guion: tool -> argumentos
+    empty_rate: float = 0.0  # fracción (determinista por entrada) de respuestas vacías, para forzar escalados
+    prompt_tokens_per_second: float = 0.0  # evaluación del prompt; 0 = gratis
+    kv_slots: int = 0  # slots con cache KV de prefijo (OLLAMA_NUM_PARALLEL); 0 = sin cache
+
+    _slots: List[str] = PrivateAttr(default_factory=list)  # último prompt de cada slot, el más reciente al final
+    _slots_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "latency": self.latency, "tokens_per_second": self.tokens_per_second}
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any):
+        formatted = [convert_to_openai_tool(t) for t in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    # -------------------------
+    # Respuesta determinista
+    # -------------------------
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]], tool_choice: Any) -> AIMessage:
+        seed = _digest("\n".join(str(m.content) for m in messages))
+        if tools:
+            functions = [t["function"] for t in tools]
+            if tool_choice:
+                # with_structured_output: exactamente una llamada a la tool del esquema
+                fn = functions[0]
+                if isinstance(tool_choice, str) and tool_choice not in ("any", "required", "auto"):
+                    fn = next((f for f in functions if f["name"] == tool_choice), fn)
+                call = {"name": fn["name"], "args": _fill_args(fn.get("parameters", {}), self.tool_args.get(fn["name"], {})),
+                        "id": f"call_{seed:x}_0", "type": "tool_call"}
+                return AIMessage(content="", tool_calls=[call])
+            # Solo en la primera ronda del turno: después llegan los resultados y se responde
+            if not isinstance(messages[-1], ToolMessage):
+                calls = [
+                    {"name": f["name"], "args": _fill_args(f.get("parameters", {}), self.tool_args[f["name"]]),
+                     "id": f"call_{seed:x}_{i}", "type": "tool_call"}
+                    for i, f in enumerate(functions) if f["name"] in self.tool_args
+                ]
+                if calls:
+                    return AIMessage(content="", tool_calls=calls)
+        if self.empty_rate and (seed % 10_000) / 10_000 < self.empty_rate:
+            return AIMessage(content="")
+        words = []
+        for _ in range(self.response_tokens):
+            seed = (seed * 6364136223846793005 + 1442695040888963407) % 2**64  # LCG: misma entrada, mismo texto
+            words.append(_WORDS[(seed >> 33) % len(_WORDS)])
+        return AIMessage(content=" ".join(words).capitalize() + ".")
+
+    def _tokens(self, message: AIMessage) -> List[str]:
+        if message.tool_calls:
+            return [""]
+        words = str(message.content).split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _prompt_eval(self, messages: List[BaseMessage]) -> int:
+        """Tokens del prompt que hay que evaluar: con kv_slots, el prefijo ya visto sale de la cache."""
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        if self.kv_slots <= 0:
+            return prompt_tokens
+        prompt = _flatten(messages)
+        with self._slots_lock:
+            common = [len(os.path.commonprefix([slot, prompt])) for slot in self._slots]
+            best = max(range(len(common)), key=common.__getitem__, default=None)
+            # Como la cache multiusuario de Ollama: se sigue en el slot si el prompt lo extiende
+            # entero; si no, el prefijo común se copia al slot menos reciente
+            if best is not None and common[best] == len(self._slots[best]):
+                del self._slots[best]
+            elif len(self._slots) >= self.kv_slots:
+                del self._slots[0]
+            self._slots.append(prompt)
+        cached = common[best] // 4 if best is not None else 0
+        return max(1, prompt_tokens - cached)
+
+    def _usage(self, messages: List[BaseMessage], message: AIMessage, evaluated: Optional[int] = None) -> Dict[str, Any]:
+        """usage_metadata y response_metadata con la forma de las de ChatOllama.
+        Como en Ollama, prompt_eval_count cuenta solo los tokens evaluados (no los de la cache)."""
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        completion_tokens = len(self._tokens(message))
+        eval_s = completion_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        evaluated = prompt_tokens if evaluated is None else evaluated
+        return {
+            "usage_metadata": {
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+            "response_metadata": {
+                "model": self.model,
+                "prompt_eval_count": evaluated,
+                "eval_count": completion_tokens,
+                "prompt_eval_duration": int((self.latency + self._prompt_time(evaluated)) * 1e9),
+                "eval_duration": int(eval_s * 1e9),
+            },
+        }
+
+    def _prompt_time(self, evaluated: int) -> float:
+        return evaluated / self.prompt_tokens_per_second if self.prompt_tokens_per_second > 0 else 0.0
+
+    def _generation_time(self, tokens: int) -> float:
+        return self.latency + (tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0)
+
+    def _chunks(self, messages: List[BaseMessage], message: AIMessage, evaluated: int) -> List[ChatGenerationChunk]:
+        """Un chunk por token; el último lleva el uso, como en ChatOllama."""
+        usage = self._usage(messages, message, evaluated)
+        if message.tool_calls:
+            calls = [
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ]
+            return [ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=calls, **usage))]
+        tokens = self._tokens(message)
+        return [
+            ChatGenerationChunk(message=AIMessageChunk(content=t, **(usage if i == len(tokens) - 1 else {})))
+            for i, t in enumerate(tokens)
+        ]
+
+    # -------------------------
+    # Interfaz BaseChatModel
+    # -------------------------
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        evaluated = self._prompt_eval(messages)
+        message = message.model_copy(update=self._usage(messages, message, evaluated))
+        time.sleep(self._prompt_time(evaluated) + self._generation_time(len(self._tokens(message))))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        evaluated = self._prompt_eval(messages)
+        message = message.model_copy(update=self._usage(messages, message, evaluated))
+        await asyncio.sleep(self._prompt_time(evaluated) + self._generation_time(len(self._tokens(message))))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        evaluated = self._prompt_eval(messages)
+        time.sleep(self.latency + self._prompt_time(evaluated))
+        for chunk in self._chunks(messages, message, evaluated):
+            if self.tokens_per_second > 0:
+                time.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+        evaluated = self._prompt_eval(messages)
+        await asyncio.sleep(self.latency + self._prompt_time(evaluated))
+        for chunk in self._chunks(messages, message, evaluated):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+class FakeEmbeddings(Embeddings):
+    """Embeddings por hashing de palabras: deterministas, normalizados y sin modelo."""
+
+    def __init__(self, dim: int = 384, latency: float = 0.0):
+        self.dim = dim
+        self.latency = latency  # segundos por llamada (no por texto)
+        self.model_name = f"fake-hash-{dim}"  # clave propia en la cache de embeddings
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in text.casefold().split():
+            h = _digest(word)
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def fake_chat_model_factory(per_model: Optional[Dict[str, Dict[str, Any]]] = None, **defaults: Any):
+    """Factory para src.core.llm.set_chat_model_factory: un FakeChatModel por (modelo, temperatura, ...).
+    `per_model` cambia parámetros para modelos concretos (p. ej. más latencia para el grande)."""
+    def factory(model: str, base_url: str, temperature: Optional[float] = None, **kwargs: Any) -> FakeChatModel:
+        return FakeChatModel(model=model, **{**defaults, **(per_model or {}).get(model, {})})
+    return factory
@@ -0,0 +1,383 @@
+# src/bench/graphs.py
+"""
+Benchmark offline de los grafos de langgraph.json (agent, simple, rag, booking,
+react, support) con el modelo y los embeddings falsos de src/bench/fakes.py.
+
+Sin Ollama, sin descargas y sin red: el LLM falso tiene una latencia y una velocidad
+de tokens fijas, el índice RAG se construye con documentos sintéticos, las tools HTTP
+de react apuntan a un servidor local y las bases SQLite van a un directorio temporal.
+Lo que cambia entre dos ejecuciones es el coste del propio framework (grafo,
+checkpoints, historial, recuperación...), que es lo que se quiere comparar.
+
+Por grafo se mide, con `--concurrency` conversaciones a la vez de `--turns` turnos:
+  - latencia por turno p50/p95/p99 (y primer token con --stream)
+  - turnos por segundo
+  - errores, contando como error un turno que responde a otra pregunta (la del
+    checkpoint en lugar de la del mensaje nuevo), y respuestas de la cache semántica
+  - tiempo medio por nodo (callback sobre los nodos del grafo)
+  - RSS máximo del proceso al terminar ese grafo (acumulado: los grafos comparten proceso)
+
+Uso:
+  uv run python -m src.bench.graphs --concurrency 16 --conversations 64 --save bench/baseline.json
+  uv run python -m src.bench.graphs --compare bench/baseline.json   # sale con error si empeora
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+from uuid import uuid4
+
+GRAPHS = ("agent", "simple", "rag", "booking", "react", "support")
+
+# Guion de tools del modelo falso (los nombres no se repiten entre grafos)
+def _tool_script() -> Dict[str, Dict[str, Any]]:
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    return {
+        "add": {"a": 2, "b": 3},
+        "multiply": {"a": 4, "b": 5},
+        "getWeather": {"city": "Madrid"},
+        "getProducts": {},
+        "get_appointment_availability": {"fecha": tomorrow, "tiempo": "10:00", "doctor": "Dra. Pérez"},
+    }
+
+_TOPICS = ("horario", "devoluciones", "envíos", "garantía", "pagos", "facturas", "soporte", "cuenta")
+_PROMPTS = {
+    "agent": "¿Cuánto es {n} más 3 y {n} por 5?",
+    "simple": "Me llamo Ana y quiero saber sobre {topic}",
+    "rag": "¿Qué dice la documentación sobre {topic} en el caso {n}?",
+    "booking": "Quiero una cita con la Dra. Pérez mañana a las 10:00",
+    "react": "¿Qué productos tienes y qué tiempo hace en Madrid?",
+    "support": "Hola, soy Ana (ana{n}@example.com), tengo un problema con {topic}",
+}
+
+# -------------------------
+# Entorno aislado (antes de importar los grafos: leen su configuración al importarse)
+# -------------------------
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        path = urlparse(self.path).path
+        if path.startswith("/products"):
+            body: Any = [{"title": f"Producto {i}"} for i in range(5)]
+        elif path.startswith("/geocoding"):
+            body = {"results": [{"latitude": 40.4168, "longitude": -3.7038}]}
+        else:
+            body = {"current_weather": {"temperature": 21.5, "windspeed": 8.0}}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def _start_stub_server(latency: float) -> str:
+    _StubHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, name="bench-stub", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def _build_index(index_dir: str, embeddings, docs: int, seed: int) -> None:
+    """Índice FAISS + BM25 con documentos sintéticos, publicado como lo haría la ingesta."""
+    from langchain_community.vectorstores import FAISS
+    from src.retrieval.ingest import _save_index
+
+    rng = random.Random(seed)
+    words = "cliente pedido plazo días tienda política producto reembolso correo teléfono oficina".split()
+    texts = [
+        f"Sección {i} sobre {rng.choice(_TOPICS)}: " + " ".join(rng.choice(words) for _ in range(120))
+        for i in range(docs)
+    ]
+    os.makedirs(index_dir, exist_ok=True)
+    _save_index(FAISS.from_texts(texts, embeddings), index_dir)
+
+def setup_environment(args: argparse.Namespace, workdir: str) -> None:
+    """Configura el proceso para que los grafos usen los falsos y datos temporales."""
+    stub = _start_stub_server(args.tool_latency)
+    os.environ.update({
+        "CHECKPOINTER": args.checkpointer,
+        "CHECKPOINT_DB": os.path.join(workdir, "checkpoints.sqlite3"),
+        "BOOKING_DB": os.path.join(workdir, "bookings.sqlite3"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite3"),
+        "FAISS_INDEX_DIR": os.path.join(workdir, "faiss_index"),
+        "FAISS_HOT_RELOAD_INTERVAL": "0",
+        "PRODUCTS_API_URL": f"{stub}/products",
+        "GEOCODING_API_URL": f"{stub}/geocoding",
+        "WEATHER_API_URL": f"{stub}/weather",
+    })
+
+    from src.bench.fakes import FakeEmbeddings, fake_chat_model_factory
+    from src.core.llm import set_chat_model_factory
+
+    set_chat_model_factory(fake_chat_model_factory(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        tool_args=_tool_script(),
+    ))
+    embeddings = FakeEmbeddings(dim=args.embedding_dim, latency=args.embedding_latency)
+    from src.agents import rag
+    rag.set_embeddings_factory(lambda: embeddings)
+    _build_index(os.environ["FAISS_INDEX_DIR"], embeddings, args.docs, args.seed)
+
+def _load_graph(name: str):
+    from src.api.graphs import _module_name, load_graph_specs
+    from src.core.checkpoint import get_checkpointer
+
+    path = load_graph_specs()[name].rsplit(":", 1)[0]
+    module = importlib.import_module(_module_name(path))
+    return module.build_graph(get_checkpointer())
+
+# -------------------------
+# Medición
+# -------------------------
+def _node_timer():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTimer(BaseCallbackHandler):
+        """Tiempo acumulado por nodo: runs cuyo nombre es el nodo de LangGraph que los ejecuta."""
+        run_inline = True
+
+        def __init__(self):
+            self.started: Dict[Any, tuple] = {}
+            self.totals: Dict[str, List[float]] = {}
+            self.lock = threading.Lock()
+
+        def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node is not None and (name or (serialized or {}).get("name")) == node:
+                with self.lock:
+                    self.started[run_id] = (node, time.perf_counter())
+
+        def _finish(self, run_id) -> None:
+            with self.lock:
+                started = self.started.pop(run_id, None)
+                if started is not None:
+                    node, t0 = started
+                    self.totals.setdefault(node, []).append(time.perf_counter() - t0)
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._finish(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._finish(run_id)
+
+    return NodeTimer()
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_ms": pick(0.50) * 1e3, "p95_ms": pick(0.95) * 1e3, "p99_ms": pick(0.99) * 1e3}
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes en macOS, KiB en Linux
+
+async def bench_graph(name: str, graph, args: argparse.Namespace) -> Dict[str, Any]:
+    from langchain_core.messages import AIMessageChunk, HumanMessage
+    from src.api.graphs import REPLY_NODES
+
+    timer = _node_timer()
+    reply_nodes = REPLY_NODES.get(name)
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    errors = 0
+    cache_hits = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+    conversations = [[rng.randrange(1000) for _ in range(args.turns)] for _ in range(args.conversations)]
+
+    async def turn(text: str, config: Dict[str, Any]) -> None:
+        nonlocal errors, cache_hits
+        payload = {"messages": [HumanMessage(content=text)]}
+        t0 = time.perf_counter()
+        try:
+            if args.stream:
+                first = None
+                final: Dict[str, Any] = {}
+                async for mode, data in graph.astream(payload, config, stream_mode=["messages", "values"]):
+                    if mode == "values":
+                        final = data
+                        continue
+                    chunk, metadata = data
+                    if (
+                        first is None and isinstance(chunk, AIMessageChunk) and chunk.content
+                        and (reply_nodes is None or metadata.get("langgraph_node") in reply_nodes)
+                    ):
+                        first = time.perf_counter() - t0
+                if first is not None:
+                    first_tokens.append(first)
+            else:
+                final = await graph.ainvoke(payload, config)
+            elapsed = time.perf_counter() - t0
+            # El turno tiene que responder a su propia pregunta (no a una guardada en el checkpoint)
+            answered = (final or {}).get("question")
+            if answered is not None and answered != text:
+                raise AssertionError(f"respondió a {answered!r} en lugar de {text!r}")
+        except Exception as e:
+            errors += 1
+            if errors == 1:
+                print(f"[{name}] error: {e!r}")
+            return
+        cache_hits += bool((final or {}).get("cache_hit"))
+        latencies.append(elapsed)
+
+    async def conversation(numbers: List[int]) -> None:
+        async with semaphore:
+            config = {
+                "configurable": {"thread_id": f"bench-{name}-{uuid4().hex[:8]}"},
+                "metadata": {"graph_id": name},
+                "callbacks": [timer],
+            }
+            # Cada turno con un tema distinto: preguntas diferentes dentro de la conversación
+            for i, n in enumerate(numbers):
+                await turn(_PROMPTS[name].format(n=n, topic=_TOPICS[(n + i) % len(_TOPICS)]), config)
+
+    # Calentamiento: carga perezosa de recursos (índice, tokenizer...) fuera de la medición
+    await conversation([0])
+    latencies.clear()
+    first_tokens.clear()
+    timer.totals.clear()
+    cache_hits = 0
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(conversation(numbers) for numbers in conversations))
+    wall = time.perf_counter() - t0
+
+    result: Dict[str, Any] = {
+        "turns": len(latencies),
+        "errors": errors,
+        "latency": _percentiles(latencies),
+        "throughput_turns_per_s": len(latencies) / wall if wall else 0.0,
+        "nodes_mean_ms": {node: sum(v) / len(v) * 1e3 for node, v in sorted(timer.totals.items())},
+        "peak_rss_mb": _peak_rss_mb(),
+        "cache_hits": cache_hits,  # respuestas de la cache semántica (rag)
+    }
+    if args.stream:
+        result["first_token"] = _percentiles(first_tokens)
+    return result
+
+# -------------------------
+# Baselines
+# -------------------------
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regresiones de `current` frente a `baseline` (latencias que suben o throughput que baja más de `tolerance`)."""
+    regressions = []
+    for name, now in current["graphs"].items():
+        before = baseline.get("graphs", {}).get(name)
+        if before is None:
+            continue
+        checks = [(f"latency.{q}", now["latency"][q], before["latency"][q], True) for q in ("p50_ms", "p95_ms", "p99_ms")]
+        checks.append(("throughput_turns_per_s", now["throughput_turns_per_s"], before["throughput_turns_per_s"], False))
+        for metric, new, old, lower_is_better in checks:
+            if not old:
+                continue
+            change = (new - old) / old
+            marker = ""
+            if (change > tolerance) if lower_is_better else (change < -tolerance):
+                marker = "  <-- regresión"
+                regressions.append(f"{name} {metric}")
+            print(f"{name:8s} {metric:24s} {old:10.1f} -> {new:10.1f} ({change:+.1%}){marker}")
+    return regressions
+
+def _print_result(name: str, result: Dict[str, Any]) -> None:
+    lat = result["latency"]
+    print(
+        f"{name:8s} turns={result['turns']} errors={result['errors']} "
+        f"p50={lat['p50_ms']:.1f}ms p95={lat['p95_ms']:.1f}ms p99={lat['p99_ms']:.1f}ms "
+        f"{result['throughput_turns_per_s']:.1f} turnos/s rss={result['peak_rss_mb']:.0f}MB"
+        + (f" cache={result['cache_hits']}" if result.get("cache_hits") else "")
+    )
+    if "first_token" in result:
+        ft = result["first_token"]
+        print(f"{'':8s} primer token p50={ft['p50_ms']:.1f}ms p95={ft['p95_ms']:.1f}ms p99={ft['p99_ms']:.1f}ms")
+    for node, ms in result["nodes_mean_ms"].items():
+        print(f"{'':8s}   {node:12s} {ms:8.2f} ms")
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    graphs = [g.strip() for g in args.graphs.split(",") if g.strip()]
+    unknown = set(graphs) - set(GRAPHS)
+    if unknown:
+        raise SystemExit(f"Grafos desconocidos: {', '.join(sorted(unknown))} (opciones: {', '.join(GRAPHS)})")
+    results: Dict[str, Any] = {}
+    for name in graphs:
+        results[name] = await bench_graph(name, _load_graph(name), args)
+        _print_result(name, results[name])
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        "graphs": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de los grafos con LLM y embeddings falsos")
+    parser.add_argument("--graphs", default=",".join(GRAPHS), help="lista separada por comas")
+    parser.add_argument("--concurrency", type=int, default=8, help="conversaciones simultáneas")
+    parser.add_argument("--conversations", type=int, default=32, help="conversaciones por grafo")
+    parser.add_argument("--turns", type=int, default=3, help="turnos por conversación (mismo thread_id)")
+    parser.add_argument("--stream", action="store_true", help="usa astream(stream_mode='messages') y mide el primer token")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="segundos hasta el primer token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="0 = respuesta instantánea")
+    parser.add_argument("--response-tokens", type=int, default=48)
+    parser.add_argument("--embedding-dim", type=int, default=384)
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="segundos por llamada a embeddings")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="segundos por petición al servidor de tools")
+    parser.add_argument("--docs", type=int, default=500, help="documentos sintéticos del índice RAG")
+    parser.add_argument("--checkpointer", default="memory", choices=("memory", "sqlite", "none"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", help="guarda el resultado como baseline JSON")
+    parser.add_argument("--compare", help="baseline JSON con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="empeoramiento relativo permitido")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench-graphs-") as workdir:
+        setup_environment(args, workdir)
+        result = asyncio.run(run(args))
+
+    if args.save:
+        if os.path.dirname(args.save):
+            os.makedirs(os.path.dirname(args.save), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Baseline guardada en {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        ignored = ("graphs", "tolerance")
+        changed = sorted(
+            k for k, v in result["params"].items()
+            if k not in ignored and k in baseline.get("params", {}) and baseline["params"][k] != v
+        )
+        if changed:
+            print(f"Aviso: parámetros distintos de la baseline ({', '.join(changed)}); la comparación no es directa")
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f"Regresiones (> {args.tolerance:.0%}): {', '.join(regressions)}")
+    failed = [f"{name} ({r['errors']})" for name, r in result["graphs"].items() if r["errors"]]
+    if failed:
+        raise SystemExit(f"Turnos con error: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
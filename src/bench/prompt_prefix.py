@@ -0,0 +1,169 @@
+# src/bench/prompt_prefix.py
+"""
+Benchmark de la reutilización del prefijo del prompt (cache KV de Ollama) en
+conversaciones de varios turnos, con el orden de antes y con src/core/prompts.py.
+
+Usa el modelo falso de src/bench/fakes.py con la cache KV simulada: `--slots`
+slots (OLLAMA_NUM_PARALLEL) que recuerdan su último prompt; cada petición solo
+evalúa lo que sigue al prefijo común y tarda `1 / --prompt-tps` por token evaluado.
+Los prompts salen del código real de los agentes:
+
+  support  antes: nombre y contexto en el SystemMessage, delante del historial
+           ahora: agents/support/nodes/conversation/node.build_messages
+  rag      antes: contexto y pregunta en un solo HumanMessage
+           ahora: src/agents/rag._build_messages (instrucciones fijas delante)
+
+Cada conversación tiene `--turns` turnos con un contexto recuperado distinto en cada
+uno y la ventana de historial de src/core/history.py. Por escenario y orden se
+reporta, por turno, los tokens del prompt, los evaluados (no cacheados) y el tiempo
+de evaluación del prompt; al final, el tiempo ahorrado por turno a partir del segundo.
+
+Uso:
+  uv run python -m src.bench.prompt_prefix --threads 4 --turns 8
+  uv run python -m src.bench.prompt_prefix --prompt-tps 150   # velocidad de evaluación típica en CPU
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+from typing import Any, Callable, Dict, List, Optional
+
+SCENARIOS = ("support", "rag")
+LAYOUTS = ("antes", "estable")
+
+_WORDS = "cliente pedido plazo días tienda política producto reembolso correo teléfono oficina envío factura".split()
+_QUESTIONS = (
+    "¿Cuál es el plazo para devolver un pedido?",
+    "¿Y si el producto llegó dañado?",
+    "¿Puedo cambiar la dirección de envío?",
+    "¿Cómo descargo la factura?",
+    "¿Tienen atención por teléfono?",
+    "¿Cuánto tarda el reembolso?",
+)
+
+# Plantilla del nodo conversation antes de src/core/prompts.py (nombre y contexto arriba)
+_LEGACY_SUPPORT_TEMPLATE = """\
+Eres un asistente útil y conciso para atender a {{ name }}.
+
+{% if context %}
+Contexto disponible: {{ context }}
+Usa este contexto para responder preguntas de manera precisa.
+{% endif %}
+
+Responde de manera clara y profesional. Si no tienes información suficiente, indícalo amablemente.
+"""
+
+def _legacy_support(state: Dict[str, Any]):
+    from langchain_core.messages import SystemMessage
+    from agents.support.history import history
+    from src.core.prompts import render
+
+    prompt = render(_LEGACY_SUPPORT_TEMPLATE, name=state.get("customer_name") or "Usuario", context=state["context"])
+    return [SystemMessage(content=prompt)] + history.prompt_messages(state)
+
+def _legacy_rag(state: Dict[str, Any]):
+    from langchain_core.messages import HumanMessage
+
+    question, context = state["question"], state["context"]
+    return [HumanMessage(content=f"Contexto:\n{context}\n\nPregunta: {question}" if context else f"Pregunta: {question}")]
+
+def _stable_support(state: Dict[str, Any]):
+    from agents.support.nodes.conversation.node import build_messages
+
+    return build_messages(state)
+
+def _stable_rag(state: Dict[str, Any]):
+    from src.agents.rag import _build_messages
+
+    return _build_messages(state["question"], state["context"])
+
+BUILDERS: Dict[str, Dict[str, Callable]] = {
+    "support": {"antes": _legacy_support, "estable": _stable_support},
+    "rag": {"antes": _legacy_rag, "estable": _stable_rag},
+}
+
+def _context(rng: random.Random, tokens: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(tokens))
+
+async def run_case(scenario: str, layout: str, args: argparse.Namespace) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+    from src.bench.fakes import FakeChatModel
+
+    llm = FakeChatModel(
+        model="bench-prefix",
+        latency=0.0,
+        tokens_per_second=0.0,
+        response_tokens=args.response_tokens,
+        prompt_tokens_per_second=args.prompt_tps,
+        kv_slots=args.slots,
+    )
+    build = BUILDERS[scenario][layout]
+    per_turn: List[List[Dict[str, float]]] = [[] for _ in range(args.turns)]
+    semaphore = asyncio.Semaphore(args.slots)
+
+    async def conversation(thread: int) -> None:
+        rng = random.Random(args.seed + thread)  # misma conversación con los dos órdenes
+        state: Dict[str, Any] = {"messages": [], "summary": "", "customer_name": None}
+        for turn in range(args.turns):
+            question = rng.choice(_QUESTIONS)
+            state["messages"] = state["messages"] + [HumanMessage(content=question)]
+            state["question"] = question
+            state["context"] = _context(rng, args.context_tokens)
+            if turn == 1:
+                state["customer_name"] = f"Cliente {thread}"  # el extractor lo encuentra en el segundo turno
+            async with semaphore:
+                response = await llm.ainvoke(build(state))
+            meta = response.response_metadata
+            per_turn[turn].append({
+                "prompt_tokens": response.usage_metadata["input_tokens"],
+                "evaluated": meta["prompt_eval_count"],
+                "eval_ms": meta["prompt_eval_duration"] / 1e6,
+            })
+            state["messages"] = state["messages"] + [response]
+
+    await asyncio.gather(*(conversation(t) for t in range(args.threads)))
+    turns = [
+        {key: statistics.mean(s[key] for s in samples) for key in ("prompt_tokens", "evaluated", "eval_ms")}
+        for samples in per_turn
+    ]
+    later = turns[1:] or turns
+    return {
+        "turns": turns,
+        "eval_ms_per_turn": statistics.mean(t["eval_ms"] for t in later),
+        "cached_share": 1 - sum(t["evaluated"] for t in later) / sum(t["prompt_tokens"] for t in later),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for scenario in args.scenarios.split(","):
+        results[scenario] = {}
+        for layout in LAYOUTS:
+            result = results[scenario][layout] = await run_case(scenario, layout, args)
+            print(f"{scenario:8s} {layout:8s} eval. prompt={result['eval_ms_per_turn']:.0f}ms/turno "
+                  f"cacheado={result['cached_share']:.0%} (turnos 2..{args.turns})")
+            for i, turn in enumerate(result["turns"], 1):
+                print(f"{'':17s} turno {i:2d}: prompt={turn['prompt_tokens']:5.0f} evaluados={turn['evaluated']:5.0f} "
+                      f"{turn['eval_ms']:6.0f}ms")
+        before, after = (results[scenario][layout]["eval_ms_per_turn"] for layout in LAYOUTS)
+        print(f"{scenario:8s} ahorro: {before - after:.0f}ms de evaluación del prompt por turno "
+              f"({(after - before) / before:+.1%})" if before else "")
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de reutilización del prefijo del prompt entre turnos")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="lista separada por comas")
+    parser.add_argument("--threads", type=int, default=4, help="conversaciones simultáneas")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--slots", type=int, default=4, help="OLLAMA_NUM_PARALLEL del backend simulado")
+    parser.add_argument("--context-tokens", type=int, default=300, help="palabras de contexto recuperado por turno")
+    parser.add_argument("--response-tokens", type=int, default=48)
+    parser.add_argument("--prompt-tps", type=float, default=1000.0, help="tokens de prompt evaluados por segundo")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
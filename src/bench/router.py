@@ -0,0 +1,237 @@
+# src/bench/router.py
+"""
+Benchmark del router de backends de Ollama (src/core/router.py) contra servidores
+Ollama falsos en local.
+
+Cada backend falso habla la API de Ollama que usa ChatOllama (`/api/chat` en NDJSON
+y `/api/tags`), atiende OLLAMA_NUM_PARALLEL peticiones a la vez (el resto espera en
+cola, como Ollama) y tiene una latencia hasta el primer token con cola larga: una
+fracción `--slow-fraction` de las peticiones tarda `--slow-factor` veces más. Así se
+ven los tres efectos del router con ChatOllama real:
+
+  single    todo a un backend (como sin router)
+  routed    reparto por peticiones en curso entre todos
+  hedged    además, duplica en otro backend lo que supera el percentil --hedge-percentile
+  failover  como routed, pero el primer backend se cae a mitad de la prueba
+
+Uso:
+  uv run python -m src.bench.router --backends 3 --requests 300 --concurrency 24
+  uv run python -m src.bench.router --stream   # mide el primer token con astream
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+SCENARIOS = ("single", "routed", "hedged", "failover")
+
+# -------------------------
+# Backend Ollama falso
+# -------------------------
+class FakeOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, model: str, latency: float, tokens: int, tokens_per_second: float,
+                 slow_fraction: float, slow_factor: float, parallel: int, seed: int):
+        super().__init__(("127.0.0.1", 0), _OllamaHandler)
+        self.model = model
+        self.latency = latency
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.slow_fraction = slow_fraction
+        self.slow_factor = slow_factor
+        self.slots = threading.Semaphore(parallel)
+        self.rng = random.Random(seed)
+        self.down = False
+        self.served = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeOllama
+
+    def _json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.server.down:
+            return self._json(503, {"error": "down"})
+        if self.path == "/api/tags":
+            return self._json(200, {"models": [{"name": self.server.model, "model": self.server.model}]})
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.server.down:
+            return self._json(503, {"error": "backend down"})
+        with self.server.lock:
+            slow = self.server.rng.random() < self.server.slow_fraction
+        with self.server.slots:  # OLLAMA_NUM_PARALLEL: el resto hace cola
+            time.sleep(self.server.latency * (self.server.slow_factor if slow else 1.0))
+            words = [f"tok{i}" for i in range(self.server.tokens)]
+            base = {"model": body.get("model", self.server.model), "created_at": "2024-01-01T00:00:00Z"}
+            final = {
+                **base, "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop",
+                "prompt_eval_count": 10, "eval_count": len(words),
+            }
+            try:
+                if body.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for i, word in enumerate(words):
+                        part = {**base, "message": {"role": "assistant", "content": ("" if i == 0 else " ") + word}, "done": False}
+                        self._chunk(json.dumps(part).encode() + b"\n")
+                        if self.server.tokens_per_second > 0:
+                            time.sleep(1 / self.server.tokens_per_second)
+                    self._chunk(json.dumps(final).encode() + b"\n")
+                    self._chunk(b"")
+                else:
+                    final["message"]["content"] = " ".join(words)
+                    self._json(200, final)
+            except (BrokenPipeError, ConnectionResetError):
+                return  # el cliente canceló (copia perdedora del hedging)
+        with self.server.lock:
+            self.server.served += 1
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+# -------------------------
+# Carga
+# -------------------------
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_ms": pick(0.50) * 1e3, "p95_ms": pick(0.95) * 1e3, "p99_ms": pick(0.99) * 1e3}
+
+async def run_scenario(scenario: str, servers: List[FakeOllama], args: argparse.Namespace) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+    from src.core import metrics, router
+    from src.core.llm import clear_registry, get_chat_model
+
+    clear_registry()
+    for server in servers:
+        server.down = False
+        server.served = 0
+    for backend in router._backends.values():
+        backend.healthy, backend.failures, backend.opened_at = True, 0, None
+    urls = [servers[0].url] if scenario == "single" else [s.url for s in servers]
+    llm = router.RoutedChatModel(
+        model=args.model,
+        clients={url: get_chat_model(args.model, url) for url in urls},
+        hedge_percentile=args.hedge_percentile if scenario == "hedged" else 0.0,
+        hedge_min_samples=args.hedge_min_samples,
+    )
+    hedges_before = sum(metrics.HEDGED_REQUESTS.value(model=args.model, winner=w) for w in ("primary", "hedge"))
+    latencies: List[float] = []
+    errors = 0
+    done = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def request(i: int) -> None:
+        nonlocal errors, done
+        async with semaphore:
+            messages = [HumanMessage(content=f"pregunta {i}")]
+            t0 = time.perf_counter()
+            try:
+                if args.stream:
+                    first = None
+                    async for _ in llm.astream(messages):
+                        if first is None:
+                            first = time.perf_counter() - t0
+                    latencies.append(first)  # primer token
+                else:
+                    await llm.ainvoke(messages)
+                    latencies.append(time.perf_counter() - t0)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"[{scenario}] error: {e!r}")
+            done += 1
+            if scenario == "failover" and done == args.requests // 3:
+                servers[0].down = True  # se cae a un tercio de la prueba
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - t0
+    hedges = sum(metrics.HEDGED_REQUESTS.value(model=args.model, winner=w) for w in ("primary", "hedge")) - hedges_before
+    return {
+        "requests": args.requests,
+        "errors": errors,
+        "latency": _percentiles(latencies),
+        "throughput_rps": args.requests / elapsed if elapsed else 0.0,
+        "served": {s.url: s.served for s in servers},
+        "hedged": int(hedges),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    servers = [
+        FakeOllama(args.model, args.latency, args.tokens, args.tokens_per_second,
+                   args.slow_fraction, args.slow_factor, args.parallel, args.seed + i)
+        for i in range(args.backends)
+    ]
+    results = {}
+    for scenario in args.scenarios.split(","):
+        result = results[scenario] = await run_scenario(scenario, servers, args)
+        lat = result["latency"]
+        served = " ".join(str(n) for n in result["served"].values())
+        print(
+            f"{scenario:9s} errors={result['errors']} p50={lat['p50_ms']:.0f}ms p95={lat['p95_ms']:.0f}ms "
+            f"p99={lat['p99_ms']:.0f}ms {result['throughput_rps']:.1f} req/s hedged={result['hedged']} por backend=[{served}]"
+        )
+    for server in servers:
+        server.shutdown()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del router de backends de Ollama con servidores falsos")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="lista separada por comas")
+    parser.add_argument("--backends", type=int, default=3)
+    parser.add_argument("--parallel", type=int, default=4, help="OLLAMA_NUM_PARALLEL de cada backend falso")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=24)
+    parser.add_argument("--stream", action="store_true", help="mide el primer token con astream")
+    parser.add_argument("--model", default="qwen2.5:7b-instruct")
+    parser.add_argument("--latency", type=float, default=0.05, help="segundos hasta el primer token")
+    parser.add_argument("--tokens", type=int, default=16)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="fracción de peticiones lentas")
+    parser.add_argument("--slow-factor", type=float, default=10.0, help="cuántas veces más tardan")
+    parser.add_argument("--hedge-percentile", type=float, default=0.9)
+    parser.add_argument("--hedge-min-samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Antes de importar el router: health checks y circuit breaker rápidos para la prueba
+    os.environ.setdefault("OLLAMA_HEALTH_INTERVAL", "0.5")
+    os.environ.setdefault("OLLAMA_BREAKER_COOLDOWN", "2")
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# src/bench/startup.py
+"""
+Benchmark de arranque en frío de los grafos de langgraph.json.
+
+Cada grafo se importa en un proceso nuevo (como un worker de `langgraph dev` o de
+la API que solo sirve ese grafo) y se mide:
+  - import_ms: importar el módulo del grafo (incluye compilar `app`)
+  - first_turn_ms: el primer turno con el LLM y los embeddings falsos de
+    src/bench/fakes.py (clientes, embeddings e índice se crean aquí, no al importar)
+  - rss_mb: RSS máximo tras el import
+  - modules: módulos cargados tras el import
+  - heavy: dependencias pesadas que ya estaban cargadas tras el import; importar un
+    grafo no debe traer ninguna (HEAVY_MODULES), y si aparece alguna el benchmark
+    termina con error aunque no haya baseline
+  - profile: los módulos de primer nivel con más tiempo acumulado según
+    `python -X importtime` (una ejecución aparte: el perfilado añade su propio coste)
+
+Uso:
+  uv run python -m src.bench.startup --save bench/startup.json
+  uv run python -m src.bench.startup --compare bench/startup.json   # sale con error si empeora
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sin imports del proyecto a nivel de módulo: el hijo mide desde un intérprete limpio
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ningún grafo debe cargarlas al importarse: se cargan en el primer uso (o nunca)
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "langchain_huggingface",
+    "langchain_community",
+    "langchain_ollama",
+    "ollama",
+    "faiss",
+    "numpy",
+)
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\S+)$")  # solo primer nivel (sin sangría)
+
+# -------------------------
+# Proceso hijo: un grafo por proceso
+# -------------------------
+def _graph_specs() -> Dict[str, str]:
+    with open(os.path.join(ROOT_DIR, "langgraph.json"), encoding="utf-8") as f:
+        return json.load(f)["graphs"]
+
+def _module_name(name: str) -> str:
+    path = _graph_specs()[name].rsplit(":", 1)[0]
+    return os.path.splitext(os.path.normpath(path))[0].replace(os.sep, ".")
+
+def probe(name: str, first_turn: bool) -> Dict[str, Any]:
+    """Importa el grafo `name` y, opcionalmente, ejecuta un turno. Solo se usa en el proceso hijo."""
+    import asyncio
+    import importlib
+    import resource
+    import time
+
+    t0 = time.perf_counter()
+    module = importlib.import_module(_module_name(name))
+    import_s = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result: Dict[str, Any] = {
+        "import_ms": import_s * 1e3,
+        "rss_mb": peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024,
+        "modules": len(sys.modules),
+        "heavy": sorted(m for m in HEAVY_MODULES if m in sys.modules),
+    }
+    if first_turn:
+        from langchain_core.messages import HumanMessage
+        from src.bench.fakes import FakeEmbeddings, fake_chat_model_factory
+        from src.bench.graphs import _PROMPTS, _TOPICS
+        from src.core.llm import set_chat_model_factory
+
+        set_chat_model_factory(fake_chat_model_factory(latency=0.0, tokens_per_second=0.0))
+        t0 = time.perf_counter()
+        if name in ("rag", "support"):
+            from src.agents import rag  # support lo importa en su nodo de recuperación
+
+            rag.set_embeddings_factory(FakeEmbeddings)
+        text = _PROMPTS[name].format(n=1, topic=_TOPICS[0])
+        payload = {"messages": [HumanMessage(content=text)]}
+        asyncio.run(module.app.ainvoke(payload, {"configurable": {"thread_id": "startup"}}))
+        result["first_turn_ms"] = (time.perf_counter() - t0) * 1e3
+    return result
+
+# -------------------------
+# Proceso padre
+# -------------------------
+def _environment(workdir: str) -> Dict[str, str]:
+    """Entorno del hijo: bases SQLite y el índice (vacío) en un directorio temporal."""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(p for p in (ROOT_DIR, env.get("PYTHONPATH")) if p),
+        "CHECKPOINT_DB": os.path.join(workdir, "checkpoints.sqlite3"),
+        "BOOKING_DB": os.path.join(workdir, "bookings.sqlite3"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite3"),
+        "FAISS_INDEX_DIR": os.path.join(workdir, "faiss_index"),
+        "FAISS_HOT_RELOAD_INTERVAL": "0",
+    })
+    return env
+
+def _run_child(name: str, env: Dict[str, str], first_turn: bool, importtime: bool) -> Tuple[Dict[str, Any], str]:
+    cmd = [sys.executable, "-W", "ignore"]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-m", "src.bench.startup", "--probe", name]
+    if first_turn:
+        cmd.append("--first-turn")
+    proc = subprocess.run(cmd, env=env, cwd=ROOT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"[{name}] el proceso hijo falló:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+def _import_profile(stderr: str, top: int) -> List[Tuple[str, float]]:
+    """Módulos de primer nivel de -X importtime ordenados por tiempo acumulado."""
+    totals = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            totals.append((match.group(3), int(match.group(2)) / 1e3))
+    return sorted(totals, key=lambda t: t[1], reverse=True)[:top]
+
+def bench_graph(name: str, args: argparse.Namespace, env: Dict[str, str]) -> Dict[str, Any]:
+    runs = [_run_child(name, env, not args.no_first_turn, importtime=False)[0] for _ in range(args.repeat)]
+    _, stderr = _run_child(name, env, first_turn=False, importtime=True)
+    result: Dict[str, Any] = {
+        key: statistics.median(r[key] for r in runs)
+        for key in ("import_ms", "first_turn_ms", "rss_mb", "modules")
+        if key in runs[0]
+    }
+    result["heavy"] = sorted({m for r in runs for m in r["heavy"]})
+    result["profile"] = _import_profile(stderr, args.top)
+    return result
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regresiones de `current` frente a `baseline` (tiempos, memoria o módulos que suben más de `tolerance`)."""
+    regressions = []
+    for name, now in current["graphs"].items():
+        before = baseline.get("graphs", {}).get(name)
+        if before is None:
+            continue
+        for metric in ("import_ms", "first_turn_ms", "rss_mb", "modules"):
+            new, old = now.get(metric), before.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            marker = ""
+            if change > tolerance:
+                marker = "  <-- regresión"
+                regressions.append(f"{name} {metric}")
+            print(f"{name:8s} {metric:14s} {old:10.1f} -> {new:10.1f} ({change:+.1%}){marker}")
+    return regressions
+
+def _print_result(name: str, result: Dict[str, Any]) -> None:
+    first = f" primer turno={result['first_turn_ms']:.0f}ms" if "first_turn_ms" in result else ""
+    print(
+        f"{name:8s} import={result['import_ms']:.0f}ms{first} rss={result['rss_mb']:.0f}MB "
+        f"módulos={result['modules']:.0f} pesados={','.join(result['heavy']) or '-'}"
+    )
+    for module, ms in result["profile"]:
+        print(f"{'':8s}   {module:32s} {ms:8.1f} ms")
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    available = list(_graph_specs())
+    graphs = [g.strip() for g in (args.graphs or ",".join(available)).split(",") if g.strip()]
+    unknown = set(graphs) - set(available)
+    if unknown:
+        raise SystemExit(f"Grafos desconocidos: {', '.join(sorted(unknown))} (opciones: {', '.join(available)})")
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+        env = _environment(workdir)
+        for name in graphs:
+            results[name] = bench_graph(name, args, env)
+            _print_result(name, results[name])
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "probe")},
+        "graphs": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío e import de los grafos")
+    parser.add_argument("--graphs", default="", help="lista separada por comas (por defecto, todos los de langgraph.json)")
+    parser.add_argument("--repeat", type=int, default=5, help="procesos por grafo (se reporta la mediana)")
+    parser.add_argument("--top", type=int, default=8, help="módulos del perfil de import a mostrar")
+    parser.add_argument("--no-first-turn", action="store_true", help="mide solo el import")
+    parser.add_argument("--save", help="guarda el resultado como baseline JSON")
+    parser.add_argument("--compare", help="baseline JSON con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="empeoramiento relativo permitido")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)  # proceso hijo
+    parser.add_argument("--first-turn", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.first_turn)))
+        return
+
+    result = run(args)
+    if args.save:
+        if os.path.dirname(args.save):
+            os.makedirs(os.path.dirname(args.save), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Baseline guardada en {args.save}")
+
+    failures = [f"{name} carga {', '.join(r['heavy'])} al importar" for name, r in result["graphs"].items() if r["heavy"]]
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures += [f"regresión en {r}" for r in compare(result, baseline, args.tolerance)]
+    if failures:
+        raise SystemExit("Error: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
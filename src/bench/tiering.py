@@ -0,0 +1,179 @@
+# src/bench/tiering.py
+"""
+Benchmark del escalado por niveles de modelo (src/core/tiering.py) con el modelo
+falso de src/bench/fakes.py.
+
+El modelo grande es lento (`--large-latency`, `--large-tps`) y el pequeño rápido
+(`--small-latency`, `--small-tps`) y devuelve vacía una fracción `--small-empty-rate`
+de las respuestas, que la validación detecta y escala. La carga mezcla turnos como
+los de los agentes:
+  easy        saludos y agradecimientos
+  lookup      consultas cortas con tools enlazadas (la del booking)
+  structured  extracción con with_structured_output (la del support)
+  hard        peticiones largas o que piden razonar y comparar
+
+Se ejecuta dos veces, con todo al grande (como sin tiering) y con tiering, y se
+reporta la latencia p50/p95 por modo y, con tiering, el reparto por nivel, su p50 y
+la tasa de escalado (`tier_stats()`).
+
+Uso:
+  uv run python -m src.bench.tiering --requests 200 --concurrency 8
+  uv run python -m src.bench.tiering --stream   # mide el primer token con astream
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+KINDS = ("easy", "lookup", "structured", "hard")
+
+_PROMPTS = {
+    "easy": ("Hola", "Gracias", "Perfecto, gracias", "Buenas tardes", "Vale"),
+    "lookup": (
+        "¿Hay hueco con la Dra. Pérez mañana a las 10:00?",
+        "Quiero una cita el viernes por la tarde",
+        "¿Qué horario tiene el Dr. Gómez el lunes?",
+    ),
+    "structured": (
+        "Hola, soy Ana (ana{n}@example.com), tengo un problema con mi factura",
+        "Me llamo Luis, mi correo es luis{n}@example.com",
+    ),
+    "hard": (
+        "Compara las ventajas y desventajas de cambiar mi cita al martes o al jueves y explica por qué",
+        "Analiza paso a paso qué opción me conviene si tengo tres citas esta semana ¿cuál muevo? ¿y cuándo?",
+    ),
+}
+
+class _Contact(BaseModel):
+    """Datos de contacto (como ContactInfo del agente de soporte)."""
+    name: str = Field(description="Nombre")
+    email: str = Field(description="Correo")
+
+def _availability(fecha: str, tiempo: str, doctor: str) -> str:
+    """Consulta la disponibilidad de una cita (como la tool del booking)."""
+    return "disponible"
+
+def _workload(args: argparse.Namespace) -> List[tuple]:
+    weights = [float(w) for w in args.mix.split(",")]
+    rng = random.Random(args.seed)
+    kinds = rng.choices(KINDS, weights=weights, k=args.requests)
+    return [(kind, rng.choice(_PROMPTS[kind]).format(n=i)) for i, kind in enumerate(kinds)]
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"p50_ms": pick(0.50) * 1e3, "p95_ms": pick(0.95) * 1e3, "p99_ms": pick(0.99) * 1e3}
+
+async def run_mode(tiered: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+    from src.core import tiering
+    from src.core.llm import clear_registry
+
+    clear_registry()
+    tiering._tiered.clear()
+    tiering.TIERING_ENABLED = tiered
+    llm = tiering.get_tiered_model(args.large, small=args.small, temperature=0.2)
+    runnables = {
+        "easy": llm,
+        "lookup": llm.bind_tools([_availability]),
+        "structured": llm.with_structured_output(_Contact),
+        "hard": llm,
+    }
+    latencies: List[float] = []
+    by_kind: Dict[str, List[float]] = {k: [] for k in KINDS}
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def request(kind: str, text: str) -> None:
+        nonlocal errors
+        async with semaphore:
+            messages = [HumanMessage(content=text)]
+            t0 = time.perf_counter()
+            try:
+                if args.stream and kind != "structured":
+                    first = None
+                    async for _ in runnables[kind].astream(messages):
+                        if first is None:
+                            first = time.perf_counter() - t0
+                    elapsed = first
+                else:
+                    await runnables[kind].ainvoke(messages)
+                    elapsed = time.perf_counter() - t0
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"[{'tiering' if tiered else 'grande'}] error: {e!r}")
+                return
+            latencies.append(elapsed)
+            by_kind[kind].append(elapsed)
+
+    await asyncio.gather(*(request(kind, text) for kind, text in _workload(args)))
+    return {
+        "errors": errors,
+        "latency": _percentiles(latencies),
+        "by_kind_p50_ms": {k: _percentiles(v)["p50_ms"] for k, v in by_kind.items() if v},
+        "tiers": tiering.tier_stats(),
+    }
+
+def _print_mode(label: str, result: Dict[str, Any]) -> None:
+    lat = result["latency"]
+    kinds = " ".join(f"{k}={ms:.0f}ms" for k, ms in result["by_kind_p50_ms"].items())
+    print(f"{label:8s} errors={result['errors']} p50={lat['p50_ms']:.0f}ms p95={lat['p95_ms']:.0f}ms "
+          f"p99={lat['p99_ms']:.0f}ms  p50 por tipo: {kinds}")
+    for model, stats in result["tiers"].items():
+        for path, share in stats["share"].items():
+            p50 = stats["p50_ms"][path]
+            print(f"{'':8s}   {path:9s} {share:6.1%} p50={p50:.0f}ms" if p50 is not None else f"{'':8s}   {path:9s} {share:6.1%}")
+        reasons = ", ".join(f"{r}={n}" for r, n in stats["escalations"].items()) or "-"
+        print(f"{'':8s}   escalado {stats['escalation_rate']:.1%} de los intentos del pequeño ({reasons})")
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.bench.fakes import fake_chat_model_factory
+    from src.core.llm import set_chat_model_factory
+
+    set_chat_model_factory(fake_chat_model_factory(
+        per_model={
+            args.large: {"latency": args.large_latency, "tokens_per_second": args.large_tps},
+            args.small: {"latency": args.small_latency, "tokens_per_second": args.small_tps,
+                         "empty_rate": args.small_empty_rate},
+        },
+        response_tokens=args.response_tokens,
+        tool_args={"_availability": {"fecha": "2030-01-01", "tiempo": "10:00", "doctor": "Dra. Pérez"}},
+    ))
+    results = {}
+    for label, tiered in (("grande", False), ("tiering", True)):
+        results[label] = await run_mode(tiered, args)
+        _print_mode(label, results[label])
+    before, after = results["grande"]["latency"]["p50_ms"], results["tiering"]["latency"]["p50_ms"]
+    if before:
+        print(f"p50: {before:.0f}ms -> {after:.0f}ms ({(after - before) / before:+.1%})")
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark del escalado por niveles de modelo con el LLM falso")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="3,4,2,1", help="pesos de easy,lookup,structured,hard")
+    parser.add_argument("--stream", action="store_true", help="mide el primer token con astream")
+    parser.add_argument("--large", default="llama3.1:70b")
+    parser.add_argument("--small", default="qwen2.5:7b-instruct")
+    parser.add_argument("--large-latency", type=float, default=0.5, help="segundos hasta el primer token")
+    parser.add_argument("--large-tps", type=float, default=40.0)
+    parser.add_argument("--small-latency", type=float, default=0.05)
+    parser.add_argument("--small-tps", type=float, default=400.0)
+    parser.add_argument("--small-empty-rate", type=float, default=0.1, help="respuestas vacías del pequeño")
+    parser.add_argument("--response-tokens", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
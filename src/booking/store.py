@@ -0,0 +1,183 @@
+# src/booking/store.py
+"""
+Agenda de citas del agente de reservas: SQLite (WAL) compartida entre procesos.
+
+La jornada se divide en huecos fijos de BOOKING_SLOT_MINUTES. Los huecos ocupados
+se leen siempre de la base: el índice de UNIQUE(doctor, start) hace que comprobar
+un hueco o listar los ocupados de un día sea una búsqueda en el B-tree más los
+huecos del día, sin recorrer la agenda completa. Así todos los workers de la API
+(cada uno con su BookingStore) ven las reservas y cancelaciones de los demás.
+
+La reserva es atómica: la tabla tiene UNIQUE(doctor, start) y SlotTaken sale del
+IntegrityError del INSERT, de modo que si varios procesos comparten la base solo
+uno gana el hueco. Las reglas de negocio (no reservar en el pasado ni
+más de BOOKING_MAX_DAYS_AHEAD días por delante, horario laboral, huecos
+alineados) se validan aquí, no solo en el prompt.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+BOOKING_DB = os.getenv("BOOKING_DB", "data/bookings.sqlite3")
+BOOKING_SLOT_MINUTES = int(os.getenv("BOOKING_SLOT_MINUTES", "30"))
+BOOKING_DAY_START = os.getenv("BOOKING_DAY_START", "09:00")
+BOOKING_DAY_END = os.getenv("BOOKING_DAY_END", "17:00")
+BOOKING_MAX_DAYS_AHEAD = int(os.getenv("BOOKING_MAX_DAYS_AHEAD", "30"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+class BookingError(Exception):
+    """Error de negocio al reservar; el mensaje se le puede mostrar al usuario."""
+
+class SlotTaken(BookingError):
+    pass
+
+class InvalidSlot(BookingError):
+    pass
+
+@dataclass
+class Booking:
+    id: str
+    doctor: str
+    patient: str
+    start: datetime
+
+def _minutes(dt: datetime) -> int:
+    return int((dt - _EPOCH).total_seconds() // 60)
+
+def _from_minutes(minutes: int) -> datetime:
+    return _EPOCH + timedelta(minutes=minutes)
+
+def _doctor_key(doctor: str) -> str:
+    return " ".join(doctor.lower().split())
+
+def _parse_hhmm(value: str) -> time:
+    return datetime.strptime(value.strip(), "%H:%M").time()
+
+class BookingStore:
+    def __init__(
+        self,
+        path: str = BOOKING_DB,
+        slot_minutes: int = BOOKING_SLOT_MINUTES,
+        day_start: str = BOOKING_DAY_START,
+        day_end: str = BOOKING_DAY_END,
+        max_days_ahead: int = BOOKING_MAX_DAYS_AHEAD,
+    ):
+        self.slot_minutes = slot_minutes
+        self.day_start = _parse_hhmm(day_start)
+        self.day_end = _parse_hhmm(day_end)
+        self.max_days_ahead = max_days_ahead
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bookings ("
+            " id TEXT PRIMARY KEY, doctor TEXT NOT NULL, doctor_name TEXT NOT NULL,"
+            " patient TEXT NOT NULL, start INTEGER NOT NULL, created_at REAL NOT NULL,"
+            " UNIQUE (doctor, start))"
+        )
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Reglas
+    # -------------------------
+    def _day_slots(self, day: date) -> range:
+        first = _minutes(datetime.combine(day, self.day_start))
+        last = _minutes(datetime.combine(day, self.day_end))
+        return range(first, last, self.slot_minutes)
+
+    def validate(self, start: datetime, now: Optional[datetime] = None) -> None:
+        """Lanza InvalidSlot si `start` no se puede reservar."""
+        now = now or datetime.now()
+        if start < now:
+            raise InvalidSlot("No se pueden reservar citas en el pasado.")
+        if start.date() > (now + timedelta(days=self.max_days_ahead)).date():
+            raise InvalidSlot(f"No se pueden reservar citas con más de {self.max_days_ahead} días de antelación.")
+        if _minutes(start) not in self._day_slots(start.date()):
+            raise InvalidSlot(
+                f"Las citas son cada {self.slot_minutes} minutos entre "
+                f"{self.day_start:%H:%M} y {self.day_end:%H:%M}."
+            )
+
+    # -------------------------
+    # Consultas
+    # -------------------------
+    def _busy(self, doctor: str, first: int, stop: int) -> List[int]:
+        """Minutos de inicio ocupados en [first, stop), leídos de la base (índice UNIQUE)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT start FROM bookings WHERE doctor = ? AND start >= ? AND start < ?",
+                (_doctor_key(doctor), first, stop),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def is_free(self, doctor: str, start: datetime) -> bool:
+        minute = _minutes(start)
+        return not self._busy(doctor, minute, minute + 1)
+
+    def free_slots(self, doctor: str, day: date, limit: Optional[int] = None, now: Optional[datetime] = None) -> List[datetime]:
+        """Huecos libres del día, en orden (solo los reservables ahora mismo)."""
+        now = now or datetime.now()
+        slots = self._day_slots(day)
+        earliest = _minutes(now)
+        last_day = (now + timedelta(days=self.max_days_ahead)).date()
+        if day > last_day:
+            return []
+        # Solo los ocupados de ese día: un rango sobre el índice (doctor, start)
+        taken = set(self._busy(doctor, slots.start, slots.stop))
+        free = []
+        for minute in slots:
+            if minute >= earliest and minute not in taken:
+                free.append(_from_minutes(minute))
+                if limit is not None and len(free) >= limit:
+                    break
+        return free
+
+    # -------------------------
+    # Reserva
+    # -------------------------
+    def book(self, doctor: str, patient: str, start: datetime, now: Optional[datetime] = None) -> Booking:
+        """Reserva atómica del hueco; lanza SlotTaken si ya está ocupado."""
+        self.validate(start, now)
+        key = _doctor_key(doctor)
+        minute = _minutes(start)
+        booking = Booking(id=uuid.uuid4().hex[:12], doctor=doctor.strip(), patient=patient.strip(), start=start)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO bookings (id, doctor, doctor_name, patient, start, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (booking.id, key, booking.doctor, booking.patient, minute, datetime.now().timestamp()),
+                )
+        except sqlite3.IntegrityError:
+            # UNIQUE(doctor, start): el hueco ya es de otra reserva (de este proceso o de otro)
+            raise SlotTaken(f"El doctor {booking.doctor} ya tiene una cita el {start:%Y-%m-%d} a las {start:%H:%M}.")
+        return booking
+
+    def cancel(self, booking_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM bookings WHERE id = ?", (booking_id,)).rowcount > 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_store: Optional[BookingStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> BookingStore:
+    """Agenda compartida del proceso."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BookingStore()
+    return _store
@@ -0,0 +1,594 @@
+# src/core/checkpoint.py
+"""
+Checkpointers para conversaciones por `thread_id`.
+
+`get_checkpointer()` devuelve el checkpointer del proceso según CHECKPOINTER:
+  sqlite   SQLiteDeltaSaver en CHECKPOINT_DB (por defecto)
+  memory   InMemorySaver de LangGraph (se pierde al reiniciar)
+  none     sin persistencia
+
+Los builders de cada agente lo reciben al compilar (`build_graph(checkpointer)`);
+`app` se sigue compilando sin checkpointer porque `langgraph dev` usa el suyo.
+
+SQLiteDeltaSaver (SQLite en modo WAL) no guarda una foto completa del estado en
+cada paso: los canales que no son listas de mensajes se guardan solo cuando cambia
+su versión, y las listas de mensajes se guardan como un log append-only, de modo
+que cada paso escribe únicamente los mensajes nuevos. Cada versión del canal es
+(época, longitud) sobre ese log; si la lista deja de ser una extensión de la
+anterior (mensaje reemplazado o borrado, rama desde un checkpoint viejo) se abre
+una época nueva con la lista completa. La compactación periódica conserva los
+últimos CHECKPOINT_KEEP_LAST checkpoints de cada thread y `prune()` borra los
+threads inactivos.
+
+Variables de entorno:
+  CHECKPOINTER               sqlite | memory | none (sqlite)
+  CHECKPOINT_DB              ruta de la base SQLite (data/checkpoints.sqlite3)
+  CHECKPOINT_KEEP_LAST       checkpoints que se conservan por thread al compactar (20)
+  CHECKPOINT_COMPACT_EVERY   escrituras por thread entre compactaciones (50)
+  CHECKPOINT_MAX_AGE_DAYS    días sin actividad tras los que se borra un thread; 0 = nunca (30)
+  CHECKPOINT_CACHE_THREADS   threads con mensajes en memoria para no releer el log (256)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+CHECKPOINTER = os.getenv("CHECKPOINTER", "sqlite")
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "data/checkpoints.sqlite3")
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "20"))
+CHECKPOINT_COMPACT_EVERY = int(os.getenv("CHECKPOINT_COMPACT_EVERY", "50"))
+CHECKPOINT_MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", "30"))
+CHECKPOINT_CACHE_THREADS = int(os.getenv("CHECKPOINT_CACHE_THREADS", "256"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS message_log (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, epoch, seq)
+);
+CREATE TABLE IF NOT EXISTS message_versions (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+
+def _is_message_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(m, BaseMessage) for m in value)
+
+class SQLiteDeltaSaver(BaseCheckpointSaver):
+    """Checkpointer SQLite (WAL) que persiste los mensajes como deltas.
+
+    Una sola conexión por proceso protegida con un lock; las escrituras usan
+    `BEGIN IMMEDIATE`, así varios workers pueden compartir el mismo archivo.
+    """
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_DB,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        compact_every: int = CHECKPOINT_COMPACT_EVERY,
+        cache_threads: int = CHECKPOINT_CACHE_THREADS,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.compact_every = compact_every
+        self.cache_threads = cache_threads
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # con WAL sigue siendo seguro ante caídas del proceso
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # (thread, ns, canal) -> (época, mensajes del log ya conocidos). Los mensajes se
+        # comparten con el estado del grafo; add_messages copia la lista, no los mensajes.
+        self._logs: "OrderedDict[Tuple[str, str, str], Tuple[int, List[BaseMessage]]]" = OrderedDict()
+        self._puts: Dict[Tuple[str, str], int] = {}
+
+    # -------------------------
+    # Utilidades internas
+    # -------------------------
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        """Transacción de escritura; el lock de escritura de SQLite se toma al empezar."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _cache_log(self, key: Tuple[str, str, str], epoch: int, messages: List[BaseMessage]) -> None:
+        self._logs[key] = (epoch, messages)
+        self._logs.move_to_end(key)
+        while len(self._logs) > self.cache_threads:
+            self._logs.popitem(last=False)
+
+    def _put_messages(self, thread_id: str, ns: str, channel: str, version: str, value: List[BaseMessage]) -> None:
+        """Añade al log solo los mensajes nuevos; abre una época nueva si la lista no es una extensión."""
+        key = (thread_id, ns, channel)
+        cached = self._logs.get(key)
+        start, epoch = 0, None
+        if cached is not None:
+            cached_epoch, known = cached
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM message_log "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND epoch = ?",
+                (thread_id, ns, channel, cached_epoch),
+            ).fetchone()
+            # Extensión del final del log: mismos objetos en el prefijo (comparación por identidad)
+            if (
+                row[0] == len(known)
+                and len(value) >= len(known)
+                and all(a is b for a, b in zip(known, value))
+            ):
+                epoch, start = cached_epoch, len(known)
+        if epoch is None:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(epoch) + 1, 0) FROM message_log "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ?",
+                (thread_id, ns, channel),
+            ).fetchone()
+            epoch = row[0]
+        self._conn.executemany(
+            "INSERT INTO message_log (thread_id, checkpoint_ns, channel, epoch, seq, type, blob) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (thread_id, ns, channel, epoch, seq, *self.serde.dumps_typed(value[seq]))
+                for seq in range(start, len(value))
+            ],
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO message_versions (thread_id, checkpoint_ns, channel, version, epoch, length) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (thread_id, ns, channel, version, epoch, len(value)),
+        )
+        self._cache_log(key, epoch, list(value))
+
+    def _load_messages(self, thread_id: str, ns: str, channel: str, epoch: int, length: int) -> List[BaseMessage]:
+        key = (thread_id, ns, channel)
+        cached = self._logs.get(key)
+        if cached is not None and cached[0] == epoch and len(cached[1]) >= length:
+            self._logs.move_to_end(key)
+            return cached[1][:length]
+        rows = self._conn.execute(
+            "SELECT type, blob FROM message_log "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND epoch = ? AND seq < ? ORDER BY seq",
+            (thread_id, ns, channel, epoch, length),
+        ).fetchall()
+        messages = [self.serde.loads_typed((t, b)) for t, b in rows]
+        self._cache_log(key, epoch, messages)
+        return list(messages)
+
+    def _load_values(self, thread_id: str, ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = self._conn.execute(
+                "SELECT epoch, length FROM message_versions "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, str(version)),
+            ).fetchone()
+            if row is not None:
+                values[channel] = self._load_messages(thread_id, ns, channel, row[0], row[1])
+                continue
+            row = self._conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _to_tuple(self, row: Sequence[Any]) -> CheckpointTuple:
+        thread_id, ns, checkpoint_id, parent_id, type_, checkpoint_b, metadata_type, metadata_b = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_b))
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, blob FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_values(thread_id, ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_b)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, b))) for task_id, channel, t, b in writes],
+        )
+
+    # -------------------------
+    # API de BaseCheckpointSaver
+    # -------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id, ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            if checkpoint_id:
+                row = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            return self._to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = f"SELECT {_COLUMNS} FROM checkpoints"
+        where: List[str] = []
+        params: List[Any] = []
+        if config:
+            configurable = config["configurable"]
+            where.append("thread_id = ?")
+            params.append(configurable["thread_id"])
+            if configurable.get("checkpoint_ns") is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(configurable["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            result = []
+            for row in rows:
+                if limit is not None and len(result) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[6], row[7]))
+                    if not all(metadata.get(k) == v for k, v in filter.items()):
+                        continue
+                result.append(self._to_tuple(row))
+        yield from result
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        configurable = config["configurable"]
+        thread_id, ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        type_, checkpoint_b = self.serde.dumps_typed(c)
+        metadata_type, metadata_b = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            with self._write():
+                for channel, version in new_versions.items():
+                    value = values.get(channel)
+                    if _is_message_list(value):
+                        self._put_messages(thread_id, ns, channel, str(version), value)
+                        continue
+                    typed = self.serde.dumps_typed(value) if channel in values else ("empty", b"")
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, blob) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (thread_id, ns, channel, str(version), *typed),
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints "
+                    "(thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint["id"], configurable.get("checkpoint_id"),
+                     type_, checkpoint_b, metadata_type, metadata_b, time.time()),
+                )
+            count = self._puts.get((thread_id, ns), 0) + 1
+            self._puts[(thread_id, ns)] = count
+            if self.compact_every and count % self.compact_every == 0:
+                self._compact(thread_id, ns)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id, ns = configurable["thread_id"], configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+        # Las escrituras especiales (errores, interrupciones) reemplazan a las anteriores
+        verb = "INSERT OR REPLACE" if all(c in WRITES_IDX_MAP for c, _ in writes) else "INSERT OR IGNORE"
+        rows = [
+            (thread_id, ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel,
+             *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock, self._write():
+            self._conn.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, blob, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            with self._write():
+                for table in ("checkpoints", "blobs", "message_log", "message_versions", "writes"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            for key in [k for k in self._logs if k[0] == thread_id]:
+                del self._logs[key]
+            for key in [k for k in self._puts if k[0] == thread_id]:
+                del self._puts[key]
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Mismo formato que InMemorySaver: ordenable como texto
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # -------------------------
+    # Compactación y limpieza
+    # -------------------------
+    def _compact(self, thread_id: str, ns: str) -> int:
+        """Conserva los últimos `keep_last` checkpoints del thread y borra lo que ya no referencian."""
+        rows = self._conn.execute(
+            "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+            (thread_id, ns),
+        ).fetchall()
+        if len(rows) <= self.keep_last:
+            return 0
+        kept = rows[: self.keep_last]
+        cutoff = kept[-1][0]
+        referenced = set()
+        for _, type_, checkpoint_b in kept:
+            for channel, version in self.serde.loads_typed((type_, checkpoint_b))["channel_versions"].items():
+                referenced.add((channel, str(version)))
+        params = (thread_id, ns)
+        with self._write():
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (*params, cutoff),
+            )
+            self._conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (*params, cutoff),
+            )
+            for table in ("blobs", "message_versions"):
+                stale = [
+                    (thread_id, ns, channel, version)
+                    for channel, version in self._conn.execute(
+                        f"SELECT channel, version FROM {table} WHERE thread_id = ? AND checkpoint_ns = ?", params
+                    )
+                    if (channel, version) not in referenced
+                ]
+                self._conn.executemany(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                    stale,
+                )
+            # Épocas del log que ya no usa ninguna versión viva (la más reciente se conserva siempre)
+            self._conn.execute(
+                "DELETE FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND epoch < (SELECT COALESCE(MAX(epoch), 0) FROM message_log m "
+                "             WHERE m.thread_id = message_log.thread_id AND m.checkpoint_ns = message_log.checkpoint_ns "
+                "             AND m.channel = message_log.channel) "
+                "AND NOT EXISTS (SELECT 1 FROM message_versions v WHERE v.thread_id = message_log.thread_id "
+                "                AND v.checkpoint_ns = message_log.checkpoint_ns AND v.channel = message_log.channel "
+                "                AND v.epoch = message_log.epoch)",
+                params,
+            )
+        return len(rows) - len(kept)
+
+    def compact(self, thread_id: Optional[str] = None) -> int:
+        """Compacta un thread (o todos); devuelve cuántos checkpoints se borraron."""
+        with self._lock:
+            if thread_id is None:
+                keys = self._conn.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+            else:
+                keys = self._conn.execute(
+                    "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).fetchall()
+            return sum(self._compact(t, ns) for t, ns in keys)
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Borra los threads sin checkpoints nuevos en `max_age_seconds`; devuelve cuántos."""
+        with self._lock:
+            threads = [
+                t for (t,) in self._conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                    (time.time() - max_age_seconds,),
+                )
+            ]
+        for thread_id in threads:
+            self.delete_thread(thread_id)
+        return len(threads)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+# -------------------------
+# Factoría
+# -------------------------
+_checkpointers: Dict[str, Optional[BaseCheckpointSaver]] = {}
+_factory_lock = threading.Lock()
+
+def get_checkpointer(kind: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """Checkpointer compartido del proceso según `kind` (o CHECKPOINTER); None si es "none"."""
+    kind = (kind or CHECKPOINTER).lower()
+    with _factory_lock:
+        if kind in _checkpointers:
+            return _checkpointers[kind]
+        if kind == "none":
+            saver = None
+        elif kind == "memory":
+            from langgraph.checkpoint.memory import InMemorySaver
+            saver = InMemorySaver()
+        elif kind == "sqlite":
+            saver = SQLiteDeltaSaver()
+            if CHECKPOINT_MAX_AGE_DAYS > 0:
+                saver.prune(CHECKPOINT_MAX_AGE_DAYS * 86400)
+        else:
+            raise ValueError(f"CHECKPOINTER desconocido: {kind} (usa sqlite, memory o none)")
+        _checkpointers[kind] = saver
+        return saver
+
+_local_apps: Dict[Callable[..., Any], Any] = {}
+
+def local_app(build_graph: Callable[..., Any]) -> Any:
+    """Grafo de `build_graph` compilado una vez con el checkpointer del proceso.
+
+    Lo usan los helpers ask()/ask_stream() y la API, donde no está el servidor de
+    `langgraph dev` para guardar el historial de cada thread.
+    """
+    with _factory_lock:
+        app = _local_apps.get(build_graph)
+    if app is None:
+        app = build_graph(get_checkpointer())
+        with _factory_lock:
+            app = _local_apps.setdefault(build_graph, app)
+    return app
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de checkpoints")
+    parser.add_argument("--db", default=CHECKPOINT_DB)
+    parser.add_argument("--max-age-days", type=float, default=CHECKPOINT_MAX_AGE_DAYS,
+                        help="borra threads inactivos desde hace más días (0 = no borrar)")
+    args = parser.parse_args()
+
+    saver = SQLiteDeltaSaver(args.db)
+    pruned = saver.prune(args.max_age_days * 86400) if args.max_age_days > 0 else 0
+    compacted = saver.compact()
+    saver.close()
+    print(f"Threads borrados: {pruned}; checkpoints compactados: {compacted}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src/core/contact_rules.py
+"""
+Reglas deterministas para datos de contacto (email, teléfono, edad, nombre).
+
+Son el camino rápido del extractor: cubren la mayoría de los casos sin llamar al
+LLM. `may_contain_contact_data` dice si un texto podría traer alguno de los datos
+que aún faltan; si no, no merece la pena consultar al modelo.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, Optional
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+# +57 300 123 4567, (55) 1234-5678, 600123456...: 7 a 15 dígitos con separadores habituales
+PHONE_RE = re.compile(r"(?<![\w@])\+?\d[\d\s().-]{5,18}\d(?!\w)")
+# Un número cuenta como teléfono seguro si lleva prefijo + o una de estas palabras poco antes
+_PHONE_CUE_RE = re.compile(r"\b(?:tel[eé]fono|tel|cel|celular|m[oó]vil|whatsapp|wsp|ll[aá]mame\s+al)\b", re.IGNORECASE)
+# Números que no son teléfonos: pedidos, facturas, importes
+_NOT_PHONE_BEFORE_RE = re.compile(r"(?:pedido|orden|factura|ticket|referencia|folio|gu[ií]a|cost[oó]|pagu[eé]|[$€])\W*(?:n[uú]mero|n[oº°]\.?|#)?\W*$", re.IGNORECASE)
+_NOT_PHONE_AFTER_RE = re.compile(r"^\s*(?:pesos|euros|d[oó]lares|soles|usd|eur|mxn|cop|€|\$)", re.IGNORECASE)
+_DATE_RE = re.compile(r"\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[-.]\d{1,2}[-.]\d{2,4}")
+AGE_RE = re.compile(
+    r"\b(?:tengo|cumplí|cumpli)\s+(\d{1,3})\s+años\b"
+    r"|\b(\d{1,3})\s+años\s+de\s+edad\b"
+    r"|\bedad\s*(?:es|:)?\s*(?:de\s+)?(\d{1,3})\b",
+    re.IGNORECASE,
+)
+# El nombre se reconoce en cualquier caja; el apellido solo si va capitalizado
+# ("me llamo ana quiero..." -> "Ana", "ME LLAMO ANA" -> "Ana", "me llamo Ana María" -> "Ana María")
+NAME_RE = re.compile(
+    r"\b(?i:me\s+llamo|mi\s+nombre\s+es|ll[aá]mame|puedes\s+llamarme)\s+"
+    r"((?i:[a-záéíóúüñ][a-záéíóúüñ'-]+)(?:\s+[A-ZÁÉÍÓÚÜÑ][a-záéíóúüñ'-]+)?)"
+)
+# Palabras que sugieren un dato de contacto aunque las reglas no lo hayan capturado
+_HINTS = {
+    "name": re.compile(r"\b(?:llamo|nombre|soy|llámame|llamarme)\b", re.IGNORECASE),
+    "email": re.compile(r"@|\b(?:correo|e-?mail|mail|gmail|hotmail|arroba)\b", re.IGNORECASE),
+    "phone": re.compile(r"\+\d|\b(?:tel[eé]fono|tel|cel|celular|m[oó]vil|whatsapp|n[uú]mero)\b", re.IGNORECASE),
+    "age": re.compile(r"\b(?:años|edad|cumpleaños)\b", re.IGNORECASE),
+}
+
+def extract_email(text: str) -> Optional[str]:
+    match = EMAIL_RE.search(text)
+    return match.group(0).lower() if match else None
+
+def extract_phone(text: str, cued_only: bool = False) -> Optional[str]:
+    """Primer teléfono del texto, prefiriendo los que tienen pista (+, 'teléfono', 'whatsapp'...).
+
+    Un número suelto solo se acepta si no parece un pedido o un importe, y nunca con
+    `cued_only` (cuando ya hay un teléfono guardado que no debe pisarse)."""
+    text = EMAIL_RE.sub(" ", text)
+    bare = None
+    for match in PHONE_RE.finditer(text):
+        raw = match.group(0).strip()
+        if _DATE_RE.fullmatch(raw):
+            continue
+        digits = re.sub(r"\D", "", raw)
+        if not 7 <= len(digits) <= 15:
+            continue
+        phone = ("+" if raw.startswith("+") else "") + digits
+        before = text[max(0, match.start() - 30):match.start()]
+        if raw.startswith("+") or _PHONE_CUE_RE.search(before):
+            return phone
+        if bare is None and not cued_only and not (
+            _NOT_PHONE_BEFORE_RE.search(before) or _NOT_PHONE_AFTER_RE.match(text[match.end():])
+        ):
+            bare = phone
+    return bare
+
+def extract_age(text: str) -> Optional[int]:
+    match = AGE_RE.search(text)
+    if not match:
+        return None
+    age = int(next(g for g in match.groups() if g))
+    return age if 0 < age < 120 else None
+
+def extract_name(text: str) -> Optional[str]:
+    """'Hola, me llamo ana maría' -> 'Ana'; 'me llamo Ana María' -> 'Ana María'
+    (generaliza el 'me llamo X' de simple.ensure_name)."""
+    match = NAME_RE.search(text)
+    return match.group(1).title() if match else None
+
+def extract_contact_fields(text: str, known: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """Campos encontrados por las reglas (solo los presentes).
+    Con `known`, un teléfono ya guardado solo se reemplaza por otro con pista explícita."""
+    found = {
+        "name": extract_name(text),
+        "email": extract_email(text),
+        "phone": extract_phone(text, cued_only=bool((known or {}).get("phone"))),
+        "age": extract_age(text),
+    }
+    return {k: v for k, v in found.items() if v is not None}
+
+def may_contain_contact_data(text: str, fields: Iterable[str] = ("name", "email", "phone", "age")) -> bool:
+    """True si `text` tiene pistas de alguno de `fields` (p. ej. solo los que faltan)."""
+    return any(_HINTS[f].search(text) for f in fields if f in _HINTS)
@@ -0,0 +1,170 @@
+# src/core/history.py
+"""
+Ventana de historial con resumen en segundo plano.
+
+Mandar todo `messages` al LLM en cada turno hace que el coste de evaluar el prompt
+crezca con la conversación. `RollingHistory` conserva literales los últimos
+HISTORY_KEEP_TURNS turnos (un turno = mensaje del usuario + respuestas), siempre
+dentro de HISTORY_TOKEN_BUDGET tokens, y resume lo anterior en `summary`.
+
+El resumen se calcula en un hilo aparte, fuera del camino crítico: el nodo de
+historial lo lanza cuando hay mensajes que salen de la ventana y lo recoge en un
+turno siguiente, cuando ya terminó. Mientras tanto esos mensajes simplemente no
+entran al prompt. Cada resumen incorpora solo los mensajes nuevos al anterior,
+así su coste tampoco depende de la longitud total.
+
+Uso en un grafo:
+  history = RollingHistory()
+  builder.add_node("history", history.node)       # antes del nodo que llama al LLM
+  llm.invoke([system] + history.prompt_messages(state))
+
+El estado necesita los campos `summary: str` y `summary_upto: int`.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+
+from src.core.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))  # Resumen + turnos literales
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", os.getenv("MODEL", "qwen2.5:7b-instruct"))
+HISTORY_SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", "2"))
+
+SUMMARY_PROMPT = (
+    "Resume la conversación entre un usuario y un asistente en español, en pocas frases. "
+    "Conserva nombres, datos de contacto, fechas, decisiones y preguntas pendientes; "
+    "omite saludos y cortesías."
+)
+
+# Un solo pool para todos los grafos del proceso: los resúmenes no compiten con las respuestas
+_executor = ThreadPoolExecutor(max_workers=HISTORY_SUMMARY_WORKERS, thread_name_prefix="history-summary")
+
+def _content(message: BaseMessage) -> str:
+    content = message.content
+    return content if isinstance(content, str) else str(content)
+
+def _transcript(messages: Sequence[BaseMessage]) -> str:
+    roles = {"human": "Usuario", "ai": "Asistente", "tool": "Herramienta"}
+    return "\n".join(f"{roles.get(m.type, m.type)}: {_content(m)}" for m in messages if _content(m))
+
+def _thread_key(config: Optional[RunnableConfig]) -> str:
+    return str(((config or {}).get("configurable") or {}).get("thread_id", "default"))
+
+class RollingHistory:
+    """Ventana de turnos recientes + resumen incremental calculado en segundo plano."""
+
+    def __init__(
+        self,
+        keep_turns: int = HISTORY_KEEP_TURNS,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        model: str = HISTORY_SUMMARY_MODEL,
+        llm=None,
+    ):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.model = model
+        self._llm = llm
+        # thread_id -> (índice hasta el que resume, futuro con el resumen)
+        self._pending: Dict[str, Tuple[int, Future]] = {}
+        self._lock = threading.Lock()
+
+    def _get_llm(self):
+        if self._llm is None:
+            from src.core.llm import get_chat_model
+
+            self._llm = get_chat_model(self.model, temperature=0)
+        return self._llm
+
+    def window_start(self, messages: Sequence[BaseMessage], summary: str = "") -> int:
+        """Índice del primer mensaje literal: últimos `keep_turns` turnos que quepan en el presupuesto.
+
+        Recorre la lista desde el final, así el coste solo depende del tamaño de la ventana.
+        El último turno se conserva siempre, aunque no quepa.
+        """
+        budget = self.token_budget - count_tokens(summary)
+        used = 0
+        turns = 0
+        start = len(messages)
+        turn_tokens = 0
+        for i in range(len(messages) - 1, -1, -1):
+            turn_tokens += count_tokens(_content(messages[i]))
+            if not isinstance(messages[i], HumanMessage) and i > 0:
+                continue
+            # messages[i] abre un turno: se incluye entero o no se incluye
+            if turns and (turns >= self.keep_turns or used + turn_tokens > budget):
+                break
+            used += turn_tokens
+            turns += 1
+            start = i
+            turn_tokens = 0
+        return start
+
+    def prompt_messages(self, state: Dict[str, Any]) -> List[BaseMessage]:
+        """Mensajes para el LLM: el resumen (si hay) como SystemMessage y la ventana literal."""
+        messages = list(state.get("messages", []))
+        summary = state.get("summary") or ""
+        recent = messages[self.window_start(messages, summary):]
+        if summary:
+            return [SystemMessage(content=f"Resumen de la conversación anterior: {summary}")] + recent
+        return recent
+
+    def _summarize(self, summary: str, messages: Sequence[BaseMessage]) -> str:
+        parts = []
+        if summary:
+            parts.append(f"Resumen hasta ahora:\n{summary}")
+        parts.append(f"Mensajes nuevos:\n{_transcript(messages)}")
+        parts.append("Devuelve el resumen actualizado.")
+        response = self._get_llm().invoke(
+            [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content="\n\n".join(parts))]
+        )
+        return _content(response).strip()
+
+    def node(self, state: Dict[str, Any], config: RunnableConfig) -> dict:
+        """Nodo de LangGraph: recoge el resumen terminado y lanza el siguiente si hace falta.
+
+        Nunca espera al LLM: si el resumen anterior no ha terminado, se deja para otro turno.
+        """
+        messages = list(state.get("messages", []))
+        summary = state.get("summary") or ""
+        upto = state.get("summary_upto", 0)
+        if upto > len(messages):  # historial reescrito (mensajes borrados): se empieza de cero
+            summary, upto = "", 0
+        update: Dict[str, Any] = {}
+        key = _thread_key(config)
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending[1].done():
+                del self._pending[key]
+                new_upto, future = pending
+                try:
+                    if new_upto > upto:
+                        summary, upto = future.result(), new_upto
+                        update = {"summary": summary, "summary_upto": upto}
+                except Exception:
+                    logger.exception("Error resumiendo el historial del thread %s", key, extra={"thread_id": key})
+                pending = None
+
+            start = self.window_start(messages, summary)
+            if pending is None and start > upto:
+                future = _executor.submit(self._summarize, summary, messages[upto:start])
+                self._pending[key] = (start, future)
+        return update
+
+    def wait(self, thread_id: str, timeout: Optional[float] = None) -> None:
+        """Espera al resumen pendiente de un thread (útil en scripts y benchmarks)."""
+        with self._lock:
+            pending = self._pending.get(thread_id)
+        if pending is not None:
+            pending[1].exception(timeout=timeout)
@@ -0,0 +1,146 @@
+# src/core/llm.py
+"""
+Registro de clientes ChatOllama compartido por todos los agentes del proceso.
+
+Cada combinación (modelo, base_url, temperatura, opciones) se construye una sola
+vez y se reutiliza en todos los turnos, así se conservan las conexiones keep-alive
+con Ollama. Los clientes síncronos de un mismo backend comparten además un único
+pool HTTP acotado, de modo que todo el servidor usa un número limitado de conexiones.
+
+Variables de entorno:
+  OLLAMA_BASE_URL                    URL por defecto del backend
+  OLLAMA_MAX_CONNECTIONS             conexiones máximas por pool (16)
+  OLLAMA_MAX_KEEPALIVE_CONNECTIONS   conexiones inactivas que se conservan (8)
+  OLLAMA_KEEPALIVE_EXPIRY            segundos que vive una conexión inactiva (60)
+  OLLAMA_TIMEOUT                     timeout por petición en segundos (sin límite si no se define)
+  OLLAMA_KEEP_ALIVE                  cuánto mantiene Ollama el modelo (y su cache KV) cargado tras la
+                                     última petición (30m; -1 = siempre, vacío = lo que diga el servidor)
+
+Si un modelo tiene varios backends (OLLAMA_BACKENDS / OLLAMA_MODEL_BACKENDS, ver
+src/core/router.py) se devuelve un RoutedChatModel con un cliente por backend, que
+reparte la carga y salta los backends caídos.
+
+Con `set_chat_model_factory` se sustituye ChatOllama por otro modelo (p. ej. el
+modelo falso de src/bench/fakes.py) en todos los agentes, sin tocar su código.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+
+from src.core import metrics  # noqa: F401  registra el handler de métricas (todos los agentes pasan por aquí)
+from src.core.router import RoutedChatModel, backend_urls
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "8"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+OLLAMA_TIMEOUT = float(os.environ["OLLAMA_TIMEOUT"]) if os.getenv("OLLAMA_TIMEOUT") else None
+# Segundos ("600", "-1") o duración de Ollama ("30m"): así reutiliza el prefijo del prompt entre turnos
+OLLAMA_KEEP_ALIVE: Optional[Any] = os.getenv("OLLAMA_KEEP_ALIVE", "30m") or None
+if OLLAMA_KEEP_ALIVE is not None and OLLAMA_KEEP_ALIVE.lstrip("-").isdigit():
+    OLLAMA_KEEP_ALIVE = int(OLLAMA_KEEP_ALIVE)
+
+_models: Dict[Tuple[Hashable, ...], BaseChatModel] = {}
+_transports: Dict[str, httpx.HTTPTransport] = {}
+_lock = threading.Lock()
+# Si se define, construye los modelos en lugar de ChatOllama: factory(model, base_url, temperature, **kwargs)
+_factory: Optional[Callable[..., BaseChatModel]] = None
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY,
+    )
+
+def _sync_transport(base_url: str) -> httpx.HTTPTransport:
+    """Pool HTTP síncrono compartido por todos los clientes de un mismo backend."""
+    transport = _transports.get(base_url)
+    if transport is None:
+        transport = _transports[base_url] = httpx.HTTPTransport(limits=_limits())
+    return transport
+
+def _freeze(value: Any) -> Hashable:
+    """Convierte opciones (dicts/listas) en algo usable como clave del registro."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def _build_client(model: str, base_url: str, temperature: Optional[float], kwargs: Dict[str, Any]) -> BaseChatModel:
+    if _factory is not None:
+        return _factory(model=model, base_url=base_url, temperature=temperature, **kwargs)
+    from langchain_ollama import ChatOllama  # diferido: solo lo paga el primer grafo que llama al LLM
+
+    return ChatOllama(
+        model=model,
+        base_url=base_url,
+        temperature=temperature,
+        client_kwargs={"timeout": OLLAMA_TIMEOUT},
+        sync_client_kwargs={"transport": _sync_transport(base_url)},
+        # El pool async de httpx queda ligado al event loop donde se abre,
+        # por eso no se comparte entre clientes: cada uno tiene el suyo, acotado.
+        async_client_kwargs={"limits": _limits()},
+        **{"keep_alive": OLLAMA_KEEP_ALIVE, **kwargs},
+    )
+
+def get_chat_model(
+    model: Optional[str] = None,
+    base_url: Optional[str] = None,
+    temperature: Optional[float] = None,
+    **kwargs: Any,
+) -> BaseChatModel:
+    """
+    Devuelve el ChatOllama compartido para esta configuración (lo crea la primera vez).
+
+    `model` y `base_url` toman por defecto MODEL y OLLAMA_BASE_URL; el resto de
+    opciones (`num_ctx`, `format`, ...) se pasa tal cual a ChatOllama y forma parte
+    de la clave. Con varios backends para el modelo devuelve un RoutedChatModel.
+    Las instancias no se deben mutar: para herramientas o salida estructurada usa
+    `bind_tools`/`with_structured_output`, que no modifican el original.
+    """
+    model = model or os.getenv("MODEL", "qwen2.5:7b-instruct")
+    urls = tuple(backend_urls(model, base_url or OLLAMA_BASE_URL))
+    key = (model, urls, temperature, _freeze(kwargs))
+    llm = _models.get(key)
+    if llm is not None:
+        return llm
+    with _lock:
+        llm = _models.get(key)
+        if llm is None:
+            if len(urls) == 1:
+                llm = _build_client(model, urls[0], temperature, kwargs)
+            else:
+                clients = {url: _build_client(model, url, temperature, kwargs) for url in urls}
+                llm = RoutedChatModel(model=model, clients=clients)
+            _models[key] = llm
+    return llm
+
+def set_chat_model_factory(factory: Optional[Callable[..., BaseChatModel]]) -> None:
+    """Sustituye ChatOllama en get_chat_model (None vuelve a Ollama).
+
+    Los agentes piden su modelo en el primer turno y lo conservan, así que hay que
+    llamarla antes de usarlos. Vacía el registro para no mezclar clientes de ambos tipos.
+    """
+    global _factory
+    clear_registry()
+    _factory = factory
+
+def registry_size() -> int:
+    """Número de clientes distintos creados en este proceso."""
+    return len(_models)
+
+def clear_registry() -> None:
+    """Olvida los clientes y cierra los pools síncronos (útil en tests o al recargar config)."""
+    with _lock:
+        _models.clear()
+        for transport in _transports.values():
+            transport.close()
+        _transports.clear()
@@ -0,0 +1,56 @@
+# src/core/logs.py
+"""
+Configuración de logging del proceso.
+
+Los módulos solo usan `logging.getLogger(__name__)`; quien arranca el proceso
+(la API, un CLI) llama a `configure_logging()` una vez. Con LOG_FORMAT=json cada
+línea es un objeto JSON con los campos pasados en `extra=`, listo para un
+agregador de logs; con `text` se ve como siempre en la terminal.
+
+Variables de entorno:
+  LOG_LEVEL    nivel mínimo (INFO)
+  LOG_FORMAT   text | json (text)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Atributos propios de LogRecord: todo lo demás viene de `extra=`
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+_configured = False
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Instala un handler en el logger raíz (solo la primera vez)."""
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    _configured = True
@@ -0,0 +1,434 @@
+# src/core/metrics.py
+"""
+Métricas de los grafos: tiempo por nodo, tokens y tiempos de Ollama, recuperación y caches.
+
+Se recogen de dos formas:
+  - un callback handler global (se registra solo con METRICS_ENABLED=1) que mide
+    cada nodo de cualquier grafo y cada llamada a un chat model, sin tocar los agentes
+  - funciones explícitas para lo que no pasa por callbacks (recuperación, caches)
+
+Se exportan en formato de texto de Prometheus (`render()`, endpoint GET /metrics de
+la API) y, con OTEL_ENABLED=1 y opentelemetry instalado, como spans (grafo -> nodo -> LLM).
+Con METRICS_ENABLED=0 no se registra el handler y las funciones de registro vuelven
+de inmediato. Cada proceso tiene sus propios contadores: con varios workers, cada
+uno expone los suyos.
+
+Métricas:
+  graph_node_seconds{graph,node}                 histograma
+  graph_branch_timeouts_total{node}              ramas cortadas por with_timeout
+  llm_request_seconds{model}                     histograma de la llamada completa
+  llm_time_to_first_token_seconds{model}         histograma (solo en streaming)
+  llm_prompt_eval_seconds{model} / llm_eval_seconds{model}   tiempos que reporta Ollama
+  llm_tokens_total{model,kind=prompt|completion}
+  llm_errors_total{model}
+  retrieval_seconds{source} / retrieval_documents{source}    histogramas
+  retrieval_requests_total{source,result=hit|empty|error}
+  cache_requests_total{cache,result=hit|miss}    (ratio de aciertos = hit / total)
+  llm_backend_requests_total{backend,result=ok|error}      peticiones por backend de Ollama (src/core/router.py)
+  llm_backend_circuit_opens_total{backend}
+  llm_hedged_requests_total{model,winner=primary|hedge}
+  llm_tier_seconds{model,path=small|large|escalated}     llamadas de src/core/tiering.py
+  llm_tier_escalations_total{model,reason}
+"""
+
+from __future__ import annotations
+
+import inspect
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Histogramas y contadores (formato de texto de Prometheus)
+# -------------------------
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [cuentas por bucket..., suma, total]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels: Any) -> float:
+        row = self._values.get(self._key(labels))
+        return row[-1] if row else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, row in items:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {row[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {row[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}"
+
+REGISTRY: List[_Metric] = []
+
+def render() -> str:
+    """Todas las métricas en el formato de texto de Prometheus (versión 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+NODE_SECONDS = Histogram("graph_node_seconds", "Duración de cada nodo", ("graph", "node"))
+BRANCH_TIMEOUTS = Counter("graph_branch_timeouts_total", "Ramas que superaron su límite de tiempo", ("node",))
+LLM_SECONDS = Histogram("llm_request_seconds", "Duración de cada llamada al chat model", ("model",))
+LLM_FIRST_TOKEN = Histogram("llm_time_to_first_token_seconds", "Tiempo hasta el primer token", ("model",))
+LLM_PROMPT_EVAL = Histogram("llm_prompt_eval_seconds", "Tiempo de evaluación del prompt según Ollama", ("model",))
+LLM_EVAL = Histogram("llm_eval_seconds", "Tiempo de generación según Ollama", ("model",))
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens de prompt y de respuesta", ("model", "kind"))
+LLM_ERRORS = Counter("llm_errors_total", "Llamadas al chat model que fallaron", ("model",))
+RETRIEVAL_SECONDS = Histogram("retrieval_seconds", "Duración de cada recuperación", ("source",))
+RETRIEVAL_DOCUMENTS = Histogram("retrieval_documents", "Documentos por recuperación", ("source",), COUNT_BUCKETS)
+RETRIEVAL_REQUESTS = Counter("retrieval_requests_total", "Recuperaciones por resultado", ("source", "result"))
+CACHE_REQUESTS = Counter("cache_requests_total", "Consultas a caches por resultado", ("cache", "result"))
+BACKEND_REQUESTS = Counter("llm_backend_requests_total", "Peticiones a cada backend de Ollama", ("backend", "result"))
+CIRCUIT_OPENS = Counter("llm_backend_circuit_opens_total", "Veces que se abrió el circuito de un backend", ("backend",))
+HEDGED_REQUESTS = Counter("llm_hedged_requests_total", "Peticiones duplicadas en otro backend y quién ganó", ("model", "winner"))
+TIER_SECONDS = Histogram("llm_tier_seconds", "Duración por nivel de modelo (escalated = pequeño + grande)", ("model", "path"))
+TIER_ESCALATIONS = Counter("llm_tier_escalations_total", "Respuestas del modelo pequeño rechazadas, por motivo", ("model", "reason"))
+
+# -------------------------
+# Registro explícito (recuperación, caches, ramas, backends, niveles)
+# -------------------------
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None:
+    if not METRICS_ENABLED:
+        return
+    if hits:
+        CACHE_REQUESTS.inc(hits, cache=cache, result="hit")
+    if misses:
+        CACHE_REQUESTS.inc(misses, cache=cache, result="miss")
+
+def cache_hit_ratio(cache: str) -> Optional[float]:
+    hits = CACHE_REQUESTS.value(cache=cache, result="hit")
+    total = hits + CACHE_REQUESTS.value(cache=cache, result="miss")
+    return hits / total if total else None
+
+def record_retrieval(source: str, seconds: float, documents: int, error: bool = False) -> None:
+    if not METRICS_ENABLED:
+        return
+    RETRIEVAL_SECONDS.observe(seconds, source=source)
+    if error:
+        RETRIEVAL_REQUESTS.inc(source=source, result="error")
+        return
+    RETRIEVAL_DOCUMENTS.observe(documents, source=source)
+    RETRIEVAL_REQUESTS.inc(source=source, result="hit" if documents else "empty")
+
+def record_backend_request(backend: str, result: str) -> None:
+    if METRICS_ENABLED:
+        BACKEND_REQUESTS.inc(backend=backend, result=result)
+
+def record_circuit_open(backend: str) -> None:
+    if METRICS_ENABLED:
+        CIRCUIT_OPENS.inc(backend=backend)
+
+def record_hedge(model: str, winner: str) -> None:
+    if METRICS_ENABLED:
+        HEDGED_REQUESTS.inc(model=model, winner=winner)
+
+def record_tier(model: str, path: str, seconds: float, reason: Optional[str] = None) -> None:
+    if not METRICS_ENABLED:
+        return
+    TIER_SECONDS.observe(seconds, model=model, path=path)
+    if reason:
+        TIER_ESCALATIONS.inc(model=model, reason=reason)
+
+def record_branch_timeout(node: str) -> None:
+    if METRICS_ENABLED:
+        BRANCH_TIMEOUTS.inc(node=node)
+
+def instrument_node(fn: Callable[..., Any], graph: str = "default", node: Optional[str] = None) -> Callable[..., Any]:
+    """Nodo equivalente a `fn` que registra su duración en graph_node_seconds.
+
+    Para código que no pasa por el callback handler (p. ej. un nodo que se ejecuta
+    fuera de LangGraph). Sin métricas devuelve `fn` tal cual.
+    """
+    if not METRICS_ENABLED:
+        return fn
+    node = node or fn.__name__
+    takes_config = "config" in inspect.signature(fn).parameters
+
+    if inspect.iscoroutinefunction(fn):
+        async def wrapper(state, config):
+            t0 = time.perf_counter()
+            try:
+                return await (fn(state, config) if takes_config else fn(state))
+            finally:
+                NODE_SECONDS.observe(time.perf_counter() - t0, graph=graph, node=node)
+    else:
+        def wrapper(state, config):
+            t0 = time.perf_counter()
+            try:
+                return fn(state, config) if takes_config else fn(state)
+            finally:
+                NODE_SECONDS.observe(time.perf_counter() - t0, graph=graph, node=node)
+
+    # Sin functools.wraps: LangGraph mira la firma para decidir si pasa `config`
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+# -------------------------
+# OpenTelemetry (opcional)
+# -------------------------
+_tracer = None
+
+def _get_tracer():
+    global _tracer, OTEL_ENABLED
+    if _tracer is None and OTEL_ENABLED:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            logger.warning("OTEL_ENABLED=1 pero opentelemetry no está instalado; no se emiten spans")
+            OTEL_ENABLED = False
+            return None
+        _tracer = trace.get_tracer("my_course_agent")
+    return _tracer
+
+# -------------------------
+# Callback handler
+# -------------------------
+def _model_name(serialized: Optional[Dict[str, Any]], metadata: Optional[Dict[str, Any]]) -> str:
+    name = (metadata or {}).get("ls_model_name")
+    if not name and serialized:
+        name = (serialized.get("kwargs") or {}).get("model")
+    return str(name or "unknown")
+
+def _ns_to_s(value: Any) -> Optional[float]:
+    return value / 1e9 if isinstance(value, (int, float)) and value > 0 else None
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Mide los nodos de LangGraph y las llamadas a chat models de cualquier grafo.
+
+    Un nodo es el run cuyo nombre coincide con `metadata["langgraph_node"]`; el
+    grafo sale de `metadata["graph_id"]` (lo pone langgraph dev y la API).
+    """
+
+    run_inline = True  # se ejecuta en el hilo del run: las duraciones no incluyen colas
+
+    def __init__(self):
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._parents: Dict[UUID, Optional[UUID]] = {}  # solo con OpenTelemetry, para anidar spans
+        self._lock = threading.Lock()
+
+    # --- spans ---
+    def _start_span(self, name: str, run_id: UUID, parent_run_id: Optional[UUID], attributes: Dict[str, Any]):
+        tracer = _get_tracer()
+        if tracer is None:
+            return None
+        from opentelemetry import trace
+
+        context = None
+        with self._lock:
+            parent = parent_run_id
+            while parent is not None:
+                run = self._runs.get(parent)
+                if run is not None and run.get("span") is not None:
+                    context = trace.set_span_in_context(run["span"])
+                    break
+                parent = self._parents.get(parent)
+        return tracer.start_span(name, context=context, attributes=attributes)
+
+    @staticmethod
+    def _end_span(run: Dict[str, Any], error: Optional[BaseException] = None) -> None:
+        span = run.get("span")
+        if span is None:
+            return
+        if error is not None:
+            span.record_exception(error)
+            from opentelemetry.trace import Status, StatusCode
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
+
+    # --- nodos ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        graph = metadata.get("graph_id", "default")
+        if OTEL_ENABLED:
+            with self._lock:
+                self._parents[run_id] = parent_run_id
+            if parent_run_id is None:
+                # Run raíz: el grafo completo
+                span = self._start_span(f"graph {graph}", run_id, None, {"graph": graph})
+                with self._lock:
+                    self._runs[run_id] = {"kind": "graph", "span": span}
+                return
+        if node is None or name != node:
+            return
+        run = {"kind": "node", "start": time.perf_counter(), "graph": graph, "node": node}
+        if OTEL_ENABLED:
+            run["span"] = self._start_span(f"node {node}", run_id, parent_run_id, {"graph": graph, "node": node})
+        with self._lock:
+            self._runs[run_id] = run
+
+    def _finish_chain(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            self._parents.pop(run_id, None)
+        if run is None:
+            return
+        if run["kind"] == "node":
+            NODE_SECONDS.observe(time.perf_counter() - run["start"], graph=run["graph"], node=run["node"])
+        self._end_span(run, error)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish_chain(run_id, error)
+
+    # --- chat models ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        model = _model_name(serialized, metadata)
+        run = {"kind": "llm", "start": time.perf_counter(), "model": model, "first_token": False}
+        if OTEL_ENABLED:
+            run["span"] = self._start_span(f"llm {model}", run_id, parent_run_id, {"model": model})
+        with self._lock:
+            self._runs[run_id] = run
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and not run["first_token"]:
+            run["first_token"] = True
+            LLM_FIRST_TOKEN.observe(time.perf_counter() - run["start"], model=run["model"])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        model = run["model"]
+        LLM_SECONDS.observe(time.perf_counter() - run["start"], model=model)
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                meta = getattr(message, "response_metadata", None) or generation.generation_info or {}
+                prompt_tokens = usage.get("input_tokens", meta.get("prompt_eval_count"))
+                completion_tokens = usage.get("output_tokens", meta.get("eval_count"))
+                if prompt_tokens:
+                    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+                if completion_tokens:
+                    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+                prompt_eval = _ns_to_s(meta.get("prompt_eval_duration"))
+                if prompt_eval is not None:
+                    LLM_PROMPT_EVAL.observe(prompt_eval, model=model)
+                eval_time = _ns_to_s(meta.get("eval_duration"))
+                if eval_time is not None:
+                    LLM_EVAL.observe(eval_time, model=model)
+                span = run.get("span")
+                if span is not None:
+                    span.set_attribute("llm.prompt_tokens", int(prompt_tokens or 0))
+                    span.set_attribute("llm.completion_tokens", int(completion_tokens or 0))
+        self._end_span(run)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        LLM_ERRORS.inc(model=run["model"])
+        self._end_span(run, error)
+
+# -------------------------
+# Registro global del handler
+# -------------------------
+handler: Optional[MetricsCallbackHandler] = None
+
+def enable() -> Optional[MetricsCallbackHandler]:
+    """Registra el handler en todos los runs del proceso (idempotente; sin efecto con METRICS_ENABLED=0)."""
+    global handler
+    if not METRICS_ENABLED or handler is not None:
+        return handler
+    from langchain_core.tracers.context import register_configure_hook
+
+    handler = MetricsCallbackHandler()
+    # Valor por defecto (no .set()): así lo ven también los hilos y tasks creados después
+    register_configure_hook(ContextVar("metrics_handler", default=handler), inheritable=True)
+    return handler
+
+enable()
@@ -0,0 +1,57 @@
+# src/core/prompts.py
+"""
+Montaje de prompts con prefijo estable, para que Ollama reutilice su cache KV entre turnos.
+
+Ollama conserva en cada slot el KV del último prompt y en la petición siguiente solo
+evalúa desde el primer token que cambia. Si lo que varía en cada turno (contexto
+recuperado, nombre del cliente...) va al principio, se reevalúa el prompt entero.
+`stable_prompt` ordena de más estable a menos estable:
+
+  1. texto de sistema estático (igual en todos los turnos y conversaciones)
+  2. resumen de la conversación (solo cambia cuando avanza la ventana de historial)
+  3. turnos anteriores literales (crecen por el final)
+  4. bloque variable del turno (contexto, datos del cliente) + último mensaje del usuario
+
+El bloque variable va dentro del último mensaje del usuario y no en un SystemMessage:
+las plantillas de chat de Ollama juntan todos los mensajes de sistema al principio del
+prompt, donde volverían a romper el prefijo. El historial guarda la pregunta sin ese
+bloque, así que en el turno siguiente se reevalúa desde la pregunta anterior; lo de
+antes sale de la cache. Para que el KV siga en memoria entre turnos, src/core/llm.py
+fija `keep_alive` (OLLAMA_KEEP_ALIVE) en todos los clientes.
+
+Las plantillas Jinja2 se compilan una vez por texto de plantilla (`render`), no en cada turno.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, List, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+@lru_cache(maxsize=64)
+def _compile(template: str):
+    from jinja2.sandbox import SandboxedEnvironment  # el mismo entorno que usa langchain_core para jinja2
+
+    return SandboxedEnvironment().from_string(template)
+
+def render(template: str, **values: Any) -> str:
+    """Renderiza una plantilla Jinja2 compilada (la compilación se cachea por texto)."""
+    return _compile(template).render(**values).strip()
+
+def stable_prompt(system: str, conversation: Sequence[BaseMessage], volatile: str = "") -> List[BaseMessage]:
+    """Mensajes para el LLM: `system` fijo, la conversación (resumen + ventana, p. ej.
+    `history.prompt_messages(state)`) y `volatile` dentro del último mensaje del usuario.
+
+    Lo que sigue a ese mensaje (rondas de tools del turno en curso) se conserva detrás.
+    Sin mensaje del usuario, `volatile` se añade como uno nuevo al final.
+    """
+    messages: List[BaseMessage] = [SystemMessage(content=system)] + list(conversation)
+    if not volatile:
+        return messages
+    for i in range(len(messages) - 1, 0, -1):
+        if isinstance(messages[i], HumanMessage):
+            content = messages[i].content if isinstance(messages[i].content, str) else str(messages[i].content)
+            messages[i] = HumanMessage(content=f"{volatile}\n\n{content}")
+            return messages
+    return messages + [HumanMessage(content=volatile)]
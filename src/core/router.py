@@ -0,0 +1,558 @@
+# src/core/router.py
+"""
+Router de backends de Ollama: un mismo modelo servido por varias máquinas.
+
+Con más de un backend para un modelo, `get_chat_model` (src/core/llm.py) devuelve
+un RoutedChatModel en lugar de un ChatOllama. Por cada llamada:
+  - elige el backend con menos peticiones en curso (entre todos los modelos del
+    proceso), saltando los que fallan el health check o tienen el circuito abierto
+  - si el backend falla antes de producir nada (conexión, timeout, 5xx/429), repite
+    en el siguiente: un Ollama reiniciándose no corta el tráfico
+  - con OLLAMA_HEDGE_PERCENTILE, si la respuesta (o el primer token, en streaming)
+    tarda más que ese percentil de las últimas llamadas, lanza la misma petición en
+    otro backend y se queda con la primera que llegue; la otra se cancela
+
+Circuit breaker por backend: OLLAMA_BREAKER_FAILURES fallos seguidos lo abren
+durante OLLAMA_BREAKER_COOLDOWN segundos; después deja pasar una petición de prueba
+(half-open) y se cierra si sale bien. Un hilo en segundo plano consulta `/api/tags`
+de cada backend cada OLLAMA_HEALTH_INTERVAL segundos: marca los caídos y aprende
+qué modelos tiene cargados cada uno.
+
+Para repartir la generación entre varias máquinas CPU basta con listar sus URLs en
+OLLAMA_BACKENDS (cada una con su OLLAMA_NUM_PARALLEL): el reparto por peticiones en
+curso manda más trabajo a la que va más desahogada.
+
+Variables de entorno:
+  OLLAMA_BACKENDS            URLs separadas por comas (por defecto solo OLLAMA_BASE_URL)
+  OLLAMA_MODEL_BACKENDS      backends por modelo: "llama3.1:70b=http://gpu1:11434|http://gpu2:11434;..."
+  OLLAMA_HEALTH_INTERVAL     segundos entre health checks (10; 0 = sin health checks)
+  OLLAMA_HEALTH_TIMEOUT      timeout del health check en segundos (2)
+  OLLAMA_BREAKER_FAILURES    fallos seguidos que abren el circuito (3)
+  OLLAMA_BREAKER_COOLDOWN    segundos con el circuito abierto (30)
+  OLLAMA_HEDGE_PERCENTILE    percentil de latencia tras el que se duplica la petición (0 = sin hedging)
+  OLLAMA_HEDGE_MIN_SAMPLES   llamadas observadas antes de empezar a duplicar (20)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from src.core.metrics import record_backend_request, record_circuit_open, record_hedge
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", "")
+OLLAMA_MODEL_BACKENDS = os.getenv("OLLAMA_MODEL_BACKENDS", "")
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "2"))
+OLLAMA_BREAKER_FAILURES = int(os.getenv("OLLAMA_BREAKER_FAILURES", "3"))
+OLLAMA_BREAKER_COOLDOWN = float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))
+OLLAMA_HEDGE_PERCENTILE = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", "0"))
+OLLAMA_HEDGE_MIN_SAMPLES = int(os.getenv("OLLAMA_HEDGE_MIN_SAMPLES", "20"))
+
+LATENCY_WINDOW = 256  # llamadas recientes sobre las que se calcula el percentil de hedging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def _split_urls(value: str) -> List[str]:
+    return [u.strip().rstrip("/") for u in value.replace("|", ",").split(",") if u.strip()]
+
+def backend_urls(model: str, base_url: Optional[str] = None) -> List[str]:
+    """Backends de `model`. Un `base_url` explícito (distinto de OLLAMA_BASE_URL) manda;
+    admite varias URLs separadas por comas."""
+    if base_url and base_url.rstrip("/") != OLLAMA_BASE_URL.rstrip("/"):
+        return _split_urls(base_url)
+    for entry in OLLAMA_MODEL_BACKENDS.split(";"):
+        name, _, urls = entry.partition("=")
+        if name.strip() == model and urls.strip():
+            return _split_urls(urls)
+    return _split_urls(OLLAMA_BACKENDS) or [OLLAMA_BASE_URL.rstrip("/")]
+
+def is_backend_error(exc: BaseException) -> bool:
+    """Fallos del backend (se reintentan en otro y cuentan para el circuit breaker).
+    Los errores de la propia petición (4xx, validación) se propagan sin más."""
+    if isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and (status >= 500 or status == 429)
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+def client_type(model: BaseChatModel) -> type:
+    """Clase del cliente final (ChatOllama, el modelo falso...) bajo los envoltorios que exponen `_template`."""
+    while hasattr(model, "_template"):
+        model = model._template
+    return type(model)
+
+# -------------------------
+# Backends (compartidos por todos los modelos del proceso)
+# -------------------------
+class Backend:
+    """Estado de un servidor Ollama: peticiones en curso, salud y circuit breaker."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True  # hasta el primer health check se asume disponible
+        self.models: Optional[frozenset] = None  # modelos que anuncia /api/tags (None = desconocido)
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False  # petición de prueba en curso con el circuito half-open
+
+    def available(self, now: float) -> bool:
+        if not self.healthy:
+            return False
+        if self.opened_at is None:
+            return True
+        return now - self.opened_at >= OLLAMA_BREAKER_COOLDOWN and not self.trial
+
+    def serves(self, model: str) -> bool:
+        return self.models is None or model in self.models
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "circuit": "closed" if self.opened_at is None else ("half-open" if self.trial else "open"),
+            "outstanding": self.outstanding,
+            "failures": self.failures,
+            "models": sorted(self.models) if self.models is not None else None,
+        }
+
+_backends: Dict[str, Backend] = {}
+_lock = threading.Lock()
+_round_robin = itertools.count()
+
+def get_backend(url: str) -> Backend:
+    with _lock:
+        backend = _backends.get(url)
+        if backend is None:
+            backend = _backends[url] = Backend(url)
+        return backend
+
+def acquire(backends: Sequence[Backend], model: str, exclude: Sequence[Backend] = ()) -> Optional[Backend]:
+    """Elige el backend con menos peticiones en curso y le suma una (todo bajo el lock).
+
+    Preferencia: disponibles que anuncian el modelo > disponibles > cualquiera no
+    excluido. Si no hay ninguno disponible, el primer intento va igualmente al menos
+    cargado (puede que ya se haya recuperado); los reintentos no."""
+    now = time.monotonic()
+    with _lock:
+        candidates = [b for b in backends if b not in exclude]
+        ready = [b for b in candidates if b.available(now)]
+        pool = [b for b in ready if b.serves(model)] or ready or (candidates if not exclude else [])
+        if not pool:
+            return None
+        # Empates: round robin, así con todo en reposo no va siempre al primero
+        start = next(_round_robin) % len(pool)
+        chosen = min(pool[start:] + pool[:start], key=lambda b: b.outstanding)
+        chosen.outstanding += 1
+        if chosen.opened_at is not None:
+            chosen.trial = True
+        return chosen
+
+def release(backend: Backend, outcome: str) -> None:
+    """Cierra una petición: outcome = ok | error (fallo del backend) | other (cancelada o error de la petición)."""
+    with _lock:
+        backend.outstanding -= 1
+        backend.trial = False
+        if outcome == "ok":
+            backend.failures = 0
+            if backend.opened_at is not None:
+                logger.info("Circuito cerrado para %s", backend.url)
+            backend.opened_at = None
+        elif outcome == "error":
+            backend.failures += 1
+            if backend.opened_at is None and backend.failures >= OLLAMA_BREAKER_FAILURES:
+                logger.warning("Circuito abierto para %s tras %s fallos", backend.url, backend.failures)
+                record_circuit_open(backend.url)
+            if backend.opened_at is not None or backend.failures >= OLLAMA_BREAKER_FAILURES:
+                backend.opened_at = time.monotonic()  # también si falla la prueba half-open
+    if outcome != "other":
+        record_backend_request(backend.url, outcome)
+
+def backends_status() -> List[Dict[str, Any]]:
+    with _lock:
+        return [b.status() for b in _backends.values()]
+
+# -------------------------
+# Health checks
+# -------------------------
+def check_backend(backend: Backend, client: httpx.Client) -> None:
+    """Consulta /api/tags: marca el backend sano o caído y guarda sus modelos."""
+    try:
+        response = client.get(f"{backend.url}/api/tags", timeout=OLLAMA_HEALTH_TIMEOUT)
+        response.raise_for_status()
+        names = set()
+        for entry in response.json().get("models", []):
+            name = entry.get("name") or entry.get("model") or ""
+            names.add(name)
+            if name.endswith(":latest"):
+                names.add(name[: -len(":latest")])  # "llama3" y "llama3:latest" son el mismo modelo
+        healthy, models = True, frozenset(names)
+    except Exception as e:
+        healthy, models = False, backend.models
+        if backend.healthy:
+            logger.warning("Backend %s no responde: %r", backend.url, e)
+    if healthy and not backend.healthy:
+        logger.info("Backend %s disponible de nuevo", backend.url)
+    backend.healthy, backend.models = healthy, models
+
+_health_thread: Optional[threading.Thread] = None
+_health_stop = threading.Event()
+
+def _health_loop() -> None:
+    with httpx.Client() as client:
+        while not _health_stop.is_set():
+            with _lock:
+                backends = list(_backends.values())
+            for backend in backends:
+                check_backend(backend, client)
+            _health_stop.wait(OLLAMA_HEALTH_INTERVAL)
+
+def start_health_checks() -> None:
+    """Arranca (una vez por proceso) el hilo de health checks; sin efecto con OLLAMA_HEALTH_INTERVAL=0."""
+    global _health_thread
+    with _lock:
+        if OLLAMA_HEALTH_INTERVAL <= 0 or (_health_thread is not None and _health_thread.is_alive()):
+            return
+        _health_stop.clear()
+        _health_thread = threading.Thread(target=_health_loop, name="ollama-health", daemon=True)
+        _health_thread.start()
+
+def stop_health_checks() -> None:
+    global _health_thread
+    _health_stop.set()
+    if _health_thread is not None:
+        _health_thread.join(timeout=OLLAMA_HEALTH_TIMEOUT + 1)
+    _health_thread = None
+
+# -------------------------
+# Chat model con varios backends
+# -------------------------
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    """Hilos para las llamadas síncronas con hedging (la perdedora termina en segundo plano)."""
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ollama-hedge")
+    return _hedge_pool
+
+class RoutedChatModel(BaseChatModel):
+    """Un modelo servido por varios backends; cada uno con su propio cliente (p. ej. ChatOllama).
+
+    `bind_tools` y `with_structured_output` se comportan como los del cliente, así
+    que los agentes no notan la diferencia.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: str
+    clients: Dict[str, BaseChatModel] = Field(exclude=True)  # URL -> cliente
+    hedge_percentile: float = OLLAMA_HEDGE_PERCENTILE
+    hedge_min_samples: int = OLLAMA_HEDGE_MIN_SAMPLES
+
+    _latencies: Dict[str, deque] = PrivateAttr(default_factory=lambda: {
+        "invoke": deque(maxlen=LATENCY_WINDOW),
+        "stream": deque(maxlen=LATENCY_WINDOW),
+    })
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        for url in self.clients:
+            get_backend(url)
+        if len(self.clients) > 1:
+            start_health_checks()
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed-" + self._template._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "backends": list(self.clients)}
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        return self._template._get_ls_params(stop=stop, **kwargs)
+
+    @property
+    def _template(self) -> BaseChatModel:
+        return next(iter(self.clients.values()))
+
+    @property
+    def backends(self) -> List[Backend]:
+        return [get_backend(url) for url in self.clients]
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # Mismos kwargs que enlazaría el cliente (formato de tools, tool_choice...)
+        return self.bind(**self._template.bind_tools(tools, **kwargs).kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        # La implementación del cliente solo usa self.bind/self.bind_tools: se aplica sobre el router
+        return client_type(self).with_structured_output(self, schema, **kwargs)
+
+    # --- hedging ---
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        samples = self._latencies[kind]
+        if self.hedge_percentile <= 0 or len(self.clients) < 2 or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.hedge_percentile * len(ordered)))]
+
+    def _acquire(self, exclude: Sequence[Backend]) -> Optional[Backend]:
+        return acquire(self.backends, self.model, exclude)
+
+    # --- llamadas síncronas ---
+    def _attempt(self, backend: Backend, call: Callable[[BaseChatModel], T]) -> T:
+        try:
+            result = call(self.clients[backend.url])
+        except BaseException as e:
+            release(backend, "error" if is_backend_error(e) else "other")
+            raise
+        release(backend, "ok")
+        return result
+
+    def _call(self, kind: str, call: Callable[[BaseChatModel], T]) -> T:
+        """Ejecuta `call(cliente)` con failover entre backends y, si toca, hedging."""
+        tried: List[Backend] = []
+        error: Optional[BaseException] = None
+        while True:
+            backend = self._acquire(tried)
+            if backend is None:
+                raise error or NoBackendAvailable(f"Sin backends para {self.model}")
+            tried.append(backend)
+            t0 = time.perf_counter()
+            try:
+                delay = self._hedge_delay(kind)
+                result = self._attempt(backend, call) if delay is None else self._hedged(backend, call, delay, tried)
+            except Exception as e:
+                if not is_backend_error(e):
+                    raise
+                logger.warning("Backend %s falló (%r); se reintenta en otro", backend.url, e)
+                error = e
+                continue
+            self._latencies[kind].append(time.perf_counter() - t0)
+            return result
+
+    def _hedged(self, primary: Backend, call: Callable[[BaseChatModel], T], delay: float, tried: List[Backend]) -> T:
+        pool = _get_hedge_pool()
+        futures: Dict[Future, str] = {pool.submit(self._attempt, primary, call): "primary"}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            secondary = self._acquire(tried)
+            if secondary is not None:
+                tried.append(secondary)
+                futures[pool.submit(self._attempt, secondary, call)] = "hedge"
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                exc = future.exception()
+                if exc is None:
+                    if len(futures) > 1:
+                        record_hedge(self.model, futures[future])
+                    return future.result()  # la otra sigue en su hilo y se descarta
+                if not is_backend_error(exc):
+                    raise exc
+                error = error or exc
+        raise error
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # Con hedging dos respuestas corren a la vez: sin run_manager no se mezclan sus tokens
+        manager = run_manager if self._hedge_delay("invoke") is None else None
+        return self._call("invoke", lambda client: client._generate(messages, stop=stop, run_manager=manager, **kwargs))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        # Sin hedging en streaming síncrono; failover mientras no haya llegado ningún chunk
+        def first_chunk(client: BaseChatModel):
+            stream = client._stream(messages, stop=stop, **kwargs)
+            try:
+                return stream, next(stream)
+            except BaseException:
+                stream.close()
+                raise
+
+        tried: List[Backend] = []
+        error: Optional[BaseException] = None
+        while True:
+            backend = self._acquire(tried)
+            if backend is None:
+                raise error or NoBackendAvailable(f"Sin backends para {self.model}")
+            tried.append(backend)
+            t0 = time.perf_counter()
+            try:
+                stream, chunk = first_chunk(self.clients[backend.url])
+            except StopIteration:
+                release(backend, "other")
+                return
+            except Exception as e:
+                release(backend, "error" if is_backend_error(e) else "other")
+                if not is_backend_error(e):
+                    raise
+                logger.warning("Backend %s falló (%r); se reintenta en otro", backend.url, e)
+                error = e
+                continue
+            break
+        self._latencies["stream"].append(time.perf_counter() - t0)
+        outcome = "other"
+        try:
+            while True:
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                chunk = next(stream, None)
+                if chunk is None:
+                    break
+            outcome = "ok"
+        except Exception as e:
+            outcome = "error" if is_backend_error(e) else "other"
+            raise
+        finally:
+            stream.close()
+            release(backend, outcome)
+
+    # --- llamadas async ---
+    async def _arace(
+        self, kind: str, start: Callable[[BaseChatModel], Awaitable[T]], discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> Tuple[Backend, T]:
+        """Failover + hedging en async: devuelve (backend, resultado) con el backend aún adquirido.
+
+        `discard` libera el resultado de una copia que terminó pero perdió la carrera.
+        """
+        tried: List[Backend] = []
+        error: Optional[BaseException] = None
+        while True:
+            backend = self._acquire(tried)
+            if backend is None:
+                raise error or NoBackendAvailable(f"Sin backends para {self.model}")
+            tried.append(backend)
+            t0 = time.perf_counter()
+            tasks: Dict[asyncio.Task, Backend] = {asyncio.ensure_future(start(self.clients[backend.url])): backend}
+            pending = set(tasks)
+            winner: Optional[asyncio.Task] = None
+            try:
+                done, _ = await asyncio.wait(pending, timeout=self._hedge_delay(kind))
+                if not done:
+                    secondary = self._acquire(tried)
+                    if secondary is not None:
+                        tried.append(secondary)
+                        task = asyncio.ensure_future(start(self.clients[secondary.url]))
+                        tasks[task] = secondary
+                        pending.add(task)
+                while pending and winner is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        exc = task.exception()
+                        if exc is None and winner is None:
+                            winner = task
+                        elif exc is None:
+                            # Terminó a la vez que la ganadora: se descarta
+                            if discard is not None:
+                                await discard(task.result())
+                            release(tasks[task], "other")
+                        else:
+                            release(tasks[task], "error" if is_backend_error(exc) else "other")
+                            if not is_backend_error(exc):
+                                raise exc
+                            logger.warning("Backend %s falló (%r); se reintenta en otro", tasks[task].url, exc)
+                            error = exc
+            finally:
+                # Cancelar la copia perdedora corta su conexión: Ollama deja de generar
+                for task in pending:
+                    task.cancel()
+                for task in pending:
+                    try:
+                        result = await task
+                    except BaseException:
+                        pass
+                    else:
+                        if discard is not None:
+                            await discard(result)
+                    release(tasks[task], "other")
+            if winner is not None:
+                if len(tasks) > 1:
+                    record_hedge(self.model, "primary" if tasks[winner] is backend else "hedge")
+                self._latencies[kind].append(time.perf_counter() - t0)
+                return tasks[winner], winner.result()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        manager = run_manager if self._hedge_delay("invoke") is None else None
+        backend, result = await self._arace(
+            "invoke", lambda client: client._agenerate(messages, stop=stop, run_manager=manager, **kwargs),
+        )
+        release(backend, "ok")
+        return result
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # Hedging sobre el primer token: gana el backend que empieza antes a responder
+        async def first_chunk(client: BaseChatModel):
+            stream = client._astream(messages, stop=stop, **kwargs)
+            try:
+                return stream, await anext(stream, None)
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def discard(result) -> None:
+            await result[0].aclose()
+
+        backend, (stream, chunk) = await self._arace("stream", first_chunk, discard)
+        outcome = "other"
+        try:
+            while chunk is not None:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                chunk = await anext(stream, None)
+            outcome = "ok"
+        except Exception as e:
+            outcome = "error" if is_backend_error(e) else "other"
+            raise
+        finally:
+            await stream.aclose()
+            release(backend, outcome)
@@ -0,0 +1,486 @@
+# src/core/tiering.py
+"""
+Escalado por niveles de modelo: los turnos sencillos van a un modelo pequeño y
+solo los difíciles (o los que el pequeño resuelve mal) llegan al grande.
+
+Por cada llamada, TieredChatModel:
+  1. clasifica el turno con heurísticas sobre el último mensaje del usuario
+     (longitud, palabras que piden razonamiento, varias preguntas, código, rondas
+     de tools ya hechas en el turno). Con TIER_CLASSIFIER=llm, los casos dudosos
+     los decide el modelo pequeño con una pregunta de una palabra (con cache).
+  2. si el turno es sencillo, llama al modelo pequeño y valida su salida: que no
+     esté vacía, que las tool calls existan y traigan los argumentos obligatorios,
+     que la salida estructurada sea JSON válido con los campos requeridos y que no
+     empiece por un "no sé" (en sus primeros TIER_STREAM_COMMIT_CHARS caracteres, con
+     y sin streaming). Si falla la validación (o la llamada), escala al modelo grande
+     con la misma entrada.
+  3. si el turno es difícil, va directo al grande.
+
+En streaming, los tokens del pequeño se retienen hasta que hay TIER_STREAM_COMMIT_CHARS
+caracteres que pasan la validación; desde ahí se emiten según llegan (ya sin posible
+escalado). La salida estructurada y las tool calls se validan enteras. El nivel usado
+queda en `response_metadata["tier"]` del mensaje.
+
+Los prompts con contexto (RAG) piden decir cuándo la respuesta no está en él; ahí
+"no lo sé" es una respuesta correcta y no debe escalar. Esas llamadas se marcan con
+`grounded(llm)` (kwarg `tier_grounded=True`), que desactiva solo esa comprobación.
+
+Métricas: llm_tier_seconds{model,path=small|large|escalated} y
+llm_tier_escalations_total{model,reason}; `tier_stats()` resume latencia y tasa
+de escalado por nivel.
+
+Variables de entorno:
+  MODEL_TIERING            1 = activo (por defecto); 0 = cada agente usa solo su modelo
+  TIER_SMALL_MODEL         modelo pequeño por defecto (qwen2.5:3b-instruct)
+  TIER_CLASSIFIER          heuristic | llm (heuristic)
+  TIER_MAX_SIMPLE_CHARS    mensajes más largos cuentan como difíciles (400)
+  TIER_STREAM_COMMIT_CHARS caracteres del pequeño retenidos en streaming antes de emitir (40)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from src.core.llm import get_chat_model
+from src.core.metrics import record_tier
+from src.core.router import client_type
+
+TIERING_ENABLED = os.getenv("MODEL_TIERING", "1") == "1"
+TIER_SMALL_MODEL = os.getenv("TIER_SMALL_MODEL", "qwen2.5:3b-instruct")
+TIER_CLASSIFIER = os.getenv("TIER_CLASSIFIER", "heuristic")
+TIER_MAX_SIMPLE_CHARS = int(os.getenv("TIER_MAX_SIMPLE_CHARS", "400"))
+TIER_STREAM_COMMIT_CHARS = int(os.getenv("TIER_STREAM_COMMIT_CHARS", "40"))
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Clasificador
+# -------------------------
+_EASY = re.compile(
+    r"^\s*(hola|buenas|buenos días|buenas tardes|buenas noches|gracias|muchas gracias|ok|vale|perfecto|"
+    r"adiós|hasta luego|sí|si|no|hi|hello|thanks|thank you|bye|yes)\b[\s!.,¡¿?]*$",
+    re.IGNORECASE,
+)
+_HARD = re.compile(
+    r"\b(explica\w*|por qué|compara\w*|analiza\w*|razona\w*|paso a paso|detall\w*|diferencias?|ventajas|"
+    r"desventajas|calcula\w*|planifica\w*|estrategia|justifica\w*|evalúa\w*|"
+    r"why|explain|compare|analy[sz]e|step by step|pros and cons|plan)\b",
+    re.IGNORECASE,
+)
+_LOW_CONFIDENCE = re.compile(
+    r"\b(no estoy seguro|no lo sé|no sé|no puedo ayudar|i'?m not sure|i don'?t know|i cannot help)\b",
+    re.IGNORECASE,
+)
+
+CLASSIFIER_PROMPT = (
+    "Clasifica la petición del usuario. Responde solo con una palabra: "
+    "'simple' si se resuelve con una respuesta directa o una consulta, "
+    "'complejo' si requiere razonar en varios pasos, comparar o explicar en detalle."
+)
+
+def _text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+def turn_signals(messages: List[BaseMessage]) -> Tuple[str, int]:
+    """(texto del último mensaje del usuario, rondas de tools hechas desde entonces)."""
+    rounds = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return _text(message), rounds
+        if isinstance(message, AIMessage) and message.tool_calls:
+            rounds += 1
+    return "", rounds
+
+def heuristic_score(text: str, tool_rounds: int) -> int:
+    """0 = sencillo, 1 = dudoso, 2 o más = difícil."""
+    if _EASY.match(text):
+        return 0
+    score = 0
+    if len(text) > TIER_MAX_SIMPLE_CHARS:
+        score += 2
+    score += min(2, len(_HARD.findall(text)))
+    if text.count("?") >= 2:
+        score += 1
+    if "```" in text:
+        score += 2
+    if tool_rounds >= 2:
+        score += 1  # varias rondas de tools: el turno está resultando difícil
+    return score
+
+# -------------------------
+# Validación de la salida del modelo pequeño
+# -------------------------
+def _low_confidence(text: str) -> bool:
+    """"No sé" al principio de la respuesta; el mismo prefijo que se retiene en streaming."""
+    return bool(_LOW_CONFIDENCE.search(text.strip()[:TIER_STREAM_COMMIT_CHARS]))
+
+def validate(message: AIMessage, kwargs: Dict[str, Any], grounded: bool = False) -> Optional[str]:
+    """Motivo por el que la respuesta no vale (None si vale).
+
+    Con `grounded`, un "no lo sé" es una respuesta válida (el prompt la pide).
+    """
+    tools = {t["function"]["name"]: t["function"] for t in kwargs.get("tools") or [] if "function" in t}
+    content = _text(message).strip()
+    if message.tool_calls:
+        for call in message.tool_calls:
+            spec = tools.get(call["name"])
+            if spec is None:
+                return "unknown_tool"
+            required = (spec.get("parameters") or {}).get("required", [])
+            if any(name not in (call.get("args") or {}) for name in required):
+                return "bad_tool_args"
+        return None
+    if kwargs.get("tool_choice") and tools:
+        return "no_tool_call"  # salida estructurada por function calling
+    fmt = kwargs.get("format")
+    if fmt:
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return "invalid_json"
+        if isinstance(fmt, dict) and isinstance(data, dict):
+            if any(name not in data for name in fmt.get("required", [])):
+                return "missing_fields"
+        return None
+    if not content:
+        return "empty"
+    if not grounded and _low_confidence(content):
+        return "low_confidence"
+    return None
+
+# -------------------------
+# Modelo por niveles
+# -------------------------
+def _tier_chunk(tier: str, reason: Optional[str] = None) -> ChatGenerationChunk:
+    """Chunk vacío final con el nivel usado (se fusiona en response_metadata)."""
+    meta = {"tier": tier, **({"tier_escalation": reason} if reason else {})}
+    return ChatGenerationChunk(message=AIMessageChunk(content="", response_metadata=meta))
+
+class _StreamGate:
+    """Retiene los chunks del modelo pequeño hasta poder darlos por buenos."""
+
+    def __init__(self, kwargs: Dict[str, Any], grounded: bool = False):
+        self.kwargs = kwargs
+        self.grounded = grounded
+        # Salida estructurada: solo se puede validar entera
+        self.whole = bool(kwargs.get("format") or kwargs.get("tool_choice"))
+        self.buffer: List[ChatGenerationChunk] = []
+        self.text = ""
+        self.committed = False
+
+    def feed(self, chunk: ChatGenerationChunk) -> List[ChatGenerationChunk]:
+        """Chunks que ya se pueden emitir."""
+        if self.committed:
+            return [chunk]
+        self.buffer.append(chunk)
+        self.text += chunk.text
+        has_calls = any(getattr(c.message, "tool_call_chunks", None) for c in self.buffer)
+        if (
+            not self.whole and not has_calls
+            and len(self.text.strip()) >= TIER_STREAM_COMMIT_CHARS
+            and (self.grounded or not _low_confidence(self.text))
+        ):
+            self.committed = True
+            out, self.buffer = self.buffer, []
+            return out
+        return []
+
+    def finish(self) -> Tuple[Optional[str], List[ChatGenerationChunk]]:
+        """Al acabar el stream: (motivo de escalado o None, chunks pendientes de emitir)."""
+        if self.committed:
+            return None, []
+        if not self.buffer:
+            return "empty", []
+        merged = self.buffer[0]
+        for chunk in self.buffer[1:]:
+            merged = merged + chunk
+        return validate(merged.message, self.kwargs, self.grounded), self.buffer
+
+def _tag(result: ChatResult, tier: str, reason: Optional[str] = None) -> ChatResult:
+    for generation in result.generations:
+        meta = generation.message.response_metadata
+        meta["tier"] = tier
+        if reason:
+            meta["tier_escalation"] = reason
+    return result
+
+class TieredChatModel(BaseChatModel):
+    """Modelo pequeño para los turnos sencillos, grande para los difíciles y como respaldo."""
+
+    model: str
+    small: BaseChatModel
+    large: BaseChatModel
+    classifier: str = TIER_CLASSIFIER
+
+    _decisions: "OrderedDict[str, bool]" = PrivateAttr(default_factory=OrderedDict)
+    _stats: Dict[str, Any] = PrivateAttr(default_factory=lambda: {
+        "latency": {p: deque(maxlen=1024) for p in ("small", "large", "escalated")},
+        "small_attempts": 0,
+        "escalations": {},
+    })
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "tiered"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
+
+    @property
+    def _template(self) -> BaseChatModel:
+        return self.large
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        params = self.large._get_ls_params(stop=stop, **kwargs)
+        params["ls_model_name"] = self.model
+        return params
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        # Mismos kwargs que enlazaría el cliente (formato de tools, tool_choice...)
+        return self.bind(**self.large.bind_tools(tools, **kwargs).kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        return client_type(self).with_structured_output(self, schema, **kwargs)
+
+    # --- clasificación ---
+    def _llm_says_hard(self, text: str) -> bool:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        with self._lock:
+            if key in self._decisions:
+                self._decisions.move_to_end(key)
+                return self._decisions[key]
+        try:
+            answer = self.small.invoke([SystemMessage(content=CLASSIFIER_PROMPT), HumanMessage(content=text)])
+            hard = "complej" in _text(answer).lower()
+        except Exception:
+            logger.warning("El clasificador falló; se usa el modelo grande", exc_info=True)
+            return True
+        with self._lock:
+            self._decisions[key] = hard
+            if len(self._decisions) > 1024:
+                self._decisions.popitem(last=False)
+        return hard
+
+    def choose(self, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> str:
+        """Nivel para esta llamada: small | large."""
+        if kwargs.get("format") or kwargs.get("tool_choice"):
+            return "small"  # salida estructurada: la validación decide si escalar
+        text, rounds = turn_signals(messages)
+        score = heuristic_score(text, rounds)
+        if score >= 2:
+            return "large"
+        if score == 1 and self.classifier == "llm" and self._llm_says_hard(text):
+            return "large"
+        return "small"
+
+    # --- estadísticas ---
+    def _record(self, path: str, seconds: float, reason: Optional[str] = None) -> None:
+        with self._lock:
+            self._stats["latency"][path].append(seconds)
+            if path != "large":
+                self._stats["small_attempts"] += 1
+            if reason:
+                self._stats["escalations"][reason] = self._stats["escalations"].get(reason, 0) + 1
+        record_tier(self.model, path, seconds, reason)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latency = {p: sorted(v) for p, v in self._stats["latency"].items()}
+            attempts = self._stats["small_attempts"]
+            escalations = dict(self._stats["escalations"])
+        total = sum(len(v) for v in latency.values())
+        return {
+            "requests": total,
+            "share": {p: len(v) / total if total else 0.0 for p, v in latency.items()},
+            "p50_ms": {p: v[len(v) // 2] * 1e3 if v else None for p, v in latency.items()},
+            "escalation_rate": sum(escalations.values()) / attempts if attempts else 0.0,
+            "escalations": escalations,
+        }
+
+    # --- llamadas ---
+    def _try_small(self, messages, stop, kwargs, grounded) -> Tuple[Optional[ChatResult], Optional[str]]:
+        try:
+            result = self.small._generate(messages, stop=stop, **kwargs)
+        except Exception as e:
+            logger.warning("Modelo pequeño falló (%r); se escala", e)
+            return None, "error"
+        return result, validate(result.generations[0].message, kwargs, grounded)
+
+    async def _atry_small(self, messages, stop, kwargs, grounded) -> Tuple[Optional[ChatResult], Optional[str]]:
+        try:
+            result = await self.small._agenerate(messages, stop=stop, **kwargs)
+        except Exception as e:
+            logger.warning("Modelo pequeño falló (%r); se escala", e)
+            return None, "error"
+        return result, validate(result.generations[0].message, kwargs, grounded)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        grounded = kwargs.pop("tier_grounded", False)  # solo para la validación, no llega a los modelos
+        t0 = time.perf_counter()
+        reason = None
+        if self.choose(messages, kwargs) == "small":
+            result, reason = self._try_small(messages, stop, kwargs, grounded)
+            if reason is None:
+                self._record("small", time.perf_counter() - t0)
+                return _tag(result, "small")
+        result = self.large._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._record("escalated" if reason else "large", time.perf_counter() - t0, reason)
+        return _tag(result, "large", reason)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        grounded = kwargs.pop("tier_grounded", False)  # solo para la validación, no llega a los modelos
+        t0 = time.perf_counter()
+        reason = None
+        if self.choose(messages, kwargs) == "small":
+            result, reason = await self._atry_small(messages, stop, kwargs, grounded)
+            if reason is None:
+                self._record("small", time.perf_counter() - t0)
+                return _tag(result, "small")
+        result = await self.large._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._record("escalated" if reason else "large", time.perf_counter() - t0, reason)
+        return _tag(result, "large", reason)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        grounded = kwargs.pop("tier_grounded", False)  # solo para la validación, no llega a los modelos
+        t0 = time.perf_counter()
+        reason = None
+        if self.choose(messages, kwargs) == "small":
+            gate = _StreamGate(kwargs, grounded)
+            try:
+                for chunk in self.small._stream(messages, stop=stop, **kwargs):
+                    for ready in gate.feed(chunk):
+                        if run_manager:
+                            run_manager.on_llm_new_token(ready.text, chunk=ready)
+                        yield ready
+            except Exception as e:
+                if gate.committed:
+                    raise  # ya se emitió parte de la respuesta: no se puede escalar
+                logger.warning("Modelo pequeño falló (%r); se escala", e)
+                reason = "error"
+            if reason is None:
+                reason, pending = gate.finish()
+                if reason is None:
+                    for ready in pending:
+                        if run_manager:
+                            run_manager.on_llm_new_token(ready.text, chunk=ready)
+                        yield ready
+                    yield _tier_chunk("small")
+                    self._record("small", time.perf_counter() - t0)
+                    return
+        for chunk in self.large._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+        yield _tier_chunk("large", reason)
+        self._record("escalated" if reason else "large", time.perf_counter() - t0, reason)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        grounded = kwargs.pop("tier_grounded", False)  # solo para la validación, no llega a los modelos
+        t0 = time.perf_counter()
+        reason = None
+        if self.choose(messages, kwargs) == "small":
+            gate = _StreamGate(kwargs, grounded)
+            try:
+                async for chunk in self.small._astream(messages, stop=stop, **kwargs):
+                    for ready in gate.feed(chunk):
+                        if run_manager:
+                            await run_manager.on_llm_new_token(ready.text, chunk=ready)
+                        yield ready
+            except Exception as e:
+                if gate.committed:
+                    raise  # ya se emitió parte de la respuesta: no se puede escalar
+                logger.warning("Modelo pequeño falló (%r); se escala", e)
+                reason = "error"
+            if reason is None:
+                reason, pending = gate.finish()
+                if reason is None:
+                    for ready in pending:
+                        if run_manager:
+                            await run_manager.on_llm_new_token(ready.text, chunk=ready)
+                        yield ready
+                    yield _tier_chunk("small")
+                    self._record("small", time.perf_counter() - t0)
+                    return
+        async for chunk in self.large._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+        yield _tier_chunk("large", reason)
+        self._record("escalated" if reason else "large", time.perf_counter() - t0, reason)
+
+# -------------------------
+# Registro
+# -------------------------
+_tiered: Dict[Tuple[int, int], TieredChatModel] = {}
+_tiered_lock = threading.Lock()
+
+def get_tiered_model(
+    model: Optional[str] = None,
+    small: Optional[str] = None,
+    base_url: Optional[str] = None,
+    temperature: Optional[float] = None,
+    **kwargs: Any,
+) -> BaseChatModel:
+    """Como get_chat_model, pero con `small` (TIER_SMALL_MODEL) delante para los turnos sencillos.
+
+    Con MODEL_TIERING=0, o si el modelo pequeño es el mismo, devuelve el modelo tal cual.
+    """
+    model = model or os.getenv("MODEL", "qwen2.5:7b-instruct")
+    large_llm = get_chat_model(model, base_url, temperature, **kwargs)
+    small = small or TIER_SMALL_MODEL
+    if not TIERING_ENABLED or not small or small == model:
+        return large_llm
+    small_llm = get_chat_model(small, base_url, temperature, **kwargs)
+    key = (id(small_llm), id(large_llm))  # los clientes viven en el registro de src/core/llm.py
+    with _tiered_lock:
+        tiered = _tiered.get(key)
+        if tiered is None:
+            tiered = _tiered[key] = TieredChatModel(model=f"{small}|{model}", small=small_llm, large=large_llm)
+    return tiered
+
+def grounded(llm: BaseChatModel):
+    """Marca las llamadas de `llm` como respondidas a partir de un contexto: un "no lo sé"
+    del modelo pequeño no escala. Sin tiering devuelve el modelo tal cual."""
+    return llm.bind(tier_grounded=True) if isinstance(llm, TieredChatModel) else llm
+
+def tier_stats() -> Dict[str, Dict[str, Any]]:
+    """Latencia p50 y tasa de escalado de cada modelo por niveles creado en el proceso."""
+    with _tiered_lock:
+        models = list(_tiered.values())
+    return {m.model: m.stats() for m in models if m.stats()["requests"]}
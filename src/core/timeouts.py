@@ -0,0 +1,85 @@
+# src/core/timeouts.py
+"""
+Límite de tiempo para ramas secundarias de un grafo.
+
+`with_timeout(fn, seconds)` envuelve un nodo para que, si no termina a tiempo, el
+grafo siga sin su actualización en lugar de esperar. Con `carry_over=True` el
+trabajo no se pierde: el resultado tardío se guarda por thread_id y se aplica en
+el siguiente turno (antes de volver a ejecutar el nodo sobre el estado nuevo).
+"""
+
+from __future__ import annotations
+
+import inspect
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from src.core.metrics import record_branch_timeout
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BRANCH_TIMEOUT_WORKERS", "8")), thread_name_prefix="graph-branch"
+)
+
+def _thread_key(config: Optional[RunnableConfig]) -> str:
+    return str(((config or {}).get("configurable") or {}).get("thread_id", "default"))
+
+def with_timeout(
+    fn: Callable[..., Dict[str, Any]],
+    timeout: float,
+    carry_over: bool = True,
+    on_timeout: Optional[Dict[str, Any]] = None,
+) -> Callable[[Dict[str, Any], RunnableConfig], Dict[str, Any]]:
+    """Nodo equivalente a `fn` que devuelve {} (o `on_timeout`) si `fn` tarda más de `timeout` segundos.
+
+    `timeout <= 0` desactiva el límite. Si el resultado de un turno anterior sigue
+    calculándose, este turno no lanza otro: se recogerá cuando termine. `on_timeout`
+    sirve para vaciar campos que, sin el resultado, quedarían con el valor del turno anterior.
+    """
+    takes_config = "config" in inspect.signature(fn).parameters
+    pending: Dict[str, Future] = {}
+    lock = threading.Lock()
+
+    def call(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        return fn(state, config) if takes_config else fn(state)
+
+    def node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        if timeout <= 0:
+            return call(state, config)
+        key = _thread_key(config)
+        late: Dict[str, Any] = {}
+        with lock:
+            previous = pending.get(key)
+            if previous is not None:
+                if not previous.done():
+                    return dict(on_timeout or {})
+                del pending[key]
+                try:
+                    late = previous.result() or {}
+                except Exception:
+                    logger.exception("Error en el nodo %s (turno anterior)", fn.__name__, extra={"node": fn.__name__, "thread_id": key})
+
+        future = _executor.submit(call, {**state, **late}, config)
+        try:
+            return {**late, **(future.result(timeout=timeout) or {})}
+        except FutureTimeout:
+            record_branch_timeout(fn.__name__)
+            logger.warning(
+                "El nodo %s superó %ss; se continúa sin su resultado", fn.__name__, timeout,
+                extra={"node": fn.__name__, "timeout_s": timeout, "thread_id": key},
+            )
+            if carry_over:
+                with lock:
+                    pending[key] = future
+            return {**late, **(on_timeout or {})}
+
+    # Sin functools.wraps: LangGraph mira la firma para decidir si pasa `config`
+    node.__name__ = fn.__name__
+    node.__doc__ = fn.__doc__
+    return node
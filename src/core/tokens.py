@@ -0,0 +1,61 @@
+# src/core/tokens.py
+"""
+Conteo de tokens para presupuestos de prompt.
+
+Ollama no expone su tokenizer localmente, así que si CONTEXT_TOKENIZER nombra un
+tokenizer de HuggingFace equivalente al modelo (por ejemplo
+"Qwen/Qwen2.5-7B-Instruct") se usa ese; si no está disponible, se estima con
+caracteres por token (≈3.5 en español).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "")
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "3.5"))
+
+logger = logging.getLogger(__name__)
+
+_tokenizer = None
+_tokenizer_loaded = False
+_lock = threading.Lock()
+
+def _get_tokenizer():
+    """Carga el tokenizer una sola vez; None si no hay configurado o falla la carga."""
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+    with _lock:
+        if not _tokenizer_loaded:
+            if CONTEXT_TOKENIZER:
+                try:
+                    from transformers import AutoTokenizer
+
+                    _tokenizer = AutoTokenizer.from_pretrained(CONTEXT_TOKENIZER)
+                except Exception as e:
+                    logger.warning("No se pudo cargar el tokenizer %s, se usará una estimación: %s", CONTEXT_TOKENIZER, e)
+            _tokenizer_loaded = True
+    return _tokenizer
+
+def count_tokens(text: str) -> int:
+    """Número de tokens de `text` (exacto con tokenizer, estimado sin él)."""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Recorta `text` para que quepa en `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        return text if len(ids) <= max_tokens else tokenizer.decode(ids[:max_tokens])
+    return text[: int(max_tokens * CHARS_PER_TOKEN)]
@@ -0,0 +1,121 @@
+# src/core/tool_agent.py
+"""
+Bucle de agente con tool-calling nativo, compartido por main, react y booking.
+
+  START -> agente -> (tool_calls?) -> tools -> agente -> ... -> END
+
+El modelo pide tools con llamadas estructuradas (no texto Thought/Action que hay
+que parsear) y `ToolNode` ejecuta todas las llamadas de un mismo turno del modelo
+a la vez, así una pregunta que necesita varias tools se resuelve en una sola
+vuelta al LLM. Cada turno del usuario tiene un presupuesto de rondas y de
+llamadas a tools; al agotarse, el modelo responde sin tools con lo que ya tiene.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.prebuilt import ToolNode, tools_condition
+
+MAX_TOOL_ITERATIONS = int(os.getenv("MAX_TOOL_ITERATIONS", "8"))  # Rondas de tools por turno del usuario
+MAX_TOOL_CALLS = int(os.getenv("MAX_TOOL_CALLS", "12"))  # Llamadas a tools por turno del usuario
+
+PARALLEL_HINT = (
+    "Si necesitas varias herramientas, pídelas todas a la vez en una sola respuesta "
+    "en lugar de una por una."
+)
+FINAL_ANSWER_PROMPT = (
+    "Ya no puedes usar más herramientas en este turno. "
+    "Responde al usuario con la información que ya tienes."
+)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TOOL_CALL_WORKERS", "8")), thread_name_prefix="tool-call")
+
+def tool_usage(messages: Sequence[AnyMessage]) -> Tuple[int, int]:
+    """(rondas, llamadas) de tools desde el último mensaje del usuario (solo recorre el turno actual)."""
+    rounds = calls = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, AIMessage) and message.tool_calls:
+            rounds += 1
+            calls += len(message.tool_calls)
+    return rounds, calls
+
+def limit_tool_calls(response: AIMessage, remaining: int) -> AIMessage:
+    """Recorta las llamadas que exceden el presupuesto (las demás se ejecutan normalmente)."""
+    if len(response.tool_calls) <= remaining:
+        return response
+    return response.model_copy(update={"tool_calls": response.tool_calls[:remaining]})
+
+def run_tool_calls(tool_calls: Sequence[Dict[str, Any]], tools: Sequence[BaseTool]) -> List[ToolMessage]:
+    """Ejecuta varias llamadas a tools a la vez (para nodos que no usan ToolNode)."""
+    by_name = {t.name: t for t in tools}
+
+    def run(call: Dict[str, Any]) -> ToolMessage:
+        tool = by_name.get(call["name"])
+        if tool is None:
+            return ToolMessage(content=f"Error: la herramienta {call['name']} no existe.", tool_call_id=call["id"])
+        try:
+            return tool.invoke(call)  # con un ToolCall devuelve un ToolMessage
+        except Exception as e:
+            return ToolMessage(content=f"Error: {e}", tool_call_id=call["id"], status="error")
+
+    return list(_executor.map(run, tool_calls))
+
+def build_tool_agent(
+    state_schema: type,
+    llm: Union[Runnable, Callable[[], Runnable]],
+    tools: Sequence[BaseTool],
+    system_prompt: Union[str, Callable[[Dict[str, Any]], str], None] = None,
+    node_name: str = "agent",
+    max_iterations: int = MAX_TOOL_ITERATIONS,
+    max_tool_calls: int = MAX_TOOL_CALLS,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+):
+    """Compila el grafo agente <-> tools sobre un estado con canal `messages` (add_messages).
+
+    `llm` puede ser el modelo o una función que lo devuelva: así el cliente se crea
+    en el primer turno y no al importar el módulo del grafo. `system_prompt` puede
+    ser una función del estado para datos que cambian por turno (p. ej. la fecha de hoy).
+    """
+    resolved: List[Runnable] = []
+
+    def models() -> Tuple[Runnable, Runnable]:
+        if not resolved:
+            base = llm if isinstance(llm, Runnable) else llm()
+            resolved[:] = [base, base.bind_tools(tools)]
+        return resolved[0], resolved[1]
+
+    def agent(state: Dict[str, Any], config: RunnableConfig) -> dict:
+        model, model_with_tools = models()
+        messages = list(state["messages"])
+        prompt = system_prompt(state) if callable(system_prompt) else system_prompt
+        head = [SystemMessage(content=f"{prompt}\n\n{PARALLEL_HINT}" if prompt else PARALLEL_HINT)]
+        rounds, calls = tool_usage(messages)
+        remaining = max_tool_calls - calls
+        if rounds >= max_iterations or remaining <= 0:
+            # Presupuesto agotado: el modelo sin tools no puede pedir otra ronda y el grafo termina
+            response = model.invoke(head + messages + [SystemMessage(content=FINAL_ANSWER_PROMPT)], config)
+        else:
+            response = limit_tool_calls(model_with_tools.invoke(head + messages, config), remaining)
+        return {"messages": [response]}
+
+    agent.__name__ = node_name
+    builder = StateGraph(state_schema)
+    builder.add_node(node_name, agent)
+    builder.add_node("tools", ToolNode(tools))  # varias tool_calls del mismo mensaje corren en paralelo
+
+    builder.add_edge(START, node_name)
+    # Condición: si el modelo pide usar una tool, ir al nodo "tools"
+    builder.add_conditional_edges(node_name, tools_condition, {"tools": "tools", "__end__": END})
+    # Cuando acaban las tools, vuelve al agente
+    builder.add_edge("tools", node_name)
+    return builder.compile(checkpointer=checkpointer)
@@ -0,0 +1,242 @@
+# src/core/tool_runtime.py
+"""
+Runtime compartido para las tools que llaman a servicios externos.
+
+Todas las llamadas HTTP pasan por un único `httpx.AsyncClient` con pool de
+conexiones que vive en un event loop propio (hilo en segundo plano). Así las
+tools síncronas (ReAct, `invoke`) y las asíncronas (`ainvoke`, la API) comparten
+conexiones, caches y peticiones en curso:
+
+  - cache TTL por tool (p. ej. geocodificación durante días, clima minutos)
+  - revalidación con ETag: al caducar, se pregunta con If-None-Match y un 304
+    renueva la entrada sin volver a descargar el cuerpo
+  - coalescing: llamadas idénticas simultáneas esperan la misma petición
+  - timeout duro por llamada (TOOL_HTTP_TIMEOUT)
+
+Las URLs de cada servicio se configuran por entorno, así las tools se pueden
+probar contra un servidor local de pruebas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from src.core.metrics import record_cache
+
+TOOL_HTTP_TIMEOUT = float(os.getenv("TOOL_HTTP_TIMEOUT", "8"))
+TOOL_HTTP_MAX_CONNECTIONS = int(os.getenv("TOOL_HTTP_MAX_CONNECTIONS", "20"))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires: float
+    etag: Optional[str] = None
+
+class TTLCache:
+    """Cache LRU con caducidad. Las entradas caducadas se conservan (hasta salir por
+    LRU) para poder revalidarlas con su ETag."""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[_CacheEntry]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, value: Any, ttl: float, etag: Optional[str] = None) -> None:
+        self._data[key] = _CacheEntry(value, time.monotonic() + ttl, etag)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+def _freeze(params: Optional[Dict[str, Any]]) -> Tuple:
+    return tuple(sorted((params or {}).items()))
+
+class ToolRuntime:
+    """Event loop en segundo plano + cliente HTTP con pool + caches por tool."""
+
+    def __init__(self, timeout: float = TOOL_HTTP_TIMEOUT, max_connections: int = TOOL_HTTP_MAX_CONNECTIONS):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._caches: Dict[str, TTLCache] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "revalidated": 0, "coalesced": 0, "timeouts": 0}
+
+    # -------------------------
+    # Loop y cliente
+    # -------------------------
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="tool-runtime", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Solo se llama desde el loop del runtime: no hace falta lock
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                follow_redirects=True,
+            )
+        return self._client
+
+    def cache(self, name: str) -> TTLCache:
+        cache = self._caches.get(name)
+        if cache is None:
+            cache = self._caches.setdefault(name, TTLCache())
+        return cache
+
+    def submit(self, coro: Awaitable[Any]) -> "asyncio.Future[Any]":
+        """Ejecuta `coro` en el loop del runtime; devuelve un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Versión síncrona: bloquea el hilo que llama (nunca el loop del runtime)."""
+        return self.submit(coro).result()
+
+    async def arun(self, coro: Awaitable[Any]) -> Any:
+        """Desde otro event loop (p. ej. el de FastAPI): espera sin bloquearlo."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def sync(self, afn: Callable[..., Awaitable[Any]]) -> Callable[..., Any]:
+        """Versión síncrona de una tool async (misma firma, para StructuredTool.from_function)."""
+        @functools.wraps(afn)
+        def wrapper(*args, **kwargs):
+            return self.run(afn(*args, **kwargs))
+        return wrapper
+
+    def asyncify(self, afn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """La tool async, ejecutada en el loop del runtime aunque se llame desde otro loop."""
+        @functools.wraps(afn)
+        async def wrapper(*args, **kwargs):
+            return await self.arun(afn(*args, **kwargs))
+        return wrapper
+
+    # -------------------------
+    # Cache + coalescing + timeout
+    # -------------------------
+    async def _cached(
+        self,
+        cache_name: str,
+        key: Hashable,
+        ttl: float,
+        fetch: Callable[[Optional[_CacheEntry]], Awaitable[Tuple[Any, Optional[str]]]],
+        timeout: Optional[float],
+    ) -> Any:
+        cache = self.cache(cache_name)
+        entry = cache.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self.counters["hits"] += 1
+            record_cache(f"tool:{cache_name}", hits=1)
+            return entry.value
+        self.counters["misses"] += 1
+        record_cache(f"tool:{cache_name}", misses=1)
+
+        full_key = (cache_name, key)
+        task = self._inflight.get(full_key)
+        if task is None:
+            async def load():
+                value, etag = await fetch(entry)
+                cache.put(key, value, ttl, etag)
+                return value
+
+            task = self._inflight[full_key] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda _: self._inflight.pop(full_key, None))
+        else:
+            self.counters["coalesced"] += 1
+        try:
+            # shield: si este llamador se rinde, la petición sigue para los demás y para la cache
+            return await asyncio.wait_for(asyncio.shield(task), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        *,
+        cache_name: str = "http",
+        ttl: float = 0,
+        revalidate: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """GET que devuelve el JSON, cacheado `ttl` segundos (0 = sin cache, solo coalescing).
+
+        Con `revalidate`, una entrada caducada con ETag se renueva con un GET condicional.
+        """
+        async def fetch(stale: Optional[_CacheEntry]):
+            headers = {}
+            if revalidate and stale is not None and stale.etag:
+                headers["If-None-Match"] = stale.etag
+            response = await self._get_client().get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+            if response.status_code == 304 and stale is not None:
+                self.counters["revalidated"] += 1
+                return stale.value, stale.etag
+            response.raise_for_status()
+            return response.json(), response.headers.get("ETag")
+
+        return await self._cached(cache_name, (url, _freeze(params)), ttl, fetch, timeout)
+
+    async def call_blocking(
+        self,
+        fn: Callable[[], Any],
+        *,
+        cache_name: str,
+        key: Hashable,
+        ttl: float = 0,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Para librerías síncronas (p. ej. DuckDuckGo): corre `fn` en un hilo con cache,
+        coalescing y timeout."""
+        async def fetch(stale: Optional[_CacheEntry]):
+            return await asyncio.get_running_loop().run_in_executor(None, fn), None
+
+        return await self._cached(cache_name, key, ttl, fetch, timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "entries": sum(len(c) for c in self._caches.values())}
+
+    def clear(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+
+# Runtime del proceso: lo comparten todas las tools
+runtime = ToolRuntime()
+
+def make_tool(afn: Callable[..., Awaitable[Any]], name: Optional[str] = None, description: Optional[str] = None):
+    """StructuredTool con versión síncrona y asíncrona de `afn` sobre el runtime compartido."""
+    from langchain_core.tools import StructuredTool
+
+    return StructuredTool.from_function(
+        func=runtime.sync(afn),
+        coroutine=runtime.asyncify(afn),
+        name=name or afn.__name__,
+        description=description or (afn.__doc__ or "").strip(),
+    )
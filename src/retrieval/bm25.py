@@ -0,0 +1,123 @@
+# src/retrieval/bm25.py
+"""
+Índice léxico BM25 en proceso, construido durante la ingesta.
+
+Complementa la búsqueda densa: un modelo de embeddings pequeño no distingue bien
+códigos de producto o nombres propios ("ABC-1234"), que BM25 encuentra por
+coincidencia exacta. El índice invertido se guarda en formato CSR con numpy
+(`{name}.bm25.npz`) junto al índice FAISS; los documentos se identifican por su
+posición en el índice FAISS de la misma publicación.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Palabras vacías frecuentes en español (y algunas en inglés) que no aportan a BM25
+STOPWORDS = frozenset(
+    "a al algo como con cual de del el ella ellos en es esa ese esta este esto fue ha hay la las le les lo los "
+    "mas me mi muy no nos o para pero por que se si sin sobre su sus te tu un una uno y ya yo "
+    "the of and or to in is are for on with".split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Minúsculas sin acentos; los códigos compuestos se indexan enteros y por partes.
+
+    "Código ABC-123" -> ["codigo", "abc-123", "abc", "123"]
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens: List[str] = []
+    for match in _TOKEN_RE.findall(text):
+        if match in STOPWORDS:
+            continue
+        tokens.append(match)
+        parts = re.split(r"[-_./]", match)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p and p not in STOPWORDS)
+    return tokens
+
+class BM25Index:
+    """BM25 (Okapi) con listas de postings en arrays numpy.
+
+    `indptr[t]:indptr[t + 1]` delimita en `doc_ids`/`tfs` los postings del término `t`.
+    """
+
+    def __init__(self, vocab: Dict[str, int], indptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_len)
+        df = np.diff(indptr).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_len.mean()) if n_docs else 1.0
+        # Parte del denominador que solo depende del documento: se precalcula una vez
+        self._norm = (k1 * (1 - b + b * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_len)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        doc_len: List[int] = []
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_id, tf))
+        indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        flat = [pair for plist in postings for pair in plist]
+        doc_ids = np.fromiter((d for d, _ in flat), dtype=np.int32, count=len(flat))
+        tfs = np.fromiter((tf for _, tf in flat), dtype=np.float32, count=len(flat))
+        return cls(vocab, indptr, doc_ids, tfs, np.asarray(doc_len, dtype=np.float32), k1, b)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Devuelve hasta `k` pares (posición, puntuación) ordenados de mayor a menor."""
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or not self.size:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        for t in term_ids:
+            start, end = self.indptr[t], self.indptr[t + 1]
+            docs, tf = self.doc_ids[start:end], self.tfs[start:end]
+            # Cada documento aparece una vez por término: la suma con índices es segura
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def save(self, path: str) -> None:
+        terms = np.array(sorted(self.vocab, key=self.vocab.get))
+        np.savez(
+            path, terms=terms, indptr=self.indptr, doc_ids=self.doc_ids, tfs=self.tfs,
+            doc_len=self.doc_len, params=np.array([self.k1, self.b], dtype=np.float32),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            vocab = {str(term): i for i, term in enumerate(data["terms"])}
+            k1, b = (float(x) for x in data["params"])
+            return cls(vocab, data["indptr"], data["doc_ids"], data["tfs"], data["doc_len"], k1, b)
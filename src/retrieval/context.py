@@ -0,0 +1,116 @@
+# src/retrieval/context.py
+"""
+Ensamblado del contexto: deduplicación, reranking opcional y empaquetado por tokens.
+
+En CPU el tiempo de evaluación del prompt en Ollama domina la latencia, así que
+antes de generar se quitan los chunks casi duplicados (MinHash sobre shingles de
+palabras), opcionalmente se reordenan por similitud con la pregunta y se
+empaquetan hasta un presupuesto de tokens. Se informa cuántos tokens se ahorraron
+frente a concatenar todo lo recuperado.
+"""
+
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.core.tokens import count_tokens, truncate_to_tokens
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))  # Jaccard estimada
+CONTEXT_RERANK = os.getenv("CONTEXT_RERANK", "0") == "1"
+
+SEPARATOR = "\n\n"
+
+# -------------------------
+# MinHash
+# -------------------------
+_NUM_PERM = 64
+_PRIME = (1 << 31) - 1  # primo de Mersenne: crc32 * a < 2^63 cabe en uint64
+_rng = np.random.default_rng(1234)  # semilla fija: firmas estables entre procesos
+_A = _rng.integers(1, _PRIME, size=_NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=_NUM_PERM, dtype=np.uint64)
+
+def _shingles(text: str, n: int = 5) -> np.ndarray:
+    words = text.lower().split()
+    if len(words) < n:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + n]) for i in range(len(words) - n + 1)]
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+def minhash(text: str) -> np.ndarray:
+    """Firma MinHash de `_NUM_PERM` permutaciones (hash universal (a*x + b) mod p)."""
+    x = _shingles(text)
+    hashed = (np.outer(x, _A) + _B) % _PRIME
+    return hashed.min(axis=0)
+
+def dedupe(docs: Sequence[Document], threshold: float = CONTEXT_DEDUP_THRESHOLD) -> Tuple[List[Document], int]:
+    """Quita documentos cuya similitud Jaccard estimada con uno ya elegido supera `threshold`."""
+    kept: List[Document] = []
+    signatures: List[np.ndarray] = []
+    for doc in docs:
+        sig = minhash(doc.page_content)
+        if any(float(np.mean(sig == other)) >= threshold for other in signatures):
+            continue
+        kept.append(doc)
+        signatures.append(sig)
+    return kept, len(docs) - len(kept)
+
+# -------------------------
+# Reranking y empaquetado
+# -------------------------
+def rerank(docs: Sequence[Document], query_vector: Sequence[float], embeddings) -> List[Document]:
+    """Ordena por similitud coseno con la pregunta.
+
+    Los vectores de los chunks salen de la cache de embeddings (la ingesta ya los calculó).
+    """
+    if len(docs) < 2:
+        return list(docs)
+    doc_vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]), dtype=np.float32)
+    q = np.asarray(query_vector, dtype=np.float32)
+    sims = doc_vectors @ q / (np.linalg.norm(doc_vectors, axis=1) * np.linalg.norm(q) + 1e-9)
+    return [docs[i] for i in np.argsort(-sims)]
+
+def pack(docs: Sequence[Document], budget: int) -> List[str]:
+    """Empaqueta en orden mientras quepan; si el primero no cabe, se recorta."""
+    parts: List[str] = []
+    used = 0
+    sep_tokens = count_tokens(SEPARATOR)
+    for doc in docs:
+        cost = count_tokens(doc.page_content) + (sep_tokens if parts else 0)
+        if used + cost <= budget:
+            parts.append(doc.page_content)
+            used += cost
+        elif not parts:
+            parts.append(truncate_to_tokens(doc.page_content, budget))
+            used = budget
+    return parts
+
+def assemble_context(
+    docs: Sequence[Document],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    query_vector: Optional[Sequence[float]] = None,
+    embeddings=None,
+) -> Tuple[str, Dict[str, int]]:
+    """Devuelve (contexto, estadísticas) a partir de los documentos recuperados.
+
+    Las estadísticas incluyen tokens de entrada (todo concatenado), de salida,
+    ahorrados y duplicados quitados.
+    """
+    tokens_in = count_tokens(SEPARATOR.join(d.page_content for d in docs))
+    unique, duplicates = dedupe(docs)
+    if CONTEXT_RERANK and query_vector is not None and embeddings is not None:
+        unique = rerank(unique, query_vector, embeddings)
+    context = SEPARATOR.join(pack(unique, budget))
+    tokens_out = count_tokens(context)
+    return context, {
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "tokens_saved": max(0, tokens_in - tokens_out),
+        "duplicates": duplicates,
+    }
@@ -0,0 +1,199 @@
+# src/retrieval/embeddings.py
+"""
+Cache persistente de embeddings compartida por la ingesta y la recuperación.
+
+Las claves son (modelo de embeddings, hash del texto normalizado): una pregunta
+repetida o un chunk sin cambios nunca vuelve a pasar por el modelo. Delante del
+archivo SQLite hay un LRU en memoria, y el tamaño en disco está acotado
+(se expulsan las entradas usadas hace más tiempo).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.core.metrics import record_cache
+
+# -------------------------
+# Configuración (variables de entorno, ver .env)
+# -------------------------
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096"))
+
+def normalize_text(text: str) -> str:
+    """Normaliza el texto para que variantes triviales compartan entrada.
+
+    Unicode NFKC, minúsculas y espacios colapsados: "¿Horario  de atención?" y
+    "¿horario de atención?" producen la misma clave.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+def text_key(model: str, text: str) -> str:
+    """Clave de cache: SHA-256 del modelo más el texto normalizado."""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Cache de vectores en SQLite (modo WAL) con un LRU en memoria delante.
+
+    Es seguro usarla desde varios hilos (un lock protege la conexión) y desde
+    varios procesos (SQLite serializa las escrituras), como hacen los workers de la ingesta.
+    """
+
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key: str, vector: Tuple[float, ...]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Devuelve los vectores encontrados (memoria primero, luego disco)."""
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = list(vector)
+                else:
+                    missing.append(key)
+            if missing:
+                rows = []
+                for start in range(0, len(missing), 500):  # límite de parámetros de SQLite
+                    part = missing[start:start + 500]
+                    rows += self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                        part,
+                    ).fetchall()
+                for key, blob in rows:
+                    vector = tuple(np.frombuffer(blob, dtype=np.float32).tolist())
+                    self._remember(key, vector)
+                    found[key] = list(vector)
+                if rows:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+                    self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        """Guarda vectores nuevos y expulsa los más antiguos si se supera el límite."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, tuple(vector))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (key, model, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ],
+            )
+            self._conn.commit()
+            self._rows += len(items)
+            if self._rows > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Otros procesos también escriben: se recuenta antes de borrar.
+        # Se baja al 90% del límite para no expulsar en cada inserción.
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._rows - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._conn.commit()
+            self._rows -= excess
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._rows,
+        }
+
+class CachedEmbeddings(Embeddings):
+    """Envuelve un modelo de embeddings y consulta la cache antes de calcular.
+
+    Los textos que faltan se calculan en un solo lote con `embed_documents`.
+    Para los modelos de HuggingFace sin prefijos, el vector de una consulta y el
+    de un documento con el mismo texto coinciden, así que comparten entrada.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(self.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+        todo: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        record_cache("embeddings", hits=len(keys) - len(todo), misses=len(todo))
+        if todo:
+            vectors = self.embeddings.embed_documents(list(todo.values()))
+            computed = dict(zip(todo.keys(), vectors))
+            self.cache.put_many(self.model, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(self.model, text)
+        found = self.cache.get_many([key])
+        record_cache("embeddings", hits=int(key in found), misses=int(key not in found))
+        if key in found:
+            return found[key]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.model, {key: vector})
+        return vector
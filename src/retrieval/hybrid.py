@@ -0,0 +1,82 @@
+# src/retrieval/hybrid.py
+"""
+Recuperación híbrida: búsqueda densa (FAISS) + léxica (BM25) fusionadas con RRF.
+
+Ambas búsquedas corren en paralelo y sus rankings se combinan con Reciprocal Rank
+Fusion: cada documento suma `peso / (rrf_k + rango)` por cada lista en la que
+aparece. RRF solo usa posiciones, así que no hace falta calibrar las
+puntuaciones de BM25 contra las distancias L2 de FAISS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from src.retrieval.bm25 import BM25Index
+
+# Pool pequeño para lanzar las dos búsquedas a la vez desde código síncrono
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-retriever")
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], weights: Sequence[float], rrf_k: int = 60) -> List[int]:
+    """Fusiona rankings de posiciones; devuelve las posiciones ordenadas por puntuación RRF."""
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, pos in enumerate(ranking, 1):
+            scores[pos] = scores.get(pos, 0.0) + weight / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+class HybridRetriever(BaseRetriever):
+    """Retriever de LangChain que combina el vector store FAISS con un índice BM25."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: Any
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    dense_weight: float = 1.0
+    lexical_weight: float = 1.0
+    rrf_k: int = 60
+
+    def _dense_positions(self, vectors: List[List[float]]) -> List[List[int]]:
+        x = np.asarray(vectors, dtype=np.float32)
+        _, positions = self.vectorstore.index.search(x, self.fetch_k)
+        return [[int(p) for p in row if p != -1] for row in positions]
+
+    def _lexical_positions(self, query: str) -> List[int]:
+        return [pos for pos, _ in self.bm25.search(query, self.fetch_k)]
+
+    def _dense(self, query: str) -> List[int]:
+        return self._dense_positions([self.vectorstore.embedding_function.embed_query(query)])[0]
+
+    def _to_documents(self, dense: List[int], lexical: List[int]) -> List[Document]:
+        fused = reciprocal_rank_fusion([dense, lexical], [self.dense_weight, self.lexical_weight], self.rrf_k)
+        store, ids = self.vectorstore.docstore, self.vectorstore.index_to_docstore_id
+        return [store.search(ids[pos]) for pos in fused[: self.k]]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = _executor.submit(self._dense, query)
+        lexical = self._lexical_positions(query)  # BM25 en este hilo mientras se embebe la consulta
+        return self._to_documents(dense.result(), lexical)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense, lexical = await asyncio.gather(
+            asyncio.to_thread(self._dense, query),
+            asyncio.to_thread(self._lexical_positions, query),
+        )
+        return self._to_documents(dense, lexical)
+
+    def batch_search(self, queries: Sequence[str], vectors: List[List[float]]) -> List[List[Document]]:
+        """Versión por lotes con vectores ya calculados: una búsqueda FAISS para todas las consultas."""
+        dense = self._dense_positions(vectors)
+        return [self._to_documents(d, self._lexical_positions(q)) for q, d in zip(queries, dense)]
@@ -0,0 +1,230 @@
+# src/retrieval/index.py
+"""
+Carga del índice FAISS con memory-mapping y recarga en caliente.
+
+`FAISS.load_local` copia todo el índice al heap de cada worker y deserializa el
+docstore completo desde el `.pkl`. Aquí el `.faiss` se abre con mmap (las páginas
+las comparte el sistema operativo entre workers) y los documentos se guardan en un
+formato compacto que solo se lee al recuperar cada chunk:
+
+  {name}.docs         registros JSON concatenados, en el orden de posiciones del índice
+  {name}.offsets.npy  offsets (int64) de cada registro dentro de `.docs`
+
+Cada publicación de la ingesta va a su propio directorio, `{name}.versions/<versión>/`
+(con el `.faiss`, el `.pkl`, el docstore, el BM25 y el manifest), y al final se cambia
+de forma atómica el puntero `{name}.version`. Los lectores resuelven el puntero una vez
+y cargan todos los archivos de ese directorio, así nunca mezclan dos versiones. Se
+conservan las FAISS_KEEP_VERSIONS últimas versiones; sin puntero (índices anteriores)
+los archivos están directamente en el directorio del índice.
+
+`IndexWatcher` vigila el puntero y avisa cuando la ingesta publica un índice nuevo,
+para cambiar el retriever sin reconstruir el resto de recursos.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from typing import Callable, Iterator, Optional, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+FAISS_KEEP_VERSIONS = int(os.getenv("FAISS_KEEP_VERSIONS", "3"))  # versiones publicadas que se conservan
+
+# IO_FLAG_MMAP_IFC (faiss >= 1.10) mapea también los vectores de los índices planos
+# sin copiarlos; en versiones anteriores solo existe IO_FLAG_MMAP.
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+def _paths(index_dir: str, name: str) -> dict:
+    return {
+        "faiss": os.path.join(index_dir, f"{name}.faiss"),
+        "docs": os.path.join(index_dir, f"{name}.docs"),
+        "offsets": os.path.join(index_dir, f"{name}.offsets.npy"),
+        "version": os.path.join(index_dir, f"{name}.version"),
+    }
+
+# -------------------------
+# Escritura (la usa la ingesta)
+# -------------------------
+def export_docstore(vs, out_dir: str, name: str) -> None:
+    """Escribe el docstore de un vector store FAISS en formato compacto."""
+    paths = _paths(out_dir, name)
+    offsets = np.zeros(vs.index.ntotal + 1, dtype=np.int64)
+    with open(paths["docs"], "wb") as f:
+        for pos in range(vs.index.ntotal):
+            doc_id = vs.index_to_docstore_id[pos]
+            doc = vs.docstore.search(doc_id)
+            record = {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+            offsets[pos + 1] = f.tell()
+    np.save(paths["offsets"], offsets)
+
+def _write_pointer(index_dir: str, name: str, version: str) -> None:
+    fd, tmp = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(version)
+    os.replace(tmp, _paths(index_dir, name)["version"])
+
+def _versions_root(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, f"{name}.versions")
+
+def publish_version(index_dir: str, name: str, write: Callable[[str], None], keep: int = FAISS_KEEP_VERSIONS) -> str:
+    """Publica una versión nueva del índice: `write(path)` escribe todos sus archivos en
+    un directorio propio y después se cambia el puntero (escritura atómica)."""
+    root = _versions_root(index_dir, name)
+    os.makedirs(root, exist_ok=True)
+    version = str(time.time_ns())
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+    try:
+        write(tmp_dir)
+        os.rename(tmp_dir, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _write_pointer(index_dir, name, version)
+    # Las versiones antiguas se pueden borrar aunque algún worker las tenga mapeadas:
+    # el sistema conserva los archivos abiertos hasta que se cierran
+    old = sorted((v for v in os.listdir(root) if v.isdigit()), key=int)[:-max(1, keep)]
+    for stale in old:
+        shutil.rmtree(os.path.join(root, stale), ignore_errors=True)
+    return version
+
+_POINTER = object()  # IndexWatcher: sin versión cargada explícita, leer el puntero
+
+def read_version(index_dir: str, name: str) -> Optional[str]:
+    try:
+        with open(_paths(index_dir, name)["version"]) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def resolve_index_dir(index_dir: str, name: str, version: Optional[str] = None) -> str:
+    """Directorio con los archivos de `version` (por defecto, la que indica el puntero).
+    Sin versiones publicadas, el propio `index_dir` (formato anterior)."""
+    version = version or read_version(index_dir, name)
+    if version:
+        path = os.path.join(_versions_root(index_dir, name), version)
+        if os.path.isdir(path):
+            return path
+    return index_dir
+
+def has_mmap_index(index_dir: str, name: str) -> bool:
+    paths = _paths(index_dir, name)
+    return all(os.path.exists(paths[k]) for k in ("faiss", "docs", "offsets"))
+
+# -------------------------
+# Lectura perezosa
+# -------------------------
+class MmapDocstore(Docstore):
+    """Docstore de solo lectura que decodifica cada documento al pedirlo.
+
+    Se busca por posición en el índice FAISS (ver `_PositionIds`), así no hace
+    falta mantener en memoria el diccionario posición -> id.
+    """
+
+    def __init__(self, docs_path: str, offsets_path: str):
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+        self._file = open(docs_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        pos = int(search)
+        if not 0 <= pos < len(self):
+            return f"ID {search} not found."
+        start, end = int(self._offsets[pos]), int(self._offsets[pos + 1])
+        record = json.loads(self._data[start:end])
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+class _PositionIds(Mapping):
+    """Sustituye a `index_to_docstore_id`: la "id" de cada posición es la posición misma."""
+
+    def __init__(self, size: int):
+        self._size = size
+
+    def __getitem__(self, pos) -> int:
+        pos = int(pos)
+        if not 0 <= pos < self._size:
+            raise KeyError(pos)
+        return pos
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._size))
+
+    def __len__(self) -> int:
+        return self._size
+
+def load_mmap_vectorstore(index_dir: str, name: str, embeddings):
+    """Abre el índice con mmap y el docstore compacto; devuelve un `FAISS` de solo lectura."""
+    from langchain_community.vectorstores import FAISS
+
+    paths = _paths(index_dir, name)
+    index = faiss.read_index(paths["faiss"], _MMAP_FLAGS)
+    docstore = MmapDocstore(paths["docs"], paths["offsets"])
+    if len(docstore) != index.ntotal:
+        raise ValueError(
+            f"Índice inconsistente en {index_dir}: {index.ntotal} vectores y {len(docstore)} documentos"
+        )
+    return FAISS(embeddings, index, docstore, _PositionIds(index.ntotal))
+
+# -------------------------
+# Recarga en caliente
+# -------------------------
+class IndexWatcher:
+    """Hilo que consulta el archivo de versión cada `interval` segundos.
+
+    Cuando cambia, llama a `on_change(version)`, que debe cargar el directorio de esa
+    versión (`resolve_index_dir(index_dir, name, version)`); si el callback falla, se
+    reintenta en la siguiente vuelta. `version` es la versión que ya cargó el llamador
+    (None si no había índice): si la ingesta publica entre esa carga y la creación del
+    watcher, la primera vuelta la detecta. Sin ella se toma la del puntero actual.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        name: str,
+        on_change: Callable[[str], None],
+        interval: float = 5.0,
+        version: Union[str, None, object] = _POINTER,
+    ):
+        self.index_dir = index_dir
+        self.name = name
+        self.on_change = on_change
+        self.interval = interval
+        self.version = read_version(index_dir, name) if version is _POINTER else version
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="faiss-index-watcher", daemon=True)
+
+    def start(self) -> "IndexWatcher":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            version = read_version(self.index_dir, self.name)
+            if version is None or version == self.version:
+                continue
+            try:
+                self.on_change(version)
+                self.version = version
+            except Exception:
+                logger.exception("Error recargando el índice %s (versión %s)", self.name, version, extra={"index": self.name, "version": version})
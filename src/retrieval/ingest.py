@@ -0,0 +1,309 @@
+# src/retrieval/ingest.py
+"""
+Ingesta incremental de documentos para el índice FAISS del agente RAG.
+
+Recorre `DOCS_DIR` en streaming, divide cada archivo en chunks y calcula los
+embeddings en lotes usando un pool de procesos (cada proceso carga una sola vez
+los embeddings de `_load_embeddings_sync`). Las re-ejecuciones son incrementales:
+un manifest con el hash de contenido de cada archivo permite re-embeder solo los
+archivos nuevos o modificados y eliminar del índice los archivos borrados.
+Cada publicación va a su propio directorio de versión con el índice, el docstore
+compacto para la carga con mmap, el índice léxico BM25 para la recuperación
+híbrida y el manifest; al final se cambia el puntero de versión que vigilan los
+servidores (ver index.py).
+
+Uso:
+    uv run python -m src.retrieval.ingest            # incremental
+    uv run python -m src.retrieval.ingest --full     # reconstruye todo
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from src.retrieval.bm25 import BM25Index
+from src.retrieval.index import export_docstore, publish_version, resolve_index_dir
+
+load_dotenv()
+
+# -------------------------
+# Configuración (variables de entorno, ver .env)
+# -------------------------
+DOCS_DIR = os.getenv("DOCS_DIR", "PDF")
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "data/faiss_index")
+FAISS_INDEX_NAME = os.getenv("FAISS_INDEX_NAME", "index")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+MANIFEST_FILE = "manifest.json"
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+
+# -------------------------
+# Lectura y chunking en streaming
+# -------------------------
+def _iter_files(docs_dir: str) -> Iterator[str]:
+    """Genera rutas relativas de los archivos soportados, en orden estable."""
+    for root, dirs, files in os.walk(docs_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), docs_dir)
+
+def _file_hash(path: str) -> str:
+    """Hash SHA-256 del contenido, leído por bloques para no cargar el archivo entero."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _iter_pages(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Genera (texto, metadata) por página (PDF) o por archivo (texto plano)."""
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader  # import perezoso: solo se necesita para PDFs
+
+        reader = PdfReader(path)
+        for page_number, page in enumerate(reader.pages, 1):
+            text = page.extract_text() or ""
+            if text.strip():
+                yield text, {"page": page_number}
+    else:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        if text.strip():
+            yield text, {}
+
+def _iter_chunks(docs_dir: str, rel_path: str, digest: str) -> Iterator[Tuple[str, Dict[str, Any], str]]:
+    """Divide un archivo en chunks y genera (texto, metadata, id determinista)."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    path_key = hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:8]
+    n = 0
+    for text, meta in _iter_pages(os.path.join(docs_dir, rel_path)):
+        for chunk in splitter.split_text(text):
+            # El id depende de la ruta y del contenido: si el archivo no cambia, los ids
+            # tampoco, y dos archivos idénticos en rutas distintas no comparten ids
+            yield chunk, {"source": rel_path, **meta}, f"{path_key}-{digest[:16]}-{n}"
+            n += 1
+
+# -------------------------
+# Embeddings en un pool de procesos
+# -------------------------
+_worker_embeddings = None
+
+def _init_worker() -> None:
+    """Inicializador del proceso: limita hilos de torch y carga los embeddings una vez."""
+    global _worker_embeddings
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    from src.agents.rag import _load_embeddings_sync
+
+    _worker_embeddings = _load_embeddings_sync()
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """Tarea del pool: embebe un lote de textos."""
+    return _worker_embeddings.embed_documents(texts)
+
+# -------------------------
+# Manifest y publicación del índice
+# -------------------------
+def _load_manifest(index_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Lee el manifest {ruta: {"sha256": ..., "ids": [...]}} (vacío si no existe)."""
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("files", {})
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    """Escribe un JSON de forma atómica (archivo temporal + os.replace)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _index_exists(index_dir: str) -> bool:
+    faiss_file = os.path.join(index_dir, f"{FAISS_INDEX_NAME}.faiss")
+    pkl_file = os.path.join(index_dir, f"{FAISS_INDEX_NAME}.pkl")
+    return os.path.exists(faiss_file) and os.path.exists(pkl_file)
+
+def _placeholder_embeddings():
+    """Embeddings de relleno para el vector store de ingesta.
+
+    FAISS solo usa la función de embeddings al consultar; aquí siempre se añaden
+    vectores ya calculados, así que no hace falta cargar el modelo en el proceso principal.
+    """
+    from langchain_core.embeddings import Embeddings
+
+    class _IngestOnlyEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            raise NotImplementedError("El índice de ingesta no embebe textos")
+
+        def embed_query(self, text):
+            raise NotImplementedError("El índice de ingesta no admite consultas")
+
+    return _IngestOnlyEmbeddings()
+
+def _load_index(index_dir: str):
+    """Carga el índice existente para actualizarlo."""
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS.load_local(
+        index_dir,
+        _placeholder_embeddings(),
+        index_name=FAISS_INDEX_NAME,
+        allow_dangerous_deserialization=True,
+    )
+
+def _save_index(vs, index_dir: str, manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    """Escribe el índice (y el manifest) en un directorio de versión nuevo y lo publica.
+
+    Los lectores cargan siempre el conjunto completo de una versión: el puntero solo
+    cambia cuando todos los archivos están escritos.
+    """
+    def _write(version_dir: str) -> None:
+        vs.save_local(version_dir, index_name=FAISS_INDEX_NAME)
+        export_docstore(vs, version_dir, FAISS_INDEX_NAME)
+        texts = (
+            vs.docstore.search(vs.index_to_docstore_id[pos]).page_content for pos in range(vs.index.ntotal)
+        )
+        BM25Index.build(texts).save(os.path.join(version_dir, f"{FAISS_INDEX_NAME}.bm25.npz"))
+        if manifest is not None:
+            _write_json_atomic(
+                os.path.join(version_dir, MANIFEST_FILE),
+                {"updated_at": time.time(), "files": manifest},
+            )
+
+    publish_version(index_dir, FAISS_INDEX_NAME, _write)
+
+# -------------------------
+# Pipeline principal
+# -------------------------
+def ingest(
+    docs_dir: str = DOCS_DIR,
+    index_dir: str = FAISS_INDEX_DIR,
+    workers: int = INGEST_WORKERS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    full: bool = False,
+) -> Dict[str, int]:
+    """
+    Construye o actualiza el índice FAISS a partir de `docs_dir`.
+
+    Solo se re-embeben los archivos cuyo hash cambió; los chunks de archivos
+    modificados o borrados se eliminan del índice. Devuelve un resumen con
+    archivos añadidos/actualizados/eliminados/sin cambios y chunks embebidos.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    os.makedirs(index_dir, exist_ok=True)
+    current_dir = resolve_index_dir(index_dir, FAISS_INDEX_NAME)  # versión publicada (si hay)
+    has_index = not full and _index_exists(current_dir)
+    old_manifest = _load_manifest(current_dir) if has_index else {}  # sin índice, el manifest no sirve
+
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks": 0}
+    new_manifest: Dict[str, Dict[str, Any]] = {}
+    stale_ids: List[str] = []
+    pending: List[str] = []  # archivos a (re)embeber
+
+    for rel_path in _iter_files(docs_dir):
+        digest = _file_hash(os.path.join(docs_dir, rel_path))
+        previous = old_manifest.get(rel_path)
+        if previous and previous["sha256"] == digest:
+            new_manifest[rel_path] = previous
+            stats["unchanged"] += 1
+            continue
+        if previous:
+            stale_ids.extend(previous["ids"])
+            stats["updated"] += 1
+        else:
+            stats["added"] += 1
+        new_manifest[rel_path] = {"sha256": digest, "ids": []}
+        pending.append(rel_path)
+
+    for rel_path, entry in old_manifest.items():
+        if rel_path not in new_manifest:
+            stale_ids.extend(entry["ids"])
+            stats["removed"] += 1
+
+    # Solo se deserializa el índice si hay algo que cambiar
+    vs = _load_index(current_dir) if has_index and (pending or stale_ids) else None
+    if vs is not None and stale_ids:
+        vs.delete(stale_ids)
+
+    def _add(batch: Tuple[List[str], List[Dict[str, Any]], List[str]], vectors: List[List[float]]) -> None:
+        nonlocal vs
+        texts, metadatas, ids = batch
+        pairs = list(zip(texts, vectors))
+        if vs is None:
+            vs = FAISS.from_embeddings(pairs, _placeholder_embeddings(), metadatas=metadatas, ids=ids)
+        else:
+            vs.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+        stats["chunks"] += len(ids)
+
+    if pending:
+        ctx = multiprocessing.get_context("spawn")  # torch no es fork-safe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            in_flight: Dict[Future, Tuple[List[str], List[Dict[str, Any]], List[str]]] = {}
+
+            def _drain(block_until: int) -> None:
+                # Backpressure: como mucho `block_until` lotes en vuelo
+                while len(in_flight) > block_until:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        _add(in_flight.pop(fut), fut.result())
+
+            texts: List[str] = []
+            metadatas: List[Dict[str, Any]] = []
+            ids: List[str] = []
+            for rel_path in pending:
+                digest = new_manifest[rel_path]["sha256"]
+                for text, meta, chunk_id in _iter_chunks(docs_dir, rel_path, digest):
+                    texts.append(text)
+                    metadatas.append(meta)
+                    ids.append(chunk_id)
+                    new_manifest[rel_path]["ids"].append(chunk_id)
+                    if len(texts) >= batch_size:
+                        in_flight[pool.submit(_embed_batch, texts)] = (texts, metadatas, ids)
+                        texts, metadatas, ids = [], [], []
+                        _drain(workers * 2)
+            if texts:
+                in_flight[pool.submit(_embed_batch, texts)] = (texts, metadatas, ids)
+            _drain(0)
+
+    # Sin cambios no se publica nada: la versión actual ya tiene este manifest
+    if vs is not None and (pending or stale_ids):
+        _save_index(vs, index_dir, new_manifest)
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Construye o actualiza el índice FAISS del agente RAG.")
+    parser.add_argument("--docs", default=DOCS_DIR, help="Directorio de documentos (DOCS_DIR)")
+    parser.add_argument("--index", default=FAISS_INDEX_DIR, help="Directorio del índice (FAISS_INDEX_DIR)")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Procesos para embeddings")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Chunks por lote")
+    parser.add_argument("--full", action="store_true", help="Ignora el manifest y reconstruye todo")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = ingest(args.docs, args.index, args.workers, args.batch_size, args.full)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Ingesta completada en {elapsed:.1f}s: {stats['added']} nuevos, {stats['updated']} actualizados, "
+        f"{stats['removed']} eliminados, {stats['unchanged']} sin cambios, {stats['chunks']} chunks embebidos."
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# src/retrieval/semantic_cache.py
+"""
+Cache semántica de respuestas para el agente RAG.
+
+Guarda (embedding de la pregunta, respuesta, huella del contexto) en un índice
+FAISS pequeño en memoria. Una pregunta nueva reutiliza la respuesta de la
+pregunta más parecida si la similitud coseno supera el umbral y el contexto
+recuperado es el mismo (si los documentos cambiaron, la respuesta vieja no vale).
+Las entradas caducan por TTL y, al llenarse, se expulsa la menos usada (LRU).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+def context_fingerprint(context: str) -> str:
+    """Huella del contexto recuperado: misma huella = mismos documentos."""
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+@dataclass
+class _Entry:
+    question: str
+    answer: str
+    fingerprint: str
+    created: float
+
+class SemanticCache:
+    """Índice FAISS (producto interno sobre vectores normalizados) de preguntas respondidas."""
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 86400, max_entries: int = 2000, candidates: int = 4):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.candidates = candidates
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # orden LRU
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _as_matrix(vector: List[float]) -> np.ndarray:
+        x = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(x)
+        return x
+
+    def _remove(self, ids: List[int]) -> None:
+        for i in ids:
+            self._entries.pop(i, None)
+        if ids and self._index is not None:
+            self._index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def _expire(self, ids: List[int]) -> None:
+        self._remove(ids)
+        self.evictions += len(ids)
+
+    def _search(self, x: np.ndarray):
+        k = min(self.candidates, len(self._entries))
+        scores, ids = self._index.search(x, k)
+        return [(float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i != -1]
+
+    def lookup(self, vector: List[float], fingerprint: str) -> Optional[str]:
+        """Devuelve la respuesta guardada más parecida, o None (miss)."""
+        with self._lock:
+            if self._index is None or not self._entries:
+                self.misses += 1
+                return None
+            now = time.time()
+            expired = []
+            for score, i in self._search(self._as_matrix(vector)):
+                if score < self.threshold:
+                    break  # resultados ordenados por similitud
+                entry = self._entries[i]
+                if now - entry.created > self.ttl:
+                    expired.append(i)
+                    continue
+                if entry.fingerprint == fingerprint:
+                    self._entries.move_to_end(i)
+                    self._expire(expired)
+                    self.hits += 1
+                    return entry.answer
+            self._expire(expired)
+            self.misses += 1
+            return None
+
+    def store(self, vector: List[float], question: str, answer: str, fingerprint: str) -> None:
+        """Guarda una respuesta; si ya existe una casi idéntica con el mismo contexto, la reemplaza."""
+        x = self._as_matrix(vector)
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(x.shape[1]))
+            elif self._entries:
+                duplicates = [
+                    i for score, i in self._search(x)
+                    if score >= 0.99 and self._entries[i].fingerprint == fingerprint
+                ]
+                self._remove(duplicates)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(x, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = _Entry(question, answer, fingerprint, time.time())
+            oldest = []
+            for i in self._entries:
+                if len(self._entries) - len(oldest) <= self.max_entries:
+                    break
+                oldest.append(i)  # el primero del OrderedDict es el menos usado
+            self._expire(oldest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }